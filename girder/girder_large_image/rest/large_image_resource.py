@@ -262,7 +262,9 @@ class LargeImageResource(Resource):
         }
 
     @describeRoute(
-        Description('Get information on caches.'),
+        Description('Get information on caches.')
+        .notes('This includes the number of hits, misses, and evictions and '
+               'latency histograms by tile source class.'),
     )
     @access.admin(scope=TokenScope.DATA_READ)
     def cacheInfo(self, params):
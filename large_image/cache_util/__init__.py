@@ -16,46 +16,82 @@
 
 import atexit
 
-from .cache import (CacheProperties, LruCacheMetaclass, getTileCache,
-                    isTileCacheSetup, methodcache, strhash)
+from .cache import (CacheProperties, LruCacheMetaclass, decodedtilecache,
+                    getDecodedStripCache, getDecodedTileCache,
+                    getNegativeCache, getTileCache, isDecodedStripCacheSetup,
+                    isDecodedTileCacheSetup, isNegativeCacheSetup,
+                    isTileCacheSetup, methodcache, storeDecodedTile, strhash)
 
 try:
     from .memcache import MemCache
+    from .tieredcache import TieredCache
 except ImportError:
     MemCache = None
+    TieredCache = None
 
 from .cachefactory import CacheFactory, pickAvailableCache
+from .diskcache import DiskCache
+from .handlepool import HandlePool, getHandlePool, isHandlePoolSetup
+from .metrics import clearCacheMetrics, getCacheMetrics
+from .sharedcache import SharedMemoryCache
+from .sourcecache import SourceCache
+from .statistics import StatisticsStore, getIndexStore, getStatisticsStore
+from .tinylfu import TinyLFUCache
 
 _cacheClearFuncs = []
 
 
-@atexit.register
 def cachesClear(*args, **kwargs):
     """
     Clear the tilesource caches and the load model cache.  Note that this does
     not clear memcached (which could be done with tileCache._client.flush_all,
     but that can affect programs other than this one).
+
+    :param exiting: if True, tile caches that persist across restarts are not
+        cleared.
     """
     for name in LruCacheMetaclass.namedCaches:
         with LruCacheMetaclass.namedCaches[name][1]:
             LruCacheMetaclass.namedCaches[name][0].clear()
-    if isTileCacheSetup():
+    if isTileCacheSetup() and not (
+            kwargs.get('exiting') and getattr(getTileCache()[0], 'persistent', False)):
         tileCache, tileLock = getTileCache()
         try:
             with tileLock:
                 tileCache.clear()
         except Exception:
             pass
+    if isDecodedTileCacheSetup():
+        decodedCache, decodedLock = getDecodedTileCache()
+        with decodedLock:
+            decodedCache.clear()
+    if isDecodedStripCacheSetup():
+        stripCache, stripLock = getDecodedStripCache()
+        with stripLock:
+            stripCache.clear()
+    if isNegativeCacheSetup():
+        negativeCache, negativeLock = getNegativeCache()
+        with negativeLock:
+            negativeCache.clear()
     for func in _cacheClearFuncs:
         func()
 
 
+atexit.register(cachesClear, exiting=True)
+
+
 def cachesInfo(*args, **kwargs):
     """
     Report on each cache.
 
     :returns: a dictionary with the cache names as the keys and values that
-        include 'maxsize' and 'used', if known.
+        include 'maxsize' and 'used', if known.  Caches of tile sources also
+        report 'footprint' and 'maxfootprint', the estimated bytes used by the
+        sources and the most they may use.  If any events were recorded
+        for a cache, 'metrics' has the counts and latencies of its hits,
+        misses, stores, and computations by tile source class (see
+        getCacheMetrics).  'evictions' is included if the cache reports it.
+        'handlePool' reports the number of pooled open file handles.
     """
     info = {}
     for name in LruCacheMetaclass.namedCaches:
@@ -65,6 +101,10 @@ def cachesInfo(*args, **kwargs):
                 'maxsize': cache.maxsize,
                 'used': cache.currsize,
             }
+            if hasattr(cache, 'footprint'):
+                info[name]['footprint'] = cache.footprint
+                info[name]['maxfootprint'] = cache.maxFootprint
+            _addMetricsInfo(info[name], name, cache)
     if isTileCacheSetup():
         tileCache, tileLock = getTileCache()
         try:
@@ -75,11 +115,70 @@ def cachesInfo(*args, **kwargs):
                     'items': getattr(tileCache, 'curritems' if hasattr(
                         tileCache, 'curritems') else 'currsize', None),
                 }
+                if hasattr(tileCache, 'tierInfo'):
+                    info['tileCache']['tiers'] = tileCache.tierInfo()
+                _addMetricsInfo(info['tileCache'], 'tileCache', tileCache)
         except Exception:
             pass
+    if isDecodedTileCacheSetup():
+        decodedCache, decodedLock = getDecodedTileCache()
+        with decodedLock:
+            info['decodedTileCache'] = {
+                'maxsize': decodedCache.maxsize,
+                'used': decodedCache.currsize,
+                'items': len(decodedCache),
+            }
+            _addMetricsInfo(info['decodedTileCache'], 'decodedTileCache', decodedCache)
+    if isDecodedStripCacheSetup():
+        stripCache, stripLock = getDecodedStripCache()
+        with stripLock:
+            info['decodedStripCache'] = {
+                'maxsize': stripCache.maxsize,
+                'used': stripCache.currsize,
+                'items': len(stripCache),
+            }
+            _addMetricsInfo(info['decodedStripCache'], 'decodedStripCache', stripCache)
+    if isNegativeCacheSetup():
+        negativeCache, negativeLock = getNegativeCache()
+        with negativeLock:
+            info['negativeCache'] = {
+                'maxsize': negativeCache.maxsize,
+                'used': negativeCache.currsize,
+                'items': len(negativeCache),
+            }
+            _addMetricsInfo(info['negativeCache'], 'negativeCache', negativeCache)
+    if isHandlePoolSetup():
+        handlePool = getHandlePool()
+        info['handlePool'] = {
+            'maxsize': handlePool.maxsize,
+            'used': len(handlePool),
+            'evictions': handlePool.evictions,
+        }
     return info
 
 
+def _addMetricsInfo(info, name, cache):
+    """
+    Add eviction counts and recorded metrics to the report on a cache.
+
+    :param info: the report on the cache to modify.
+    :param name: the name used when recording events for the cache.
+    :param cache: the cache.
+    """
+    evictions = getattr(cache, 'evictions', None)
+    if evictions is not None:
+        info['evictions'] = evictions
+    metrics = getCacheMetrics(name)
+    if metrics:
+        info['metrics'] = metrics
+
+
 __all__ = ('CacheFactory', 'getTileCache', 'isTileCacheSetup', 'MemCache',
            'strhash', 'LruCacheMetaclass', 'pickAvailableCache', 'methodcache',
-           'CacheProperties')
+           'CacheProperties', 'StatisticsStore', 'getStatisticsStore', 'getIndexStore',
+           'decodedtilecache', 'getDecodedTileCache', 'isDecodedTileCacheSetup',
+           'storeDecodedTile', 'getDecodedStripCache', 'isDecodedStripCacheSetup',
+           'TieredCache', 'DiskCache', 'SharedMemoryCache',
+           'TinyLFUCache', 'SourceCache', 'getCacheMetrics', 'clearCacheMetrics',
+           'getNegativeCache', 'isNegativeCacheSetup', 'HandlePool',
+           'getHandlePool', 'isHandlePoolSetup')
@@ -1,9 +1,162 @@
 import hashlib
+import sys
 import threading
 import time
+import zlib
 from typing import Tuple
 
 import cachetools
+import numpy as np
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+try:
+    import lz4.frame
+except ImportError:
+    lz4 = None
+
+from .. import config
+
+
+def valueSize(value):
+    """
+    Estimate the number of bytes used by a cached value.
+
+    :param value: a cached value, such as an encoded tile, a numpy array, or a
+        PIL image.
+    :returns: the estimated size in bytes.
+    """
+    if isinstance(value, (bytes, bytearray)):
+        return len(value)
+    if hasattr(value, 'nbytes'):
+        return value.nbytes
+    if hasattr(value, 'getbands') and hasattr(value, 'size'):
+        return value.size[0] * value.size[1] * len(value.getbands())
+    if isinstance(value, tuple):
+        return sys.getsizeof(value) + sum(valueSize(entry) for entry in value)
+    return sys.getsizeof(value)
+
+
+class CompressedArray:
+    """
+    A numpy array that is stored compressed in a cache.  Multi-byte values
+    are stored with their bytes shuffled so that, for instance, the high bytes
+    of all uint16 values are adjacent, which compresses much better.
+    """
+
+    def __init__(self, codec, dtype, shape, shuffled, data):
+        self.codec = codec
+        self.dtype = dtype
+        self.shape = shape
+        self.shuffled = shuffled
+        self.data = data
+
+    def __repr__(self):
+        return 'CompressedArray(%s, %s, %r, %d bytes)' % (
+            self.codec, self.dtype, self.shape, len(self.data))
+
+
+def _compressionCodec(codec):
+    """
+    Pick an available compression codec.
+
+    :param codec: the preferred codec: 'zstd', 'lz4', or 'zlib'.  Anything
+        else picks the fastest available codec.
+    :returns: the name of an available codec.
+    """
+    if codec == 'zlib' or (codec == 'zstd' and zstandard is None) or (
+            codec == 'lz4' and lz4 is None):
+        return 'zlib'
+    if codec in {'zstd', 'lz4'}:
+        return codec
+    return 'zstd' if zstandard is not None else 'lz4' if lz4 is not None else 'zlib'
+
+
+def compressValue(value):
+    """
+    Compress a value for storage in a cache.  Only numpy arrays of numbers
+    that are at least as large as the ``cache_compression_threshold`` config
+    value are compressed, and only if ``cache_compression`` is set.
+
+    :param value: the value to store.
+    :returns: either a CompressedArray or the original value if it wasn't
+        compressed.
+    """
+    codec = config.getConfig('cache_compression')
+    if (not codec or not isinstance(value, np.ndarray) or value.dtype.kind not in 'biufc' or
+            value.nbytes < (config.getConfig('cache_compression_threshold') or 0) or
+            not value.nbytes):
+        return value
+    codec = _compressionCodec(str(codec).lower())
+    itemsize = value.dtype.itemsize
+    raw = np.ascontiguousarray(value).reshape(-1).view(np.uint8)
+    shuffled = itemsize > 1
+    if shuffled:
+        raw = raw.reshape(-1, itemsize).T
+    raw = raw.tobytes()
+    if codec == 'zstd':
+        data = zstandard.ZstdCompressor(level=1).compress(raw)
+    elif codec == 'lz4':
+        data = lz4.frame.compress(raw)
+    else:
+        data = zlib.compress(raw, 1)
+    if len(data) > len(raw) * 0.9:
+        return value
+    return CompressedArray(codec, value.dtype.str, value.shape, shuffled, data)
+
+
+def decompressValue(value):
+    """
+    Decompress a value that was stored in a cache.
+
+    :param value: a value from the cache.
+    :returns: the original value.  This raises a ValueError if the value was
+        compressed with a codec that isn't available.
+    """
+    if not isinstance(value, CompressedArray):
+        return value
+    if value.codec == 'zstd':
+        if zstandard is None:
+            msg = 'zstandard is needed to read this cached value'
+            raise ValueError(msg)
+        raw = zstandard.ZstdDecompressor().decompress(value.data)
+    elif value.codec == 'lz4':
+        if lz4 is None:
+            msg = 'lz4 is needed to read this cached value'
+            raise ValueError(msg)
+        raw = lz4.frame.decompress(value.data)
+    else:
+        raw = zlib.decompress(value.data)
+    dtype = np.dtype(value.dtype)
+    raw = np.frombuffer(raw, dtype=np.uint8)
+    if value.shuffled:
+        raw = raw.reshape(dtype.itemsize, -1).T
+    return np.array(raw, order='C').reshape(-1).view(dtype).reshape(value.shape)
+
+
+class LRUCache(cachetools.LRUCache):
+    """
+    An in-process LRU cache that counts how many values it has evicted.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.evictions = 0
+
+    def popitem(self):
+        # cachetools calls popitem when it needs room for a new value
+        item = super().popitem()
+        self.evictions += 1
+        return item
+
+    def clear(self):
+        # clear removes values with popitem, but these aren't evictions
+        evictions = self.evictions
+        super().clear()
+        self.evictions = evictions
 
 
 class BaseCache(cachetools.Cache):
@@ -60,6 +213,32 @@ class BaseCache(cachetools.Cache):
         # hashedKey = self._hashKey(key)
         raise NotImplementedError
 
+    def getMany(self, keys):
+        """
+        Get several values from the cache.  Caches that can fetch several
+        values in one round trip should override this.
+
+        :param keys: a list of keys.
+        :returns: a dictionary of the keys that were found and their values.
+        """
+        results = {}
+        for key in keys:
+            try:
+                results[key] = self[key]
+            except (KeyError, ValueError):
+                pass
+        return results
+
+    def setMany(self, items):
+        """
+        Add several values to the cache.  Caches that can store several
+        values in one round trip should override this.
+
+        :param items: a dictionary of keys and values.
+        """
+        for key, value in items.items():
+            self[key] = value
+
     @property
     def curritems(self):
         raise NotImplementedError
@@ -1,34 +1,72 @@
+import contextlib
 import functools
 import threading
+import time
 import uuid
 
+import cachetools
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
 try:
     import resource
 except ImportError:
     resource = None
 
 from .. import config
+from ..exceptions import TileSourceAssetstoreError, TileSourceError, TileSourceFileNotFoundError
+from .base import LRUCache
 from .cachefactory import CacheFactory, pickAvailableCache
+from .metrics import recordCacheEvent
+from .sourcecache import SourceCache
 
 _tileCache = None
 _tileLock = None
 
+_decodedTileCache = None
+_decodedTileLock = None
+# Per-thread record of the tile source and key of the getTile call whose
+# decoded tile should be added to the decoded tile cache
+_decodedTileState = threading.local()
+
+_decodedStripCache = None
+_decodedStripLock = None
+
+_negativeCache = None
+_negativeLock = None
+
 _cacheLockKeyToken = '_cacheLock_key'
 
+# Calls of cached methods that are in progress, so that concurrent calls with
+# the same key wait for the result rather than repeating the work.
+_inFlight = {}
+_inFlightLock = threading.Lock()
+# The most distinct in-progress calls that are tracked.  Beyond this, calls
+# are not coordinated.
+MaximumInFlightCalls = 1000
+
 
 # If we have a resource module, ask to use as many file handles as the hard
-# limit allows, then calculate how may tile sources we can have open based on
-# the actual limit.
+# limit allows, then calculate how may tile sources and pooled file handles we
+# can have open based on the actual limit.
 MaximumTileSources = 10
+MaximumPooledHandles = 64
 if resource:
     try:
         SoftNoFile, HardNoFile = resource.getrlimit(resource.RLIMIT_NOFILE)
         resource.setrlimit(resource.RLIMIT_NOFILE, (HardNoFile, HardNoFile))
         SoftNoFile, HardNoFile = resource.getrlimit(resource.RLIMIT_NOFILE)
-        # Reserve some file handles for general use, and expect that tile
-        # sources could use many handles each.  This is conservative, since
-        # running out of file handles breaks the program in general.
-        MaximumTileSources = max(3, (SoftNoFile - 10) / 20)
+        # Reserve some file handles for general use.  Half of the rest are
+        # shared by handles that are closed when idle, such as those of tiff
+        # directories (see HandlePool).  Tile sources that don't pool their
+        # handles are expected to use a few handles each.  This is
+        # conservative, since running out of file handles breaks the program
+        # in general.
+        MaximumPooledHandles = max(16, (SoftNoFile - 10) // 2)
+        MaximumTileSources = max(3, (SoftNoFile - 10) // 2 // 4)
     except Exception:
         pass
 
@@ -39,8 +77,8 @@ CacheProperties = {
         # individual tiles
         'itemExpectedSize': 24 * 1024 ** 2,
         'maxItems': MaximumTileSources,
-        # The cache timeout is not currently being used, but it is set here in
-        # case we ever choose to implement it.
+        # Sources that haven't been used for this many seconds are evicted.
+        # This can be changed with the cache_tilesource_timeout config value.
         'cacheTimeout': 300,
     },
 }
@@ -72,50 +110,368 @@ def methodcache(key=None):  # noqa
     def decorator(func):
         @functools.wraps(func)
         def wrapper(self, *args, **kwargs):
-            k = key(*args, **kwargs) if key else self.wrapKey(*args, **kwargs)
+            k = _methodcacheKey(self, key, args, kwargs)
+            # Objects with their own caches, such as tiff directories, can use
+            # the same keys for different values, so concurrent calls are
+            # coordinated and errors are remembered per cache.
+            scopedKey = (id(self.cache), k)
+            _raiseRecordedError(self, func, scopedKey)
             lock = getattr(self, 'cache_lock', None)
-            ck = getattr(self, '_classkey', None)
-            if lock:
-                with self.cache_lock:
-                    if hasattr(self, '_classkeyLock'):
-                        if self._classkeyLock.acquire(blocking=False):
-                            self._classkeyLock.release()
-                        else:
-                            ck = getattr(self, '_unlocked_classkey', ck)
-            if ck:
-                k = ck + ' ' + k
+            start = time.perf_counter()
             try:
                 if lock:
                     with self.cache_lock:
-                        return self.cache[k]
+                        v = self.cache[k]
                 else:
-                    return self.cache[k]
+                    v = self.cache[k]
             except KeyError:
                 pass  # key not found
             except ValueError:
                 # this can happen if a different version of python wrote the record
                 pass
-            v = func(self, *args, **kwargs)
+            else:
+                _recordMethodcacheEvent(self, func, 'hit', time.perf_counter() - start)
+                return v
+            _recordMethodcacheEvent(self, func, 'miss', time.perf_counter() - start)
+            flight, leader = _joinInFlight(scopedKey)
+            if not leader and flight is not None:
+                if _waitInFlight(scopedKey, flight):
+                    return flight['value']
+                # The leader may have failed with an error that was recorded
+                _raiseRecordedError(self, func, scopedKey)
             try:
-                if lock:
-                    with self.cache_lock:
-                        self.cache[k] = v
-                else:
-                    self.cache[k] = v
-            except ValueError:
-                pass  # value too large
-            except (KeyError, RuntimeError):
-                # the key was refused for some reason
-                config.getConfig('logger').debug(
-                    'Had a cache KeyError while trying to store a value to key %r' % (k))
+                start = time.perf_counter()
+                v = func(self, *args, **kwargs)
+                computed = time.perf_counter()
+                _recordMethodcacheEvent(self, func, 'compute', computed - start)
+                _storeInCache(self, k, v, computed - start)
+                _recordMethodcacheEvent(self, func, 'store', time.perf_counter() - computed)
+                if leader:
+                    flight['value'] = v
+            except TileSourceError as exc:
+                _recordError(self, func, scopedKey, exc)
+                raise
+            finally:
+                if leader:
+                    _leaveInFlight(scopedKey, flight)
             return v
+
+        def getCachedMany(self, calls):
+            """
+            Get the cached results of several calls of the wrapped method with
+            a single cache lookup.  Calls whose results aren't cached are not
+            computed.
+
+            :param self: the object whose method is cached.
+            :param calls: a list of (args, kwargs) tuples, one per call.
+            :returns: a dictionary of the index of each call whose result was
+                cached and its result.
+            """
+            keys = [_methodcacheKey(self, key, args, kwargs) for args, kwargs in calls]
+            found = _getManyFromCache(self, keys)
+            if found:
+                _recordMethodcacheEvent(self, func, 'hit', count=len(found))
+            # Misses are recorded when the uncached calls are made
+            return {idx: found[k] for idx, k in enumerate(keys) if k in found}
+
+        wrapper.getCachedMany = getCachedMany
         return wrapper
     return decorator
 
 
+def _recordMethodcacheEvent(obj, func, event, seconds=None, count=1):
+    """
+    Record a cache event of a method wrapped with methodcache.  Events are
+    grouped by class and method, and are attributed to the tile cache if the
+    object uses it.
+
+    :param obj: the object whose method is cached.
+    :param func: the wrapped method.
+    :param event: the event name.  See recordCacheEvent.
+    :param seconds: the duration of the event or None.
+    :param count: the number of events.
+    """
+    cacheName = 'tileCache' if obj.cache is _tileCache else 'methodcache'
+    recordCacheEvent(cacheName, '%s.%s' % (obj.__class__.__name__, func.__name__),
+                     event, seconds, count)
+
+
+def _recordError(obj, func, key, exc):
+    """
+    Record an error from a method wrapped with methodcache in the negative
+    cache, so that repeating the call soon raises the same error without
+    doing the work again.  Errors from assetstores and missing files may be
+    transient and are not recorded.
+
+    :param obj: the object whose method is cached.
+    :param func: the wrapped method.
+    :param key: the cache key of the call.
+    :param exc: the exception raised by the call.
+    """
+    if isinstance(exc, (TileSourceAssetstoreError, TileSourceFileNotFoundError)):
+        return
+    cache, cacheLock = getNegativeCache()
+    if cache is None:
+        return
+    # Keep the class and arguments rather than the exception so that its
+    # traceback doesn't keep the frames of the call alive
+    with cacheLock:
+        cache[key] = (exc.__class__, exc.args)
+    recordCacheEvent('negativeCache', '%s.%s' % (obj.__class__.__name__, func.__name__),
+                     'store')
+
+
+def _raiseRecordedError(obj, func, key):
+    """
+    If a recent call with the same cache key failed, raise the same error.
+
+    :param obj: the object whose method is cached.
+    :param func: the wrapped method.
+    :param key: the cache key of the call.
+    """
+    cache, cacheLock = _negativeCache, _negativeLock
+    if not cache:
+        return
+    with cacheLock:
+        entry = cache.get(key)
+    if entry is None:
+        return
+    try:
+        exc = entry[0](*entry[1])
+    except Exception:
+        return
+    recordCacheEvent('negativeCache', '%s.%s' % (obj.__class__.__name__, func.__name__),
+                     'hit')
+    raise exc
+
+
+def _methodcacheKey(obj, key, args, kwargs):
+    """
+    Compute the key that methodcache uses for a call.
+
+    :param obj: the object whose method is cached.
+    :param key: the key function passed to methodcache or None.
+    :param args: the positional arguments of the call.
+    :param kwargs: the keyword arguments of the call.
+    :returns: the cache key.
+    """
+    k = key(*args, **kwargs) if key else obj.wrapKey(*args, **kwargs)
+    lock = getattr(obj, 'cache_lock', None)
+    ck = getattr(obj, '_classkey', None)
+    if lock:
+        with obj.cache_lock:
+            if hasattr(obj, '_classkeyLock'):
+                if obj._classkeyLock.acquire(blocking=False):
+                    obj._classkeyLock.release()
+                else:
+                    ck = getattr(obj, '_unlocked_classkey', ck)
+    if ck:
+        k = ck + ' ' + k
+    return k
+
+
+def _getManyFromCache(obj, keys):
+    """
+    Get several values from the cache of an object used by methodcache.
+    Caches with a getMany method fetch all of the values at once.
+
+    :param obj: the object with the cache and optional cache_lock.
+    :param keys: a list of cache keys.
+    :returns: a dictionary of the keys that were found and their values.
+    """
+    lock = getattr(obj, 'cache_lock', None)
+    with lock if lock else contextlib.nullcontext():
+        if hasattr(obj.cache, 'getMany'):
+            return obj.cache.getMany(keys)
+        found = {}
+        for k in keys:
+            try:
+                found[k] = obj.cache[k]
+            except (KeyError, ValueError):
+                pass
+        return found
+
+
+def _storeInCache(obj, key, value, cost=None):
+    """
+    Store a value in the cache of an object used by methodcache.
+
+    :param obj: the object with the cache and optional cache_lock.
+    :param key: the cache key.
+    :param value: the value to store.
+    :param cost: the number of seconds it took to compute the value.  This is
+        passed to caches that weigh recompute cost.
+    """
+    lock = getattr(obj, 'cache_lock', None)
+    store = obj.cache.__setitem__
+    if hasattr(obj.cache, 'setWithCost'):
+        store = functools.partial(obj.cache.setWithCost, cost=cost)
+    try:
+        if lock:
+            with obj.cache_lock:
+                store(key, value)
+        else:
+            store(key, value)
+    except ValueError:
+        pass  # value too large
+    except (KeyError, RuntimeError):
+        # the key was refused for some reason
+        config.getConfig('logger').debug(
+            'Had a cache KeyError while trying to store a value to key %r' % (key))
+
+
+def _joinInFlight(key):
+    """
+    Register interest in computing the value for a cache key.  The first
+    caller for a key becomes its leader and computes the value; later callers
+    can wait for the leader to finish.
+
+    :param key: the cache key.
+    :returns: a record of the in-progress call or None if calls are not being
+        coordinated, and True if this caller is the leader.
+    """
+    timeout = config.getConfig('cache_inflight_timeout')
+    if timeout is not None and timeout <= 0:
+        return None, False
+    with _inFlightLock:
+        flight = _inFlight.get(key)
+        if flight is not None:
+            # A recursive call from the leader can't wait for itself
+            if flight['thread'] == threading.get_ident():
+                return None, False
+            return flight, False
+        if len(_inFlight) >= MaximumInFlightCalls:
+            return None, False
+        flight = _inFlight[key] = {
+            'done': threading.Event(),
+            'thread': threading.get_ident(),
+        }
+        return flight, True
+
+
+def _waitInFlight(key, flight):
+    """
+    Wait for the leader of an in-progress call to finish.
+
+    :param key: the cache key.
+    :param flight: the record from _joinInFlight.
+    :returns: True if the leader produced a value, which is flight['value'].
+    """
+    timeout = config.getConfig('cache_inflight_timeout')
+    if not flight['done'].wait(timeout if timeout and timeout > 0 else None):
+        config.getConfig('logger').debug(
+            'Timed out waiting for a concurrent call with key %r' % (key, ))
+        return False
+    return 'value' in flight
+
+
+def _leaveInFlight(key, flight):
+    """
+    Finish an in-progress call and wake any callers waiting for it.  If the
+    leader failed, the waiting callers compute the value themselves.
+
+    :param key: the cache key.
+    :param flight: the record from _joinInFlight.
+    """
+    with _inFlightLock:
+        if _inFlight.get(key) is flight:
+            del _inFlight[key]
+    flight['done'].set()
+
+
+def decodedtilecache(func):
+    """
+    Decorator for the getTile method of a tile source that keeps decoded tiles
+    in a size-bounded in-process cache.  Decoded tiles are keyed by the
+    unstyled source, tile position, and frame, so requesting a tile with a
+    different style or encoding styles and encodes the decoded tile rather
+    than reading and decoding it again.  This must be applied inside of
+    methodcache, which caches the final output.
+
+    The tile source must provide _decodedTileKey and _outputDecodedTile and
+    pass decoded tiles to storeDecodedTile.
+    """
+    @functools.wraps(func)
+    def wrapper(self, x, y, z, pilImageAllowed=False, numpyAllowed=False, **kwargs):
+        key = self._decodedTileKey(x, y, z, **kwargs)
+        cache, cacheLock = getDecodedTileCache() if key is not None else (None, None)
+        if cache is not None:
+            with cacheLock:
+                entry = cache.get(key)
+            if entry is not None:
+                result = self._outputDecodedTile(
+                    entry, x, y, z, pilImageAllowed, numpyAllowed, **kwargs)
+                if result is not None:
+                    recordCacheEvent('decodedTileCache', self.__class__.__name__, 'hit')
+                    return result
+            recordCacheEvent('decodedTileCache', self.__class__.__name__, 'miss')
+        previous = getattr(_decodedTileState, 'capture', None)
+        _decodedTileState.capture = (self, key) if cache is not None else None
+        try:
+            return func(self, x, y, z, pilImageAllowed=pilImageAllowed,
+                        numpyAllowed=numpyAllowed, **kwargs)
+        finally:
+            _decodedTileState.capture = previous
+    return wrapper
+
+
+def storeDecodedTile(source, entry):
+    """
+    Add a decoded tile to the decoded tile cache if it was decoded by a
+    getTile call of the source that is in progress on the current thread.
+
+    :param source: the tile source that decoded the tile.
+    :param entry: a tuple of the decoded numpy tile, the tile encoding the
+        source provided, and whether a style may be applied to the tile.
+    """
+    capture = getattr(_decodedTileState, 'capture', None)
+    if capture is None or capture[0] is not source:
+        return
+    # Only the first tile output by a getTile call is its decoded tile
+    _decodedTileState.capture = None
+    cache, cacheLock = getDecodedTileCache()
+    tile = entry[0]
+    if not tile.flags.owndata:
+        # Don't keep a larger array alive via a view
+        entry = (tile.copy(), ) + tuple(entry[1:])
+    try:
+        with cacheLock:
+            cache[capture[1]] = entry
+    except ValueError:
+        pass  # value too large
+
+
+def _getSourceCache(numItems, cacheName, timeout=None):
+    """
+    Create an in-process cache of tile sources.  Besides the number of
+    sources, this limits the estimated memory used by the sources to
+    1 / (cache_<name>_memory_portion) of the total memory, evicts sources
+    that have been idle for cache_<name>_timeout seconds, and evicts sources
+    while less than cache_<name>_memory_pressure percent of the system memory
+    is available.
+
+    :param numItems: the maximum number of sources.
+    :param cacheName: the name of the cache used for configuration values.
+    :param timeout: the idle timeout in seconds if it is not configured.
+    :returns: a cache and a lock.
+    """
+    portion = max(int(config.getConfig(f'cache_{cacheName}_memory_portion', 8) or 8), 1)
+    memory = psutil.virtual_memory().total if psutil else 1024 ** 3
+    configTimeout = config.getConfig(f'cache_{cacheName}_timeout')
+    if configTimeout is not None:
+        timeout = configTimeout
+    cache = SourceCache(
+        CacheFactory().getCacheSize(numItems, cacheName=cacheName),
+        maxFootprint=memory // portion,
+        timeout=float(timeout) if timeout else None,
+        minAvailable=config.getConfig(f'cache_{cacheName}_memory_pressure'))
+    return cache, threading.Lock()
+
+
 class LruCacheMetaclass(type):
     namedCaches = {}
     classCaches = {}
+    classCacheNames = {}
 
     def __new__(metacls, name, bases, namespace, **kwargs):  # noqa - N804
         # Get metaclass parameters by finding and removing them from the class
@@ -148,11 +504,14 @@ class LruCacheMetaclass(type):
             cacheName = cls
 
         if LruCacheMetaclass.namedCaches.get(cacheName) is None:
-            cache, cacheLock = CacheFactory().getCache(
-                numItems=maxSize,
-                cacheName=cacheName,
-                inProcess=True,
-            )
+            if CacheProperties.get(cacheName, {}).get('itemExpectedSize'):
+                cache, cacheLock = _getSourceCache(maxSize, cacheName, timeout)
+            else:
+                cache, cacheLock = CacheFactory().getCache(
+                    numItems=maxSize,
+                    cacheName=cacheName,
+                    inProcess=True,
+                )
             LruCacheMetaclass.namedCaches[cacheName] = (cache, cacheLock)
             config.getConfig('logger').debug(
                 'Created LRU Cache for %r with %d maximum size' % (cacheName, cache.maxsize))
@@ -165,6 +524,7 @@ class LruCacheMetaclass(type):
         # cls is hashable though, so use it to lookup the cache, in case an
         # identically-named class gets redefined
         LruCacheMetaclass.classCaches[cls] = (cache, cacheLock)
+        LruCacheMetaclass.classCacheNames[cls] = cacheName
 
         return cls
 
@@ -188,11 +548,14 @@ class LruCacheMetaclass(type):
         else:
             key = strhash(args[0], kwargs)
         key = cls.__name__ + ' ' + key
+        cacheName = LruCacheMetaclass.classCacheNames.get(cls)
+        start = time.perf_counter()
         with cacheLock:
             try:
                 result = cache[key]
                 if (not isinstance(result, tuple) or len(result) != 2 or
                         result[0] != _cacheLockKeyToken):
+                    recordCacheEvent(cacheName, cls.__name__, 'hit', time.perf_counter() - start)
                     return result
                 cacheLockForKey = result[1]
             except KeyError:
@@ -207,9 +570,13 @@ class LruCacheMetaclass(type):
                     result = cache[key]
                     if (not isinstance(result, tuple) or len(result) != 2 or
                             result[0] != _cacheLockKeyToken):
+                        recordCacheEvent(
+                            cacheName, cls.__name__, 'hit', time.perf_counter() - start)
                         return result
                 except KeyError:
                     pass
+            recordCacheEvent(cacheName, cls.__name__, 'miss', time.perf_counter() - start)
+            start = time.perf_counter()
             # This conditionally copies a non-styled class and adds a style.
             if (kwargs.get('style') and hasattr(cls, '_setStyle') and
                     kwargs.get('style') != getattr(cls, '_unstyledStyle', None)):
@@ -227,6 +594,8 @@ class LruCacheMetaclass(type):
                 result._derivedSource = True
                 # Has to be after setting the _unstyledInstance
                 result._setStyle(kwargs['style'])
+                recordCacheEvent(
+                    cacheName, cls.__name__, 'compute', time.perf_counter() - start)
                 with cacheLock:
                     cache[key] = result
                     return result
@@ -247,6 +616,7 @@ class LruCacheMetaclass(type):
                 subkwargs['style'] = getattr(cls, '_unstyledStyle', None)
                 instance._unstyledInstance = subresult = cls(*args, **subkwargs)
                 instance._derivedSource = True
+            recordCacheEvent(cacheName, cls.__name__, 'compute', time.perf_counter() - start)
             with cacheLock:
                 cache[key] = instance
         return instance
@@ -273,3 +643,92 @@ def isTileCacheSetup():
     :returns: True if _tileCache is not None.
     """
     return _tileCache is not None
+
+
+def getDecodedTileCache():
+    """
+    Get the in-process cache of decoded tiles and its lock.  The cache holds
+    up to 1/(cache_decodedtile_memory_portion) of the total memory.
+
+    :returns: the decoded tile cache and lock.  The cache is None if it is
+        disabled.
+    """
+    global _decodedTileCache, _decodedTileLock
+
+    if _decodedTileLock is None:
+        portion = config.getConfig('cache_decodedtile_memory_portion', 64)
+        if portion and portion > 0:
+            memory = psutil.virtual_memory().total if psutil else 1024 ** 3
+            _decodedTileCache = LRUCache(
+                int(memory // portion), getsizeof=lambda entry: entry[0].nbytes)
+        _decodedTileLock = threading.Lock()
+    return _decodedTileCache, _decodedTileLock
+
+
+def getDecodedStripCache():
+    """
+    Get the in-process cache of decoded strips of untiled images and its lock.
+    A strip spans the width of its image, so it is shared by every tile in a
+    row.  The cache holds up to 1/(cache_decodedstrip_memory_portion) of the
+    total memory.
+
+    :returns: the decoded strip cache and lock.  The cache is None if it is
+        disabled.
+    """
+    global _decodedStripCache, _decodedStripLock
+
+    if _decodedStripLock is None:
+        portion = config.getConfig('cache_decodedstrip_memory_portion', 64)
+        if portion and portion > 0:
+            memory = psutil.virtual_memory().total if psutil else 1024 ** 3
+            _decodedStripCache = LRUCache(
+                int(memory // portion), getsizeof=lambda entry: entry.nbytes)
+        _decodedStripLock = threading.Lock()
+    return _decodedStripCache, _decodedStripLock
+
+
+def isDecodedStripCacheSetup():
+    """
+    Return True if the decoded strip cache has been created.
+
+    :returns: True if the decoded strip cache exists.
+    """
+    return _decodedStripCache is not None
+
+
+def getNegativeCache():
+    """
+    Get the in-process cache of recent errors from cached methods, such as
+    requests for tiles that are out of range or can't be read, and its lock.
+    Errors are kept for ``cache_negative_ttl`` seconds.
+
+    :returns: the negative cache and lock.  The cache is None if it is
+        disabled.
+    """
+    global _negativeCache, _negativeLock
+
+    if _negativeLock is None:
+        ttl = config.getConfig('cache_negative_ttl', 10)
+        if ttl and ttl > 0:
+            _negativeCache = cachetools.TTLCache(
+                int(config.getConfig('cache_negative_maximum', 10000) or 10000), ttl)
+        _negativeLock = threading.Lock()
+    return _negativeCache, _negativeLock
+
+
+def isNegativeCacheSetup():
+    """
+    Return True if the negative cache has been created.
+
+    :returns: True if the negative cache exists.
+    """
+    return _negativeCache is not None
+
+
+def isDecodedTileCacheSetup():
+    """
+    Return True if the decoded tile cache has been created.
+
+    :returns: True if the decoded tile cache exists.
+    """
+    return _decodedTileCache is not None
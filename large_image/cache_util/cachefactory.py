@@ -17,8 +17,6 @@
 import math
 import threading
 
-import cachetools
-
 try:
     import psutil
 except ImportError:
@@ -31,9 +29,12 @@ except ImportError:
 
 from .. import config
 from ..exceptions import TileCacheError
+from .base import LRUCache
+from .tinylfu import TinyLFUCache
 
 try:
     from .memcache import MemCache
+    from .tieredcache import TieredCache
 except ImportError:
     MemCache = None
 
@@ -69,6 +70,7 @@ def loadCaches(entryPointName='large_image.cache', sourceDict=_availableCaches):
     if MemCache is not None:
         # TODO: put this in an entry point for a new package
         _availableCaches['memcached'] = MemCache
+        _availableCaches['tiered'] = TieredCache
     # NOTE: `python` cache is viewed as a fallback and isn't listed in `availableCaches`
 
 
@@ -127,18 +129,21 @@ def getFirstAvailableCache():
 class CacheFactory:
     logged = False
 
+    def _getMemoryPortion(self, cacheName=None):
+        defaultPortion = 32
+        try:
+            portion = int(config.getConfig('cache_python_memory_portion', 0))
+            if cacheName:
+                portion = max(portion, int(config.getConfig(
+                    f'cache_{cacheName}_memory_portion', portion)))
+            portion = max(portion or defaultPortion, 3)
+        except ValueError:
+            portion = defaultPortion
+        return portion
+
     def getCacheSize(self, numItems, cacheName=None):
         if numItems is None:
-            defaultPortion = 32
-            try:
-                portion = int(config.getConfig('cache_python_memory_portion', 0))
-                if cacheName:
-                    portion = max(portion, int(config.getConfig(
-                        f'cache_{cacheName}_memory_portion', portion)))
-                portion = max(portion or defaultPortion, 3)
-            except ValueError:
-                portion = defaultPortion
-            numItems = pickAvailableCache(256**2 * 4 * 2, portion)
+            numItems = pickAvailableCache(256**2 * 4 * 2, self._getMemoryPortion(cacheName))
         if cacheName:
             try:
                 maxItems = int(config.getConfig(f'cache_{cacheName}_maximum', 0))
@@ -159,13 +164,22 @@ class CacheFactory:
 
         cache = None
         if not inProcess and cacheBackend in _availableCaches:
-            cache, cacheLock = _availableCaches[cacheBackend].getCache()
+            try:
+                cache, cacheLock = _availableCaches[cacheBackend].getCache()
+            except TileCacheError as exc:
+                config.getConfig('logger').info(f'Cannot use {cacheBackend} for caching: {exc}')
         elif not inProcess and cacheBackend is None:
             cache, cacheLock = getFirstAvailableCache()
 
         if cache is None:  # fallback backend or inProcess
             cacheBackend = 'python'
-            cache = cachetools.LRUCache(self.getCacheSize(numItems, cacheName=cacheName))
+            policy = str(config.getConfig('cache_python_policy') or 'lru').lower()
+            if not inProcess and numItems is None and policy == 'tinylfu':
+                # Tiles have known sizes, so use a byte budget
+                memory = psutil.virtual_memory().total if psutil else 1024 ** 3
+                cache = TinyLFUCache(memory // self._getMemoryPortion(cacheName))
+            else:
+                cache = LRUCache(self.getCacheSize(numItems, cacheName=cacheName))
             cacheLock = threading.Lock()
 
         if not inProcess and not CacheFactory.logged:
@@ -0,0 +1,299 @@
+#############################################################################
+#  Copyright Kitware Inc.
+#
+#  Licensed under the Apache License, Version 2.0 ( the "License" );
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#############################################################################
+
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from typing import Tuple
+
+from .. import config
+from ..exceptions import TileCacheError
+from .base import BaseCache, compressValue, decompressValue
+
+
+class DiskCache(BaseCache):
+    """
+    Use a sqlite database on a local disk as the backing cache.  The cache
+    persists across restarts and can be shared by multiple processes on the
+    same host.  When the database holds more than its maximum size, the least
+    recently or least frequently used values are removed.
+    """
+
+    # The cache is not cleared when the process exits
+    persistent = True
+
+    # Access times and counts are recorded in batches, since recording each
+    # read would require a write transaction.
+    accessFlushCount = 100
+    accessFlushInterval = 10  # seconds
+    # The most keys requested in a single query
+    queryBatchSize = 500
+
+    def __init__(self, path, maxsize=10 * 1024 ** 3, eviction='lru',
+                 getsizeof=None, timeout=30):
+        """
+        Create a disk cache.
+
+        :param path: the path of the sqlite database file.  It is created if
+            it does not exist.
+        :param maxsize: the maximum number of bytes of values to store.
+        :param eviction: either 'lru' to remove the least recently used
+            values or 'lfu' to remove the least frequently used values when
+            the cache is full.
+        :param getsizeof: unused; the size of a value is the length of its
+            pickled form.
+        :param timeout: the number of seconds to wait for the database if it
+            is locked by another process.
+        """
+        super().__init__(0, getsizeof=getsizeof)
+        if eviction not in {'lru', 'lfu'}:
+            msg = f'Unknown disk cache eviction policy {eviction!r}'
+            raise TileCacheError(msg)
+        self.path = os.path.expanduser(str(path))
+        self._maxsize = int(maxsize)
+        self._eviction = eviction
+        self._timeout = timeout
+        self._connLock = threading.RLock()
+        self._conn = None
+        self._connPid = None
+        self._accessed = {}
+        self._lastFlush = time.time()
+        self._sinceCull = 0
+        # The number of values removed by this process to free space
+        self.evictions = 0
+        dirname = os.path.dirname(self.path)
+        if dirname:
+            os.makedirs(dirname, exist_ok=True)
+        with self._connLock:
+            conn = self._connect()
+            with conn:
+                conn.execute(
+                    'CREATE TABLE IF NOT EXISTS tiles (key TEXT PRIMARY KEY, '
+                    'value BLOB, size INTEGER, accessed REAL, hits INTEGER)')
+                conn.execute(
+                    'CREATE INDEX IF NOT EXISTS tiles_accessed ON tiles (accessed)')
+                conn.execute(
+                    'CREATE INDEX IF NOT EXISTS tiles_hits ON tiles (hits, accessed)')
+
+    def __repr__(self):
+        return 'DiskCache(%r)' % self.path
+
+    def __iter__(self):
+        # return invalid iter
+        return None
+
+    def __len__(self):
+        return self.curritems
+
+    def _connect(self):
+        """
+        Get a connection to the database.  Connections are not shared with
+        forked processes.  This must be called with the connection lock held.
+
+        :returns: a sqlite connection.
+        """
+        if self._conn is None or self._connPid != os.getpid():
+            self._conn = sqlite3.connect(
+                self.path, timeout=self._timeout, check_same_thread=False)
+            self._conn.execute('PRAGMA journal_mode=WAL')
+            self._conn.execute('PRAGMA synchronous=NORMAL')
+            self._connPid = os.getpid()
+            self._accessed = {}
+        return self._conn
+
+    def _execute(self, sql, params=(), fetch=None):
+        """
+        Execute a statement in its own transaction.
+
+        :param sql: the statement.
+        :param params: parameters for the statement.
+        :param fetch: None to return the cursor, 'one' to return the first
+            row, or 'all' to return all rows.
+        :returns: the cursor, first row, or list of rows.
+        """
+        with self._connLock:
+            conn = self._connect()
+            with conn:
+                cursor = conn.execute(sql, params)
+                if fetch == 'all':
+                    return cursor.fetchall()
+                return cursor.fetchone() if fetch == 'one' else cursor
+
+    def __contains__(self, key):
+        try:
+            return self._execute(
+                'SELECT 1 FROM tiles WHERE key = ?', (self._hashKey(key), ),
+                fetch='one') is not None
+        except sqlite3.Error:
+            return False
+
+    def __delitem__(self, key):
+        hashedKey = self._hashKey(key)
+        with self._connLock:
+            self._accessed.pop(hashedKey, None)
+            if not self._execute('DELETE FROM tiles WHERE key = ?', (hashedKey, )).rowcount:
+                raise KeyError(key)
+
+    def __getitem__(self, key):
+        hashedKey = self._hashKey(key)
+        try:
+            row = self._execute(
+                'SELECT value FROM tiles WHERE key = ?', (hashedKey, ), fetch='one')
+        except sqlite3.Error:
+            self.logError(sqlite3.Error, config.getConfig('logprint').exception,
+                          'Failed to read from disk cache')
+            row = None
+        if row is None:
+            return self.__missing__(key)
+        self._recordAccess(hashedKey)
+        return decompressValue(pickle.loads(row[0]))
+
+    def __setitem__(self, key, value):
+        hashedKey = self._hashKey(key)
+        value = pickle.dumps(compressValue(value), protocol=pickle.HIGHEST_PROTOCOL)
+        if len(value) > self._maxsize:
+            return
+        try:
+            with self._connLock:
+                self._execute(
+                    'INSERT OR REPLACE INTO tiles (key, value, size, accessed, hits) '
+                    'VALUES (?, ?, ?, ?, 1)', (hashedKey, value, len(value), time.time()))
+                self._sinceCull += len(value)
+                if self._sinceCull >= self._maxsize // 64:
+                    self._cull()
+        except sqlite3.Error:
+            self.logError(sqlite3.Error, config.getConfig('logprint').exception,
+                          'Failed to write to disk cache')
+
+    def getMany(self, keys):
+        """
+        Get several values from the database with one query.
+
+        :param keys: a list of keys.
+        :returns: a dictionary of the keys that were found and their values.
+        """
+        hashedKeys = {self._hashKey(key): key for key in keys}
+        results = {}
+        hashedList = list(hashedKeys)
+        try:
+            # Stay below sqlite's default limit on query parameters
+            for start in range(0, len(hashedList), self.queryBatchSize):
+                batch = hashedList[start:start + self.queryBatchSize]
+                rows = self._execute(
+                    'SELECT key, value FROM tiles WHERE key IN (%s)' % (
+                        ','.join('?' * len(batch))), batch, fetch='all')
+                for hashedKey, value in rows:
+                    try:
+                        results[hashedKeys[hashedKey]] = decompressValue(pickle.loads(value))
+                    except ValueError:
+                        continue
+                    self._recordAccess(hashedKey)
+        except sqlite3.Error:
+            self.logError(sqlite3.Error, config.getConfig('logprint').exception,
+                          'Failed to read from disk cache')
+        return results
+
+    def _recordAccess(self, hashedKey):
+        """
+        Note that a value was read.  Access times and counts are written to
+        the database periodically.
+
+        :param hashedKey: the hashed key of the value.
+        """
+        with self._connLock:
+            self._accessed[hashedKey] = self._accessed.get(hashedKey, 0) + 1
+            if (len(self._accessed) >= self.accessFlushCount or
+                    time.time() - self._lastFlush >= self.accessFlushInterval):
+                self._flushAccessed()
+
+    def _flushAccessed(self):
+        """
+        Write recorded access times and counts to the database.
+        """
+        with self._connLock:
+            accessed, self._accessed = self._accessed, {}
+            self._lastFlush = time.time()
+            if not accessed:
+                return
+            try:
+                conn = self._connect()
+                with conn:
+                    conn.executemany(
+                        'UPDATE tiles SET accessed = ?, hits = hits + ? WHERE key = ?',
+                        [(self._lastFlush, hits, key) for key, hits in accessed.items()])
+            except sqlite3.Error:
+                self.logError(sqlite3.Error, config.getConfig('logprint').exception,
+                              'Failed to update disk cache access times')
+
+    def _cull(self):
+        """
+        If the database holds more than the maximum size, remove values until
+        it holds no more than 90% of the maximum size.
+        """
+        with self._connLock:
+            self._sinceCull = 0
+            self._flushAccessed()
+            conn = self._connect()
+            with conn:
+                total = conn.execute('SELECT COALESCE(SUM(size), 0) FROM tiles').fetchone()[0]
+                if total <= self._maxsize:
+                    return
+                excess = total - int(self._maxsize * 0.9)
+                order = 'accessed' if self._eviction == 'lru' else 'hits, accessed'
+                keys = []
+                for key, size in conn.execute(
+                        f'SELECT key, size FROM tiles ORDER BY {order}'):
+                    keys.append((key, ))
+                    excess -= size
+                    if excess <= 0:
+                        break
+                conn.executemany('DELETE FROM tiles WHERE key = ?', keys)
+                self.evictions += len(keys)
+
+    @property
+    def curritems(self):
+        return self._execute('SELECT COUNT(*) FROM tiles', fetch='one')[0]
+
+    @property
+    def currsize(self):
+        return self._execute('SELECT COALESCE(SUM(size), 0) FROM tiles', fetch='one')[0]
+
+    @property
+    def maxsize(self):
+        return self._maxsize
+
+    def clear(self):
+        with self._connLock:
+            self._accessed = {}
+            self._execute('DELETE FROM tiles')
+
+    @staticmethod
+    def getCache() -> Tuple['DiskCache', threading.Lock]:
+        path = config.getConfig('cache_disk_path')
+        if not path:
+            msg = 'cache_disk_path is not set'
+            raise TileCacheError(msg)
+        try:
+            cache = DiskCache(
+                path,
+                maxsize=config.getConfig('cache_disk_size') or 10 * 1024 ** 3,
+                eviction=str(config.getConfig('cache_disk_eviction') or 'lru').lower())
+        except (OSError, sqlite3.Error) as exc:
+            msg = f'Cannot use the disk cache at {path}: {exc}'
+            raise TileCacheError(msg) from exc
+        return cache, threading.Lock()
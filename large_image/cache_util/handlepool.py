@@ -0,0 +1,143 @@
+#############################################################################
+#  Copyright Kitware Inc.
+#
+#  Licensed under the Apache License, Version 2.0 ( the "License" );
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#############################################################################
+
+import collections
+import contextlib
+import threading
+import weakref
+
+from .cache import MaximumPooledHandles
+
+_handlePool = None
+_handlePoolLock = threading.Lock()
+
+
+class HandlePool:
+    """
+    A budget of open file handles shared by all objects that can close their
+    handles when they are idle and reopen them when they are needed, such as
+    the directories of tiff files.  When more handles are open than the budget
+    allows, the handles of the least recently used objects that aren't in use
+    are closed.  Objects keep what they have read from their files, so
+    reopening a handle doesn't read it again.
+
+    Objects in the pool must implement _reopenHandle, which opens the handle
+    if it is closed, and _closeHandle.
+    """
+
+    def __init__(self, maxsize):
+        """
+        Create a handle pool.
+
+        :param maxsize: the maximum number of open handles.  More handles are
+            open if more than this are in use at once.
+        """
+        self.maxsize = maxsize
+        # This is reentrant, since objects may be garbage collected and
+        # discarded while the pool is closing handles.
+        self._lock = threading.RLock()
+        # Weak references to objects with open handles by id, least recently
+        # used first
+        self._open = collections.OrderedDict()
+        self._users = {}
+        # The number of handles closed to stay within the budget
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self._open)
+
+    @contextlib.contextmanager
+    def use(self, owner):
+        """
+        Use the handle of an object, reopening it if the pool closed it.  The
+        handle is not closed by the pool while it is in use.
+
+        :param owner: the object with the handle.
+        """
+        key = id(owner)
+        with self._lock:
+            self._users[key] = self._users.get(key, 0) + 1
+            ref = self._open.pop(key, None)
+            # The id of a discarded object may have been reused
+            self._open[key] = ref if ref is not None and ref() is owner else weakref.ref(owner)
+        try:
+            owner._reopenHandle()
+            self._trim()
+            yield
+        finally:
+            with self._lock:
+                self._users[key] -= 1
+                if not self._users[key]:
+                    del self._users[key]
+
+    def discard(self, owner):
+        """
+        Stop tracking an object, such as when it closes its own handle.
+
+        :param owner: the object with the handle.
+        """
+        with self._lock:
+            ref = self._open.get(id(owner))
+            if ref is not None and ref() in (owner, None):
+                del self._open[id(owner)]
+
+    def _trim(self):
+        """
+        Close the handles of the least recently used objects that aren't in
+        use until no more than the maximum number of handles are open.
+        Objects that were garbage collected are dropped first.
+        """
+        with self._lock:
+            if len(self._open) <= self.maxsize:
+                return
+            for key, ref in list(self._open.items()):
+                if ref() is None:
+                    self._open.pop(key, None)
+            excess = len(self._open) - self.maxsize
+            for key in list(self._open):
+                if excess <= 0:
+                    break
+                if self._users.get(key):
+                    continue
+                ref = self._open.pop(key, None)
+                owner = ref() if ref is not None else None
+                if owner is not None:
+                    owner._closeHandle()
+                    self.evictions += 1
+                    excess -= 1
+
+
+def getHandlePool():
+    """
+    Get the handle pool shared by all tile sources.
+
+    :returns: a HandlePool.
+    """
+    global _handlePool
+
+    with _handlePoolLock:
+        if _handlePool is None:
+            _handlePool = HandlePool(MaximumPooledHandles)
+        return _handlePool
+
+
+def isHandlePoolSetup():
+    """
+    Return True if the handle pool has been created.
+
+    :returns: True if the handle pool is in use.
+    """
+    return _handlePool is not None
@@ -15,17 +15,49 @@
 #############################################################################
 
 import copy
+import pickle
 import threading
 import time
+import uuid
+import zlib
 from typing import Tuple
 
 from .. import config
-from .base import BaseCache
+from .base import BaseCache, compressValue, decompressValue, valueSize
+
+
+class ChunkedValue:
+    """
+    A manifest stored in place of a value that is too large for a single
+    memcached item.  The pickled value is split across chunk keys that
+    include a version, so a read never combines chunks from different writes.
+    """
+
+    def __init__(self, version, count, size, checksum):
+        self.version = version
+        self.count = count
+        self.size = size
+        self.checksum = checksum
+
+    def chunkKeys(self, hashedKey):
+        """
+        Get the keys of the chunks of a value.
+
+        :param hashedKey: the hashed key of the value.
+        :returns: a list of keys.
+        """
+        return ['%s:%s:%d' % (hashedKey, self.version, idx) for idx in range(self.count)]
 
 
 class MemCache(BaseCache):
     """Use memcached as the backing cache."""
 
+    # Values larger than this are split into chunks.  memcached's default
+    # item limit is 1 MiB including the key and item overhead.
+    chunkSize = 1000 * 1000
+    # Values that need more chunks than this are not cached
+    maximumChunks = 64
+
     def __init__(self, url='127.0.0.1', username=None, password=None,
                  getsizeof=None, mustBeAvailable=False):
         global pylibmc
@@ -78,7 +110,10 @@ class MemCache(BaseCache):
     def __getitem__(self, key):
         hashedKey = self._hashKey(key)
         try:
-            return self._client[hashedKey]
+            value = self._client[hashedKey]
+            if isinstance(value, ChunkedValue):
+                value = self._getChunked(hashedKey, value)
+            return decompressValue(value)
         except KeyError:
             return self.__missing__(key)
         except pylibmc.ServerDown:
@@ -94,7 +129,7 @@ class MemCache(BaseCache):
     def __setitem__(self, key, value):
         hashedKey = self._hashKey(key)
         try:
-            self._client[hashedKey] = value
+            self._setValue(hashedKey, compressValue(value))
         except (TypeError, KeyError) as exc:
             valueSize = value.shape if hasattr(value, 'shape') else (
                 value.size if hasattr(value, 'size') else (
@@ -113,12 +148,124 @@ class MemCache(BaseCache):
         except pylibmc.TooBig:
             pass
         except pylibmc.Error as exc:
-            # memcached won't cache items larger than 1 Mb (or a configured
-            # size), but this returns a 'SUCCESS' error.  Raise other errors.
+            # Chunks that are still too large can return a 'SUCCESS' error.
+            # Log other errors.
             if 'SUCCESS' not in repr(exc.args):
                 self.logError(pylibmc.Error, config.getConfig('logprint').exception,
                               'pylibmc exception')
 
+    def getMany(self, keys):
+        """
+        Get several values from memcached in one round trip.  Values that were
+        split into chunks need one more round trip each.
+
+        :param keys: a list of keys.
+        :returns: a dictionary of the keys that were found and their values.
+        """
+        hashedKeys = {self._hashKey(key): key for key in keys}
+        try:
+            found = self._client.get_multi(list(hashedKeys))
+        except pylibmc.ServerDown:
+            self.logError(pylibmc.ServerDown, config.getConfig('logprint').info,
+                          'Memcached ServerDown')
+            self._reconnect()
+            return {}
+        except pylibmc.Error:
+            self.logError(pylibmc.Error, config.getConfig('logprint').exception,
+                          'pylibmc exception')
+            return {}
+        results = {}
+        for hashedKey, value in found.items():
+            try:
+                if isinstance(value, ChunkedValue):
+                    value = self._getChunked(hashedKey, value)
+                results[hashedKeys[hashedKey]] = decompressValue(value)
+            except (KeyError, ValueError, pylibmc.Error):
+                pass
+        return results
+
+    def setMany(self, items):
+        """
+        Add several values to memcached.  Values small enough for a single
+        memcached item are stored in one round trip.
+
+        :param items: a dictionary of keys and values.
+        """
+        small = {}
+        for key, value in items.items():
+            value = compressValue(value)
+            if valueSize(value) < self.chunkSize:
+                small[self._hashKey(key)] = value
+            else:
+                self[key] = value
+        if not small:
+            return
+        try:
+            # set_multi returns the keys that could not be stored; these are
+            # usually too large after pickling, so try to store them in chunks
+            failed = self._client.set_multi(small)
+            for hashedKey in failed or []:
+                self._setValue(hashedKey, small[hashedKey])
+        except pylibmc.ServerDown:
+            self.logError(pylibmc.ServerDown, config.getConfig('logprint').info,
+                          'Memcached ServerDown')
+            self._reconnect()
+        except pylibmc.TooBig:
+            pass
+        except pylibmc.Error as exc:
+            if 'SUCCESS' not in repr(exc.args):
+                self.logError(pylibmc.Error, config.getConfig('logprint').exception,
+                              'pylibmc exception')
+
+    def _setValue(self, hashedKey, value):
+        """
+        Store a value, splitting it into chunks if it is too large for a
+        single memcached item.
+
+        :param hashedKey: the hashed key.
+        :param value: the value to store.
+        """
+        if valueSize(value) < self.chunkSize:
+            try:
+                self._client[hashedKey] = value
+                return
+            except pylibmc.TooBig:
+                pass
+            except pylibmc.Error as exc:
+                # memcached won't cache items larger than 1 Mb (or a
+                # configured size), but this returns a 'SUCCESS' error.
+                if 'SUCCESS' not in repr(exc.args):
+                    raise
+        data = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        count = (len(data) + self.chunkSize - 1) // self.chunkSize
+        if count > self.maximumChunks:
+            return
+        manifest = ChunkedValue(uuid.uuid4().hex, count, len(data), zlib.crc32(data))
+        chunks = {
+            chunkKey: data[idx * self.chunkSize:(idx + 1) * self.chunkSize]
+            for idx, chunkKey in enumerate(manifest.chunkKeys(hashedKey))}
+        # set_multi returns the keys that could not be stored
+        if not self._client.set_multi(chunks):
+            self._client[hashedKey] = manifest
+
+    def _getChunked(self, hashedKey, manifest):
+        """
+        Read a value that was split into chunks.
+
+        :param hashedKey: the hashed key.
+        :param manifest: the ChunkedValue stored at the key.
+        :returns: the value.  This raises a KeyError if any chunk is missing
+            or the chunks don't match the manifest.
+        """
+        keys = manifest.chunkKeys(hashedKey)
+        chunks = self._client.get_multi(keys)
+        if len(chunks) != len(keys):
+            raise KeyError(hashedKey)
+        data = b''.join(chunks[chunkKey] for chunkKey in keys)
+        if len(data) != manifest.size or zlib.crc32(data) != manifest.checksum:
+            raise KeyError(hashedKey)
+        return pickle.loads(data)
+
     @property
     def curritems(self):
         return self._getStat('curr_items')
@@ -131,6 +278,10 @@ class MemCache(BaseCache):
     def maxsize(self):
         return self._getStat('limit_maxbytes')
 
+    @property
+    def evictions(self):
+        return self._getStat('evictions')
+
     def _reconnect(self):
         try:
             self._lastReconnectBackoff = getattr(self, '_lastReconnectBackoff', 2)
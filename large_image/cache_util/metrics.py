@@ -0,0 +1,157 @@
+#############################################################################
+#  Copyright Kitware Inc.
+#
+#  Licensed under the Apache License, Version 2.0 ( the "License" );
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#############################################################################
+
+import bisect
+import threading
+
+from .. import config
+
+# Metrics by cache name, then by group, such as a tile source class
+_metrics = {}
+_metricsLock = threading.Lock()
+
+
+class LatencyHistogram:
+    """
+    Count durations in buckets with fixed upper bounds.
+    """
+
+    # Upper bounds of the buckets in seconds; the last bucket is unbounded
+    bounds = (0.0001, 0.0003, 0.001, 0.003, 0.01, 0.03, 0.1, 0.3, 1, 3, 10)
+
+    def __init__(self):
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.count = 0
+        self.total = 0.0
+
+    def record(self, seconds):
+        """
+        Add a duration to the histogram.
+
+        :param seconds: the duration in seconds.
+        """
+        self.counts[bisect.bisect_left(self.bounds, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+
+    def info(self):
+        """
+        Report on the histogram.
+
+        :returns: a dictionary with 'count', 'total' and 'mean' in seconds,
+            and 'buckets', a dictionary of the upper bound of each bucket in
+            seconds and the number of durations in that bucket.
+        """
+        labels = ['%g' % bound for bound in self.bounds] + ['inf']
+        return {
+            'count': self.count,
+            'total': self.total,
+            'mean': self.total / self.count if self.count else None,
+            'buckets': dict(zip(labels, self.counts)),
+        }
+
+
+class CacheMetrics:
+    """
+    Counts and durations of the cache events of one group of cache users.
+    """
+
+    # Each event has a count and, if a duration is recorded, a histogram.
+    # 'hit' and 'miss' are the time spent looking up a key, 'store' is the
+    # time spent adding a value, and 'compute' is the time spent computing the
+    # value after a miss.
+    events = {
+        'hit': 'hits',
+        'miss': 'misses',
+        'store': 'stores',
+        'compute': 'computes',
+    }
+
+    def __init__(self):
+        self.counts = dict.fromkeys(self.events, 0)
+        self.latency = {}
+
+    def record(self, event, seconds=None, count=1):
+        """
+        Record an event.
+
+        :param event: one of the keys of CacheMetrics.events.
+        :param seconds: the duration of the event or None.
+        :param count: the number of events.
+        """
+        self.counts[event] += count
+        if seconds is not None:
+            if event not in self.latency:
+                self.latency[event] = LatencyHistogram()
+            self.latency[event].record(seconds)
+
+    def info(self):
+        """
+        Report on the metrics.
+
+        :returns: a dictionary with the number of each event, 'hitRate', and
+            'latency', a dictionary of event names and histogram reports.
+        """
+        info = {self.events[event]: count for event, count in self.counts.items()}
+        lookups = info['hits'] + info['misses']
+        info['hitRate'] = info['hits'] / lookups if lookups else None
+        info['latency'] = {event: hist.info() for event, hist in self.latency.items()}
+        return info
+
+
+def recordCacheEvent(cacheName, group, event, seconds=None, count=1):
+    """
+    Record a cache event unless the ``cache_metrics`` config value is False.
+
+    :param cacheName: the name of the cache, such as 'tileCache'.
+    :param group: the user of the cache, such as the name of a tile source
+        class.
+    :param event: one of 'hit', 'miss', 'store', or 'compute'.
+    :param seconds: the duration of the event or None.
+    :param count: the number of events.
+    """
+    if config.getConfig('cache_metrics') is False:
+        return
+    with _metricsLock:
+        groups = _metrics.setdefault(str(cacheName), {})
+        if group not in groups:
+            groups[group] = CacheMetrics()
+        groups[group].record(event, seconds, count)
+
+
+def getCacheMetrics(cacheName=None):
+    """
+    Report the recorded cache events.
+
+    :param cacheName: if specified, only report on this cache.
+    :returns: a dictionary of cache names, each of which is a dictionary of
+        groups and their metrics.  If a cache name was specified, this is
+        just the dictionary of groups.
+    """
+    with _metricsLock:
+        if cacheName is not None:
+            return {group: metrics.info()
+                    for group, metrics in _metrics.get(str(cacheName), {}).items()}
+        return {name: {group: metrics.info() for group, metrics in groups.items()}
+                for name, groups in _metrics.items()}
+
+
+def clearCacheMetrics():
+    """
+    Discard all recorded cache events.
+    """
+    with _metricsLock:
+        _metrics.clear()
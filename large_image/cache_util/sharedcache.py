@@ -0,0 +1,316 @@
+#############################################################################
+#  Copyright Kitware Inc.
+#
+#  Licensed under the Apache License, Version 2.0 ( the "License" );
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#############################################################################
+
+import contextlib
+import hashlib
+import mmap
+import os
+import pickle
+import struct
+import tempfile
+import threading
+from typing import Tuple
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+from .. import config
+from ..exceptions import TileCacheError
+from .base import BaseCache, compressValue, decompressValue
+
+# The file starts with a header of magic, arena size, index slots, and the
+# write position.  This is followed by the index, where each slot is a key
+# hash, the absolute position of a record, and the length of its value.  The
+# arena is a ring buffer of records, each of which is a key hash and a length
+# followed by the pickled value.
+_Magic = b'LITILES1'
+_Header = struct.Struct('<8sQQQ')
+_HeaderSize = 64
+_WritePosOffset = 24
+_WritePos = struct.Struct('<Q')
+_Slot = struct.Struct('<16sQI4x')
+_Record = struct.Struct('<16sQ')
+_BucketSize = 4
+
+
+class SharedMemoryCache(BaseCache):
+    """
+    Use a memory-mapped file, usually on a shared memory file system such as
+    /dev/shm, as the backing cache.  All processes on a host that use the same
+    file share one pool of cached values.
+
+    Values are appended to a ring buffer, so when the pool is full the oldest
+    values are overwritten.  The index is a fixed-size hash table with small
+    buckets.  Writers hold a file lock; readers don't lock, but verify that the
+    record they read was not overwritten while it was copied.
+    """
+
+    # The pool is shared with other processes, so it is not cleared when this
+    # process exits
+    persistent = True
+
+    def __init__(self, path, maxsize, getsizeof=None):
+        """
+        Open or create a shared memory cache.
+
+        :param path: the path of the memory-mapped file.  If the file already
+            exists and is a valid cache, its size is used.
+        :param maxsize: the number of bytes used for values if the file is
+            created.
+        :param getsizeof: unused; the size of a value is the length of its
+            pickled form.
+        """
+        super().__init__(0, getsizeof=getsizeof)
+        if fcntl is None:
+            msg = 'The shared memory cache requires fcntl'
+            raise TileCacheError(msg)
+        self.path = os.path.expanduser(str(path))
+        self._threadLock = threading.Lock()
+        self._fd = None
+        self._pid = None
+        self._openFile()
+        with self._lock():
+            arenaSize, slots = self._readHeader()
+            if not arenaSize:
+                arenaSize, slots = self._createFile(int(maxsize))
+        self._arenaSize = arenaSize
+        self._slots = slots
+        self._buckets = slots // _BucketSize
+        self._arenaStart = _HeaderSize + slots * _Slot.size
+        self._mmap = mmap.mmap(self._fd, self._arenaStart + arenaSize)
+
+    def __repr__(self):
+        return 'SharedMemoryCache(%r)' % self.path
+
+    def __iter__(self):
+        # return invalid iter
+        return None
+
+    def __len__(self):
+        return self.curritems
+
+    def _openFile(self):
+        """
+        Open the cache file.  File locks are shared by forked processes, so
+        each process opens the file itself.
+        """
+        if self._fd is not None:
+            os.close(self._fd)
+        self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+        self._pid = os.getpid()
+
+    @contextlib.contextmanager
+    def _lock(self):
+        """
+        Hold the write lock for this thread and process.
+        """
+        with self._threadLock:
+            if self._pid != os.getpid():
+                self._openFile()
+            fcntl.flock(self._fd, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(self._fd, fcntl.LOCK_UN)
+
+    def _readHeader(self):
+        """
+        Read the header of an existing cache file.
+
+        :returns: the arena size and number of index slots, or (0, 0) if the
+            file is not a valid cache.
+        """
+        header = os.pread(self._fd, _Header.size, 0)
+        if len(header) < _Header.size:
+            return 0, 0
+        magic, arenaSize, slots, _ = _Header.unpack(header)
+        if (magic != _Magic or not arenaSize or not slots or os.fstat(self._fd).st_size <
+                _HeaderSize + slots * _Slot.size + arenaSize):
+            return 0, 0
+        return arenaSize, slots
+
+    def _createFile(self, maxsize):
+        """
+        Initialize the cache file.  The space is allocated immediately, so
+        that a full file system is reported now rather than when values are
+        written.  This must be called with the write lock held.
+
+        :param maxsize: the number of bytes used for values.
+        :returns: the arena size and number of index slots.
+        """
+        arenaSize = max(maxsize, 1024 ** 2)
+        slots = max(arenaSize // 4096, 4096) // _BucketSize * _BucketSize
+        total = _HeaderSize + slots * _Slot.size + arenaSize
+        os.ftruncate(self._fd, 0)
+        if hasattr(os, 'posix_fallocate'):
+            os.posix_fallocate(self._fd, 0, total)
+        else:
+            os.ftruncate(self._fd, total)
+        os.pwrite(self._fd, _Header.pack(_Magic, arenaSize, slots, 0), 0)
+        return arenaSize, slots
+
+    def _hash(self, key):
+        return hashlib.sha256(key.encode()).digest()[:16]
+
+    def _bucket(self, keyHash):
+        """
+        Get the offsets of the index slots that can hold a key.
+
+        :param keyHash: the hashed key.
+        :returns: a range of slot offsets.
+        """
+        start = _HeaderSize + (int.from_bytes(keyHash[:8], 'little') % self._buckets) * (
+            _BucketSize * _Slot.size)
+        return range(start, start + _BucketSize * _Slot.size, _Slot.size)
+
+    def _writePos(self):
+        return _WritePos.unpack_from(self._mmap, _WritePosOffset)[0]
+
+    def _find(self, keyHash):
+        """
+        Find a value in the cache.
+
+        :param keyHash: the hashed key.
+        :returns: the pickled value or None.
+        """
+        for slot in self._bucket(keyHash):
+            slotHash, pos, length = _Slot.unpack_from(self._mmap, slot)
+            if slotHash != keyHash or self._writePos() > pos + self._arenaSize:
+                continue
+            offset = self._arenaStart + pos % self._arenaSize
+            if offset + _Record.size + length > self._arenaStart + self._arenaSize:
+                continue
+            if _Record.unpack_from(self._mmap, offset) != (keyHash, length):
+                continue
+            data = self._mmap[offset + _Record.size:offset + _Record.size + length]
+            # The record could have been overwritten while it was copied
+            if self._writePos() > pos + self._arenaSize:
+                continue
+            return data
+        return None
+
+    def __contains__(self, key):
+        return self._find(self._hash(key)) is not None
+
+    def __delitem__(self, key):
+        keyHash = self._hash(key)
+        with self._lock():
+            found = False
+            for slot in self._bucket(keyHash):
+                if _Slot.unpack_from(self._mmap, slot)[0] == keyHash:
+                    _Slot.pack_into(self._mmap, slot, b'\0' * 16, 0, 0)
+                    found = True
+        if not found:
+            raise KeyError(key)
+
+    def __getitem__(self, key):
+        data = self._find(self._hash(key))
+        if data is None:
+            return self.__missing__(key)
+        return decompressValue(pickle.loads(data))
+
+    def __setitem__(self, key, value):
+        keyHash = self._hash(key)
+        data = pickle.dumps(compressValue(value), protocol=pickle.HIGHEST_PROTOCOL)
+        recordSize = _Record.size + len(data)
+        if recordSize > self._arenaSize // 4:
+            return
+        with self._lock():
+            pos = self._writePos()
+            if pos % self._arenaSize + recordSize > self._arenaSize:
+                pos += self._arenaSize - pos % self._arenaSize
+            # Reserve the space before writing so readers of records that are
+            # being overwritten will discard them.
+            _WritePos.pack_into(self._mmap, _WritePosOffset, pos + recordSize)
+            offset = self._arenaStart + pos % self._arenaSize
+            _Record.pack_into(self._mmap, offset, keyHash, len(data))
+            self._mmap[offset + _Record.size:offset + recordSize] = data
+            _Slot.pack_into(self._mmap, self._chooseSlot(keyHash), keyHash, pos, len(data))
+
+    def _chooseSlot(self, keyHash):
+        """
+        Choose the index slot for a key.  This is the slot already used by
+        the key, or else the slot with the oldest record.  This must be called
+        with the write lock held.
+
+        :param keyHash: the hashed key.
+        :returns: the slot offset.
+        """
+        best = bestPos = None
+        for slot in self._bucket(keyHash):
+            slotHash, pos, length = _Slot.unpack_from(self._mmap, slot)
+            if slotHash == keyHash:
+                return slot
+            if bestPos is None or pos < bestPos or not length:
+                best, bestPos = slot, (pos if length else -1)
+        return best
+
+    @property
+    def curritems(self):
+        writePos = self._writePos()
+        count = 0
+        for slot in range(_HeaderSize, self._arenaStart, _Slot.size):
+            _, pos, length = _Slot.unpack_from(self._mmap, slot)
+            if length and writePos <= pos + self._arenaSize:
+                count += 1
+        return count
+
+    @property
+    def currsize(self):
+        return min(self._writePos(), self._arenaSize)
+
+    @property
+    def maxsize(self):
+        return self._arenaSize
+
+    def clear(self):
+        with self._lock():
+            # Advancing a full lap invalidates every record
+            pos = self._writePos()
+            pos += 2 * self._arenaSize - pos % self._arenaSize
+            _WritePos.pack_into(self._mmap, _WritePosOffset, pos)
+
+    @staticmethod
+    def getCache() -> Tuple['SharedMemoryCache', threading.Lock]:
+        if fcntl is None:
+            msg = 'The shared memory cache requires fcntl'
+            raise TileCacheError(msg)
+        path = config.getConfig('cache_shared_path')
+        if not path:
+            if config.getConfig('cache_backend') is None:
+                msg = 'cache_shared_path is not set'
+                raise TileCacheError(msg)
+            path = os.path.join(
+                '/dev/shm' if os.path.isdir('/dev/shm') else tempfile.gettempdir(),
+                'large_image_tiles')
+        portion = max(int(config.getConfig('cache_shared_memory_portion') or 16), 2)
+        memory = psutil.virtual_memory().total if psutil else 1024 ** 3
+        try:
+            dirname = os.path.dirname(os.path.abspath(path))
+            stats = os.statvfs(dirname)
+            maxsize = min(memory // portion, stats.f_bavail * stats.f_frsize // 2)
+            cache = SharedMemoryCache(path, maxsize)
+        except OSError as exc:
+            msg = f'Cannot use the shared memory cache at {path}: {exc}'
+            raise TileCacheError(msg) from exc
+        return cache, threading.Lock()
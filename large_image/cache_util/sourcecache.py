@@ -0,0 +1,247 @@
+#############################################################################
+#  Copyright Kitware Inc.
+#
+#  Licensed under the Apache License, Version 2.0 ( the "License" );
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#############################################################################
+
+import collections
+import logging
+import sys
+import time
+import types
+
+import cachetools
+import numpy as np
+import PIL.Image
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+from .base import LRUCache, valueSize
+
+# Objects that are shared by many sources or don't hold data of their own
+_skipTypes = (
+    type, types.ModuleType, types.FunctionType, types.BuiltinFunctionType,
+    types.MethodType, cachetools.Cache, logging.Logger)
+
+
+def sourceFootprint(value, seen=None, maxDepth=6):
+    """
+    Estimate the memory used by a tile source, including the arrays, images,
+    and buffers that it references.  Caches and loggers are shared, so they
+    are not included.
+
+    :param value: the tile source or other object.
+    :param seen: an optional set of the ids of objects that have already been
+        counted.  This is updated, so that data shared by several sources
+        can be counted once.
+    :param maxDepth: the most levels of references that are followed.
+    :returns: the estimated size in bytes.
+    """
+    seen = set() if seen is None else seen
+    total = 0
+    stack = [(value, 0)]
+    while stack:
+        obj, depth = stack.pop()
+        if id(obj) in seen or isinstance(obj, _skipTypes):
+            continue
+        seen.add(id(obj))
+        if isinstance(obj, PIL.Image.Image):
+            # Images that were opened but not loaded don't hold their pixels
+            attrs = vars(obj)
+            if attrs.get('_im', attrs.get('im')) is not None:
+                total += valueSize(obj)
+            continue
+        if isinstance(obj, (bytes, bytearray, np.ndarray)):
+            total += valueSize(obj)
+            continue
+        total += sys.getsizeof(obj)
+        if depth >= maxDepth:
+            continue
+        if isinstance(obj, dict):
+            children = list(obj.values())
+        elif isinstance(obj, (list, tuple, set, frozenset, collections.deque)):
+            children = list(obj)
+        else:
+            children = list(getattr(obj, '__dict__', {}).values())
+        stack.extend((child, depth + 1) for child in children)
+    return total
+
+
+class SourceCache(LRUCache):
+    """
+    An in-process LRU cache of tile sources.  Besides holding no more than a
+    maximum number of sources, sources are evicted when they haven't been used
+    for a time, when their estimated memory use exceeds a budget, and when the
+    system is low on available memory.
+    """
+
+    # Seconds between checks of idle sources and memory use
+    checkInterval = 5
+
+    def __init__(self, maxsize, maxFootprint=None, timeout=None, minAvailable=None):
+        """
+        Create a tile source cache.
+
+        :param maxsize: the maximum number of sources.
+        :param maxFootprint: if set, the maximum estimated number of bytes
+            used by all sources.
+        :param timeout: if set, sources that haven't been used for this many
+            seconds are evicted.
+        :param minAvailable: if set and psutil is installed, sources are
+            evicted while less than this percentage of the system memory is
+            available.
+        """
+        super().__init__(maxsize)
+        self.maxFootprint = maxFootprint
+        self.timeout = timeout
+        self.minAvailable = minAvailable
+        self._accessed = {}
+        self._footprints = {}
+        self._lastCheck = time.monotonic()
+
+    def __getitem__(self, key):
+        value = super().__getitem__(key)
+        self._accessed[key] = time.monotonic()
+        self._check()
+        return value
+
+    def __setitem__(self, key, value):
+        super().__setitem__(key, value)
+        self._accessed[key] = time.monotonic()
+        self._footprints.pop(key, None)
+        # Placeholders for sources that are still being opened hold no data
+        if _isPlaceholder(value):
+            return
+        # Check when a source is added, since several large sources could be
+        # opened in quick succession.  Only the new source is measured; the
+        # others are measured again in turn by the periodic checks.
+        if self.maxFootprint or (self.minAvailable and psutil):
+            self._footprints[key] = sourceFootprint(value)
+        self._check(force=True, measure=False)
+
+    def __delitem__(self, key):
+        super().__delitem__(key)
+        self._accessed.pop(key, None)
+        self._footprints.pop(key, None)
+
+    @property
+    def footprint(self):
+        """
+        The estimated number of bytes used by the cached sources as of the
+        last check.
+        """
+        return sum(self._footprints.values())
+
+    def _measure(self):
+        """
+        Estimate the memory used by the source that was measured least
+        recently.  Sources often load data after they are opened, so they are
+        measured again, one per periodic check.  Checks are made during cache
+        lookups, so this avoids walking every source each time.
+        """
+        # The footprints are kept in the order the sources were measured
+        key = next(iter(self._footprints), None)
+        if key is None or key not in self:
+            return
+        # Reading through the base class doesn't change the LRU order
+        value = cachetools.Cache.__getitem__(self, key)
+        del self._footprints[key]
+        self._footprints[key] = sourceFootprint(value)
+
+    def _evictOldest(self):
+        """
+        Evict the least recently used source.  Placeholders for sources that
+        are still being opened are not evicted.
+
+        :returns: the estimated bytes used by the evicted source or None if
+            there are no sources to evict.
+        """
+        keys = [key for key in self._accessed if key in self and not self._isPlaceholderKey(key)]
+        if not keys:
+            return None
+        key = min(keys, key=self._accessed.get)
+        size = self._footprints.get(key, 0)
+        del self[key]
+        self.evictions += 1
+        return size
+
+    def _isPlaceholderKey(self, key):
+        """
+        Check if a key holds a placeholder for a source that is being opened.
+
+        :param key: the key.
+        :returns: True if the value is a placeholder.
+        """
+        # Reading through the base class doesn't change the LRU order
+        return _isPlaceholder(cachetools.Cache.__getitem__(self, key))
+
+    def _check(self, force=False, measure=True):
+        """
+        Periodically evict sources that have been idle too long, that exceed
+        the memory budget, or that should be released because the system is
+        low on memory.
+
+        :param force: if True, check even if the last check was recent.
+        :param measure: if False, use the existing estimates of the memory
+            used by each source rather than measuring one of them again.
+        """
+        now = time.monotonic()
+        if not force and now - self._lastCheck < self.checkInterval:
+            return
+        self._lastCheck = now
+        if self.timeout:
+            for key, accessed in list(self._accessed.items()):
+                if (now - accessed > self.timeout and key in self and
+                        not self._isPlaceholderKey(key)):
+                    del self[key]
+                    self.evictions += 1
+        if measure and (self.maxFootprint or (self.minAvailable and psutil)):
+            self._measure()
+        if self.maxFootprint:
+            total = self.footprint
+            while total > self.maxFootprint and len(self) > 1:
+                size = self._evictOldest()
+                if size is None:
+                    break
+                total -= size
+        if self.minAvailable and psutil:
+            memory = psutil.virtual_memory()
+            deficit = memory.total * self.minAvailable / 100 - memory.available
+            # Evict the least recently used sources until their measured
+            # memory covers the deficit.  Sources with no measured memory are
+            # kept, since evicting them wouldn't relieve the pressure.  The
+            # most recently used source is always kept.
+            newest = max(self._accessed, key=self._accessed.get, default=None)
+            for key in sorted(self._accessed, key=self._accessed.get):
+                if deficit <= 0:
+                    break
+                if (key == newest or key not in self or self._isPlaceholderKey(key) or
+                        not self._footprints.get(key)):
+                    continue
+                deficit -= self._footprints[key]
+                del self[key]
+                self.evictions += 1
+
+
+def _isPlaceholder(value):
+    """
+    Check if a cached value is a placeholder that the tile source cache uses
+    while a source is being opened, rather than a tile source.
+
+    :param value: the cached value.
+    :returns: True if the value is a placeholder.
+    """
+    return isinstance(value, tuple)
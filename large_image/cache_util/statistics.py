@@ -0,0 +1,146 @@
+#############################################################################
+#  Copyright Kitware Inc.
+#
+#  Licensed under the Apache License, Version 2.0 ( the "License" );
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#############################################################################
+
+import contextlib
+import os
+import pickle
+import sqlite3
+import threading
+
+from .. import config
+
+_statisticsStores = {}
+_statisticsStoresLock = threading.Lock()
+
+
+class StatisticsStore:
+    """
+    A persistent store for band statistics and histograms or for indices of
+    source files backed by a sqlite database.  Values survive tile sources
+    being evicted from the source cache and process restarts, and can be
+    shared by processes on the same host.
+
+    This behaves like a minimal mapping: missing keys raise a KeyError.
+    """
+
+    def __init__(self, path, timeout=30):
+        """
+        Create a store.
+
+        :param path: the path of the sqlite database file.  It is created if
+            it does not exist.
+        :param timeout: the number of seconds to wait for the database if it
+            is locked by another process.
+        """
+        self.path = os.path.expanduser(str(path))
+        self.timeout = timeout
+        with self._connect() as conn:
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS statistics '
+                '(key TEXT PRIMARY KEY, value BLOB)')
+
+    def __repr__(self):
+        return 'StatisticsStore(%r)' % self.path
+
+    @contextlib.contextmanager
+    def _connect(self):
+        """
+        Open a connection to the database.  A connection is used for each
+        operation, so a store can be used from any thread.  The operation is
+        committed when the context exits.
+        """
+        conn = sqlite3.connect(self.path, timeout=self.timeout)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def __getitem__(self, key):
+        try:
+            with self._connect() as conn:
+                row = conn.execute(
+                    'SELECT value FROM statistics WHERE key = ?', (key, )).fetchone()
+        except sqlite3.Error:
+            config.getConfig('logprint').exception('Failed to read statistics store')
+            row = None
+        if row is None:
+            raise KeyError(key)
+        return pickle.loads(row[0])
+
+    def __setitem__(self, key, value):
+        value = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        try:
+            with self._connect() as conn:
+                conn.execute(
+                    'INSERT OR REPLACE INTO statistics (key, value) VALUES (?, ?)',
+                    (key, value))
+        except sqlite3.Error:
+            config.getConfig('logprint').exception('Failed to write statistics store')
+
+    def __delitem__(self, key):
+        with self._connect() as conn:
+            if not conn.execute('DELETE FROM statistics WHERE key = ?', (key, )).rowcount:
+                raise KeyError(key)
+
+    def __len__(self):
+        with self._connect() as conn:
+            return conn.execute('SELECT COUNT(*) FROM statistics').fetchone()[0]
+
+    def clear(self):
+        with self._connect() as conn:
+            conn.execute('DELETE FROM statistics')
+
+
+def _getStore(configKey):
+    """
+    Get a persistent store based on a config value.
+
+    :param configKey: the name of the config value.
+    :returns: None if no store is configured, otherwise an object that
+        supports getting and setting items by string keys.
+    """
+    store = config.getConfig(configKey)
+    if store is None or store is False:
+        return None
+    if not isinstance(store, (str, os.PathLike)):
+        return store
+    with _statisticsStoresLock:
+        if store not in _statisticsStores:
+            _statisticsStores[store] = StatisticsStore(store)
+        return _statisticsStores[store]
+
+
+def getStatisticsStore():
+    """
+    Get the persistent store for band statistics and histograms based on the
+    ``statistics_store`` config value.
+
+    :returns: None if no store is configured, otherwise an object that
+        supports getting and setting items by string keys.
+    """
+    return _getStore('statistics_store')
+
+
+def getIndexStore():
+    """
+    Get the persistent store for indices of the directories and metadata of
+    source files based on the ``source_index_store`` config value.
+
+    :returns: None if no store is configured, otherwise an object that
+        supports getting and setting items by string keys.
+    """
+    return _getStore('source_index_store')
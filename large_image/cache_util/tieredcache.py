@@ -0,0 +1,192 @@
+#############################################################################
+#  Copyright Kitware Inc.
+#
+#  Licensed under the Apache License, Version 2.0 ( the "License" );
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#############################################################################
+
+import threading
+from typing import Tuple
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+from .. import config
+from .base import BaseCache, LRUCache, valueSize
+from .memcache import MemCache
+
+
+class TieredCache(BaseCache):
+    """
+    Use a small in-process LRU cache in front of a shared cache such as
+    memcached.  Values are written to both tiers.  Values that are only in the
+    shared cache are copied to the in-process cache when they are read, so
+    frequently used values don't require a round trip to the shared cache.
+
+    As with other tile caches, access should be guarded by the lock returned
+    with the cache.
+    """
+
+    def __init__(self, shared, maxsize, getsizeof=None):
+        """
+        Create a tiered cache.
+
+        :param shared: the shared cache, such as a MemCache.
+        :param maxsize: the maximum size of the in-process cache in bytes.
+        :param getsizeof: a function to determine the size of a value.  If
+            None, sizes are estimated from byte lengths and array sizes.
+        """
+        super().__init__(0, getsizeof=getsizeof)
+        self._shared = shared
+        self._local = LRUCache(maxsize, getsizeof=getsizeof or valueSize)
+        self._stats = {
+            'local': {'hits': 0, 'misses': 0},
+            'shared': {'hits': 0, 'misses': 0},
+        }
+
+    def __repr__(self):
+        return "TieredCache doesn't list its keys"
+
+    def __iter__(self):
+        # return invalid iter
+        return None
+
+    def __len__(self):
+        # return invalid length
+        return -1
+
+    def __contains__(self, key):
+        # the shared cache can't report if it contains a key
+        return key in self._local or None
+
+    def __delitem__(self, key):
+        self._local.pop(key, None)
+        del self._shared[key]
+
+    def __getitem__(self, key):
+        try:
+            value = self._local[key]
+            self._stats['local']['hits'] += 1
+            return value
+        except KeyError:
+            self._stats['local']['misses'] += 1
+        try:
+            value = self._shared[key]
+        except KeyError:
+            self._stats['shared']['misses'] += 1
+            return self.__missing__(key)
+        self._stats['shared']['hits'] += 1
+        self._storeLocal(key, value)
+        return value
+
+    def __setitem__(self, key, value):
+        self._storeLocal(key, value)
+        self._shared[key] = value
+
+    def getMany(self, keys):
+        """
+        Get several values.  Values that aren't in the in-process cache are
+        requested from the shared cache together.
+
+        :param keys: a list of keys.
+        :returns: a dictionary of the keys that were found and their values.
+        """
+        results = {}
+        missing = []
+        for key in keys:
+            try:
+                results[key] = self._local[key]
+            except KeyError:
+                missing.append(key)
+        self._stats['local']['hits'] += len(results)
+        self._stats['local']['misses'] += len(missing)
+        if missing:
+            getMany = getattr(self._shared, 'getMany', None)
+            found = getMany(missing) if getMany else BaseCache.getMany(self._shared, missing)
+            self._stats['shared']['hits'] += len(found)
+            self._stats['shared']['misses'] += len(missing) - len(found)
+            for key, value in found.items():
+                self._storeLocal(key, value)
+            results.update(found)
+        return results
+
+    def setMany(self, items):
+        for key, value in items.items():
+            self._storeLocal(key, value)
+        if hasattr(self._shared, 'setMany'):
+            self._shared.setMany(items)
+        else:
+            BaseCache.setMany(self._shared, items)
+
+    def _storeLocal(self, key, value):
+        try:
+            self._local[key] = value
+        except ValueError:
+            # value too large for the in-process cache
+            pass
+
+    @property
+    def curritems(self):
+        if hasattr(self._shared, 'curritems'):
+            return self._shared.curritems
+        return len(self._shared)
+
+    @property
+    def currsize(self):
+        return self._shared.currsize
+
+    @property
+    def maxsize(self):
+        return self._shared.maxsize
+
+    @property
+    def evictions(self):
+        return getattr(self._shared, 'evictions', None)
+
+    def tierInfo(self):
+        """
+        Report on each tier of the cache.
+
+        :returns: a dictionary with 'local' and 'shared' keys, each of which
+            has 'maxsize', 'used', 'items', 'hits', and 'misses'.
+        """
+        return {
+            'local': dict(
+                self._stats['local'],
+                maxsize=self._local.maxsize,
+                used=self._local.currsize,
+                items=len(self._local),
+                evictions=self._local.evictions),
+            'shared': dict(
+                self._stats['shared'],
+                maxsize=self.maxsize,
+                used=self.currsize,
+                items=self.curritems),
+        }
+
+    def clear(self):
+        self._local.clear()
+        self._shared.clear()
+        for stats in self._stats.values():
+            stats['hits'] = stats['misses'] = 0
+
+    @staticmethod
+    def getCache() -> Tuple['TieredCache', threading.Lock]:
+        shared, cacheLock = MemCache.getCache()
+        if shared is None:
+            return None, cacheLock
+        portion = config.getConfig('cache_tiered_memory_portion') or 64
+        memory = psutil.virtual_memory().total if psutil else 1024 ** 3
+        cache = TieredCache(shared, max(int(memory // max(int(portion), 2)), 1))
+        return cache, cacheLock
@@ -0,0 +1,272 @@
+#############################################################################
+#  Copyright Kitware Inc.
+#
+#  Licensed under the Apache License, Version 2.0 ( the "License" );
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#############################################################################
+
+import collections
+import collections.abc
+from array import array
+
+from .base import valueSize
+
+
+class FrequencySketch:
+    """
+    Estimate how often keys have been used with a count-min sketch of small
+    counters.  Counts are halved periodically so that the estimate favors
+    recent use.
+    """
+
+    depth = 4
+    maxCount = 15
+
+    def __init__(self, width):
+        """
+        Create a sketch.
+
+        :param width: the approximate number of distinct keys to track.  This
+            is rounded up to a power of two.
+        """
+        bits = max(int(width) - 1, 1023).bit_length()
+        self.width = 1 << bits
+        self._shift = 64 - bits
+        self._rows = [array('B', bytes(self.width)) for _ in range(self.depth)]
+        self._sampleSize = self.width * 10
+        self._additions = 0
+
+    # Odd multipliers used to derive an independent index for each row from
+    # a key's hash
+    _seeds = (0x9E3779B97F4A7C15, 0xC2B2AE3D27D4EB4F, 0x165667B19E3779F9,
+              0xD6E8FEB86659FD93)
+
+    def _indices(self, key):
+        keyHash = hash(key) & 0xFFFFFFFFFFFFFFFF
+        return [((keyHash * seed) & 0xFFFFFFFFFFFFFFFF) >> self._shift
+                for seed in self._seeds[:self.depth]]
+
+    def frequency(self, key):
+        """
+        Estimate the frequency of a key.
+
+        :param key: the key.
+        :returns: the estimated number of recent uses.
+        """
+        return min(row[idx] for row, idx in zip(self._rows, self._indices(key)))
+
+    def increment(self, key):
+        """
+        Record a use of a key.
+
+        :param key: the key.
+        """
+        indices = self._indices(key)
+        count = min(row[idx] for row, idx in zip(self._rows, indices))
+        if count >= self.maxCount:
+            return
+        # Only increment the smallest counters (conservative update)
+        for row, idx in zip(self._rows, indices):
+            if row[idx] == count:
+                row[idx] = count + 1
+        self._additions += 1
+        if self._additions >= self._sampleSize:
+            self._age()
+
+    def _age(self):
+        self._rows = [array('B', (value >> 1 for value in row)) for row in self._rows]
+        self._additions //= 2
+
+    def clear(self):
+        self._rows = [array('B', bytes(self.width)) for _ in range(self.depth)]
+        self._additions = 0
+
+
+class TinyLFUCache(collections.abc.MutableMapping):
+    """
+    A byte-limited cache that uses the W-TinyLFU policy, weighted by the cost
+    of recomputing each value.
+
+    New values enter a small LRU window.  Values leaving the window are only
+    admitted to the main cache if their estimated frequency of use times
+    their cost is greater than that of the values they would replace, so a
+    scan of values that are used once doesn't flush frequently used values.
+    The main cache is a segmented LRU: values used again while on probation
+    are moved to a protected segment.
+
+    This is not thread safe; guard it with a lock as with other caches.
+    """
+
+    windowPortion = 0.01
+    protectedPortion = 0.8
+
+    def __init__(self, maxsize, getsizeof=None, expectedItemSize=16384):
+        """
+        Create a cache.
+
+        :param maxsize: the maximum total size of the values in bytes.
+        :param getsizeof: a function to determine the size of a value.  If
+            None, sizes are estimated from byte lengths and array sizes.
+        :param expectedItemSize: the expected average size of a value, used to
+            size the frequency sketch.
+        """
+        self._maxsize = maxsize
+        self._getsizeof = getsizeof or valueSize
+        self._windowMax = max(int(maxsize * self.windowPortion), 1)
+        self._protectedMax = int((maxsize - self._windowMax) * self.protectedPortion)
+        self._sketch = FrequencySketch(max(maxsize // expectedItemSize, 1))
+        # The number of values removed or refused admission to make room
+        self.evictions = 0
+        self.clear()
+
+    def __repr__(self):
+        return '%s(%d items, currsize=%d, maxsize=%d)' % (
+            self.__class__.__name__, len(self), self.currsize, self.maxsize)
+
+    def __len__(self):
+        return len(self._window) + len(self._probation) + len(self._protected)
+
+    def __iter__(self):
+        yield from list(self._window)
+        yield from list(self._probation)
+        yield from list(self._protected)
+
+    def __contains__(self, key):
+        return key in self._window or key in self._probation or key in self._protected
+
+    def __getitem__(self, key):
+        self._sketch.increment(key)
+        for segment in (self._window, self._protected):
+            if key in segment:
+                segment.move_to_end(key)
+                return segment[key]
+        if key in self._probation:
+            value = self._probation.pop(key)
+            self._protected[key] = value
+            self._sizes['probation'] -= self._entries[key][0]
+            self._sizes['protected'] += self._entries[key][0]
+            self._rebalance()
+            return value
+        return self.__missing__(key)
+
+    def __missing__(self, key):
+        raise KeyError(key)
+
+    def __setitem__(self, key, value):
+        self.setWithCost(key, value)
+
+    def setWithCost(self, key, value, cost=None):
+        """
+        Add a value to the cache.
+
+        :param key: the key.
+        :param value: the value.
+        :param cost: the cost of computing the value, such as the number of
+            seconds it took.  If None, the average recorded cost is used.
+        """
+        size = self._getsizeof(value)
+        if size > self._maxsize:
+            msg = 'value too large'
+            raise ValueError(msg)
+        if cost is None:
+            cost = self._costTotal / self._costCount if self._costCount else 1
+        else:
+            self._costTotal += cost
+            self._costCount += 1
+        self._sketch.increment(key)
+        if key in self:
+            self.__delitem__(key)
+        self._entries[key] = (size, cost)
+        self._window[key] = value
+        self._sizes['window'] += size
+        # A value larger than the window goes directly to admission
+        while self._sizes['window'] > self._windowMax:
+            candidate, candidateValue = self._window.popitem(last=False)
+            self._sizes['window'] -= self._entries[candidate][0]
+            self._admit(candidate, candidateValue)
+
+    def _score(self, key):
+        return self._sketch.frequency(key) * self._entries[key][1]
+
+    def _admit(self, candidate, value):
+        """
+        Move a value from the window to the main cache if it is worth more
+        than the values it would replace.
+
+        :param candidate: the key of the value leaving the window.
+        :param value: the value.
+        """
+        size = self._entries[candidate][0]
+        mainMax = self._maxsize - self._windowMax
+        excess = self._sizes['probation'] + self._sizes['protected'] + size - mainMax
+        victims = []
+        victimScore = 0
+        for segment in (self._probation, self._protected):
+            for victim in segment:
+                if excess <= 0:
+                    break
+                victims.append((segment, victim))
+                victimScore += self._score(victim)
+                excess -= self._entries[victim][0]
+        if excess > 0 or (victims and self._score(candidate) <= victimScore):
+            del self._entries[candidate]
+            self.evictions += 1
+            return
+        for segment, victim in victims:
+            del segment[victim]
+            self._sizes['probation' if segment is self._probation else 'protected'] -= (
+                self._entries.pop(victim)[0])
+        self.evictions += len(victims)
+        self._probation[candidate] = value
+        self._sizes['probation'] += size
+
+    def _rebalance(self):
+        """
+        Move the least recently used protected values to probation if the
+        protected segment is too large.
+        """
+        while self._sizes['protected'] > self._protectedMax and len(self._protected) > 1:
+            key, value = self._protected.popitem(last=False)
+            self._probation[key] = value
+            self._sizes['protected'] -= self._entries[key][0]
+            self._sizes['probation'] += self._entries[key][0]
+
+    def __delitem__(self, key):
+        for name, segment in (('window', self._window), ('probation', self._probation),
+                              ('protected', self._protected)):
+            if key in segment:
+                del segment[key]
+                self._sizes[name] -= self._entries.pop(key)[0]
+                return
+        raise KeyError(key)
+
+    @property
+    def curritems(self):
+        return len(self)
+
+    @property
+    def currsize(self):
+        return sum(self._sizes.values())
+
+    @property
+    def maxsize(self):
+        return self._maxsize
+
+    def clear(self):
+        self._window = collections.OrderedDict()
+        self._probation = collections.OrderedDict()
+        self._protected = collections.OrderedDict()
+        self._entries = {}
+        self._sizes = {'window': 0, 'probation': 0, 'protected': 0}
+        self._costTotal = 0
+        self._costCount = 0
+        self._sketch.clear()
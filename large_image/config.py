@@ -17,13 +17,32 @@ ConfigValues = {
     'logprint': fallbackLogger,
 
     # For tiles
-    'cache_backend': None,  # 'python' or 'memcached'
+    # 'python', 'memcached', 'tiered', 'disk', or 'shared'
+    'cache_backend': None,
     # 'python' cache can use 1/(val) of the available memory
     'cache_python_memory_portion': 32,
+    # 'python' tile cache eviction policy: 'lru' or 'tinylfu'
+    'cache_python_policy': 'lru',
     # cache_memcached_url may be a list
     'cache_memcached_url': '127.0.0.1',
     'cache_memcached_username': None,
     'cache_memcached_password': None,
+    # Numpy tiles at least as large as the threshold are compressed in caches
+    # outside of python: None, 'auto', 'zstd', 'lz4', or 'zlib'
+    'cache_compression': None,
+    'cache_compression_threshold': 65536,
+    # 'tiered' cache keeps recent tiles in 1/(val) of the total memory in front
+    # of memcached
+    'cache_tiered_memory_portion': 64,
+    # 'disk' cache stores up to this many bytes in a sqlite database at the
+    # path, evicting 'lru' or 'lfu' values
+    'cache_disk_path': None,
+    'cache_disk_size': 10 * 1024 ** 3,
+    'cache_disk_eviction': 'lru',
+    # 'shared' cache is a pool in a memory-mapped file shared by all processes
+    # on a host, using 1/(val) of the total memory
+    'cache_shared_path': None,
+    'cache_shared_memory_portion': 16,
 
     # If set to False, the default will be to not cache tile sources.  This has
     # substantial performance penalties if sources are used multiple times, so
@@ -34,14 +53,60 @@ ConfigValues = {
     # Generally, these keys are the form of "cache_<cacheName>_<key>"
 
     # For tilesources.  These are also limited by available file handles.
-    # 'python' cache can use 1/(val) of the available memory based on a very
-    # rough estimate of the amount of memory used by a tilesource
+    # Cached tilesources can use 1/(val) of the available memory based on an
+    # estimate of the memory used by each tilesource
     'cache_tilesource_memory_portion': 8,
     # If >0, this is the maximum number of tilesources that will be cached
     'cache_tilesource_maximum': 0,
+    # Tilesources that haven't been used for this many seconds are evicted.
+    # If 0, tilesources are not evicted for being idle.
+    'cache_tilesource_timeout': 300,
+    # While less than this percent of the system memory is available,
+    # tilesources are evicted.  If 0, this is not checked.
+    'cache_tilesource_memory_pressure': 0,
+    # Decoded tiles are cached in process using up to 1/(val) of the total
+    # memory.  If 0, decoded tiles are not cached.
+    'cache_decodedtile_memory_portion': 64,
+    # Decoded strips of untiled tiff images are cached in process using up to
+    # 1/(val) of the total memory.  If 0, decoded strips are not cached.
+    'cache_decodedstrip_memory_portion': 64,
+    # Concurrent calls to a cached method with the same arguments wait up to
+    # this many seconds for the first call rather than repeating its work.  If
+    # None, wait without a limit; if 0, calls are not coordinated.
+    'cache_inflight_timeout': 60,
+    # Errors from cached methods, such as requests for tiles that are out of
+    # range or can't be read, are raised again for this many seconds without
+    # repeating the work.  Up to the maximum number of errors are kept.  If 0,
+    # errors are not cached.
+    'cache_negative_ttl': 10,
+    'cache_negative_maximum': 10000,
+    # Record cache hits, misses, and latencies for cachesInfo
+    'cache_metrics': True,
 
     'max_small_image_size': 4096,
 
+    # The number of threads used to assemble a region from tiles.  If 0 or
+    # None, this is the number of cpus.
+    'region_workers': None,
+    # Regions larger than this many bytes are assembled in a memory-mapped
+    # temporary file.  If None, this is half of the available memory.
+    'max_region_memory': None,
+    # The number of threads used to compute histograms.  If 0 or None, this
+    # is the number of cpus.
+    'histogram_workers': None,
+    # The number of threads used to decode tiles requested together as numpy
+    # arrays.  If 0 or None, this is the number of cpus.
+    'tile_decode_workers': None,
+    # Band statistics and histograms are persisted in this store.  This is
+    # None to disable it, the path of a sqlite database file, or an object
+    # that supports getting and setting items, such as a memcached cache.
+    'statistics_store': None,
+    # Indices of the directories and metadata of files with many directories
+    # are persisted in this store.  This is None to disable it, the path of a
+    # sqlite database file, or an object that supports getting and setting
+    # items.
+    'source_index_store': None,
+
     # Should ICC color correction be applied by default
     'icc_correction': True,
 
@@ -1,9 +1,12 @@
+import collections
+import concurrent.futures
 import io
 import json
 import math
 import os
 import pathlib
 import re
+import stat
 import tempfile
 import threading
 import time
@@ -17,18 +20,30 @@ import PIL.ImageCms
 import PIL.ImageColor
 import PIL.ImageDraw
 
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
 from .. import config, exceptions
-from ..cache_util import getTileCache, methodcache, strhash
+from ..cache_util import (getIndexStore, getStatisticsStore, getTileCache,
+                          methodcache, storeDecodedTile, strhash)
 from ..constants import (TILE_FORMAT_IMAGE, TILE_FORMAT_NUMPY, TILE_FORMAT_PIL,
                          SourcePriority, TileInputUnits, TileOutputMimeTypes,
                          TileOutputPILFormat, dtypeToGValue)
 from .jupyter import IPyLeafletMixin
 from .tiledict import LazyTileDict
-from .utilities import (JSONDict, _encodeImage,  # noqa: F401
-                        _encodeImageBinary, _gdalParameters, _imageToNumpy,
-                        _imageToPIL, _letterboxImage, _makeSameChannelDepth,
-                        _vipsCast, _vipsParameters, dictToEtree, etreeToDict,
-                        getPaletteColors, histogramThreshold, nearPowerOfTwo)
+from .utilities import (JSONDict, UniformTile, _encodeImage,  # noqa: F401
+                        _encodeImageBinary, _encodeUniformTile,
+                        _gdalParameters, _histogramPartial,
+                        _histogramPartialStats, _imageToNumpy, _imageToPIL,
+                        _letterboxImage, _makeSameChannelDepth,
+                        _mergeHistogramPartials, _vipsCast, _vipsParameters,
+                        dictToEtree, etreeToDict, getPaletteColors,
+                        histogramThreshold, nearPowerOfTwo)
+
+# Per-thread state used by getTiles when a source combines adjacent tile reads
+_tileBatch = threading.local()
 
 
 class TileSource(IPyLeafletMixin):
@@ -57,6 +72,10 @@ class TileSource(IPyLeafletMixin):
 
     geospatial = False
 
+    # The maximum number of horizontally adjacent tiles that are read together
+    # by getTiles for sources that implement _readTileRun.
+    _maxTileRun = 16
+
     def __init__(self, encoding='JPEG', jpegQuality=95, jpegSubsampling=0,
                  tiffCompression='raw', edge=False, style=None, noCache=None,
                  *args, **kwargs):
@@ -959,6 +978,41 @@ class TileSource(IPyLeafletMixin):
                 tile['gheight'] = tile['height'] * scale
                 yield tile
 
+    def _loadedTileIterator(self, iterInfo):
+        """
+        Iterate through tiles as with _tileIterator, fetching the source tiles
+        of each row with a single call to getTiles.  This should only be used
+        when the image data of every tile will be accessed.
+
+        :param iterInfo: tile iterator information.  See _tileIteratorInfo.
+        :yields: an iterator that returns a dictionary as in _tileIterator.
+        """
+        for row in self._tileRows(self._tileIterator(iterInfo)):
+            self._fetchTileRow(row)
+            yield from row
+
+    def _fetchTileRow(self, tiles):
+        """
+        Fetch the source tiles for a list of tiles from the tile iterator with
+        a single call to getTiles.  Tiles that are retiled from multiple
+        source tiles are loaded when accessed.  If all of the tiles allow
+        numpy arrays, the source tiles are requested as numpy arrays, which
+        lets sources decode them in parallel.
+
+        :param tiles: a list of LazyTileDict tiles.
+        """
+        tiles = [tile for tile in tiles if not tile.retile and not tile.loaded]
+        if len(tiles) < 2:
+            return
+        numpyAllowed = 'always' if all(
+            TILE_FORMAT_NUMPY in tile.format for tile in tiles) else True
+        data = self.getTiles([{
+            'x': tile.x, 'y': tile.y, 'z': tile.level, 'frame': tile.frame,
+        } for tile in tiles], pilImageAllowed=True, numpyAllowed=numpyAllowed,
+            sparseFallback=True)
+        for tile, tileData in zip(tiles, data):
+            tile.sourceTile = tileData
+
     def _pilFormatMatches(self, image, match=True, **kwargs):
         """
         Determine if the specified PIL image matches the format of the tile
@@ -1029,54 +1083,25 @@ class TileSource(IPyLeafletMixin):
             number of bins used.  bin_edges is an array one longer than the
             hist array that contains the boundaries between bins.
         """
-        lastlog = time.time()
         kwargs = kwargs.copy()
         histRange = kwargs.pop('range', None)
-        results = None
-        for tile in self.tileIterator(format=TILE_FORMAT_NUMPY, *args, **kwargs):
-            if time.time() - lastlog > 10:
-                self.logger.info(
-                    'Calculating histogram min/max %d/%d',
-                    tile['tile_position']['position'], tile['iterator_range']['position'])
-                lastlog = time.time()
-            tile = tile['tile']
-            if dtype is not None and tile.dtype != dtype:
-                if tile.dtype == np.uint8 and dtype == np.uint16:
-                    tile = np.array(tile, dtype=np.uint16) * 257
-                else:
-                    continue
-            tilemin = np.array([
-                np.amin(tile[:, :, idx]) for idx in range(tile.shape[2])], tile.dtype)
-            tilemax = np.array([
-                np.amax(tile[:, :, idx]) for idx in range(tile.shape[2])], tile.dtype)
-            tilesum = np.array([
-                np.sum(tile[:, :, idx]) for idx in range(tile.shape[2])], float)
-            tilesum2 = np.array([
-                np.sum(np.array(tile[:, :, idx], float) ** 2)
-                for idx in range(tile.shape[2])], float)
-            tilecount = tile.shape[0] * tile.shape[1]
-            if results is None:
-                results = {
-                    'min': tilemin,
-                    'max': tilemax,
-                    'sum': tilesum,
-                    'sum2': tilesum2,
-                    'count': tilecount,
-                }
-            else:
-                results['min'] = np.minimum(results['min'], tilemin[:len(results['min'])])
-                results['max'] = np.maximum(results['max'], tilemax[:len(results['min'])])
-                results['sum'] += tilesum[:len(results['min'])]
-                results['sum2'] += tilesum2[:len(results['min'])]
-                results['count'] += tilecount
-        results['mean'] = results['sum'] / results['count']
+        histParams = None
+        if not onlyMinMax and histRange is not None and histRange != 'round':
+            histParams = [(bins, histRange)]
+        partial = self._histogramPass(
+            'Calculating histogram %d/%d', dtype, histParams, *args, **kwargs)
+        if partial is None:
+            return None
+        stats = _histogramPartialStats(partial)
+        results = {
+            'min': stats['min'],
+            'max': stats['max'],
+            'mean': stats['sum'] / stats['count'],
+        }
         results['stdev'] = np.maximum(
-            results['sum2'] / results['count'] - results['mean'] ** 2,
-            [0] * results['sum2'].shape[0]) ** 0.5
-        results.pop('sum', None)
-        results.pop('sum2', None)
-        results.pop('count', None)
-        if results is None or onlyMinMax:
+            stats['sum2'] / stats['count'] - results['mean'] ** 2,
+            [0] * stats['sum2'].shape[0]) ** 0.5
+        if onlyMinMax:
             return results
         results['histogram'] = [{
             'min': results['min'][idx],
@@ -1097,35 +1122,80 @@ class TileSource(IPyLeafletMixin):
                     rbins = int(math.ceil((record['range'][1] - record['range'][0]) / step))
                     record['range'] = (record['range'][0], record['range'][0] + step * rbins)
                     record['bins'] = rbins
-        for tile in self.tileIterator(format=TILE_FORMAT_NUMPY, *args, **kwargs):
-            if time.time() - lastlog > 10:
-                self.logger.info(
-                    'Calculating histogram %d/%d',
-                    tile['tile_position']['position'], tile['iterator_range']['position'])
-                lastlog = time.time()
-            tile = tile['tile']
-            if dtype is not None and tile.dtype != dtype:
-                if tile.dtype == np.uint8 and dtype == np.uint16:
-                    tile = np.array(tile, dtype=np.uint16) * 257
-                else:
-                    continue
-            for idx in range(len(results['min'])):
-                entry = results['histogram'][idx]
-                hist, bin_edges = np.histogram(
-                    tile[:, :, idx], entry['bins'], entry['range'], density=False)
-                if entry['hist'] is None:
-                    entry['hist'] = hist
-                    entry['bin_edges'] = bin_edges
-                else:
-                    entry['hist'] += hist
-        for idx in range(len(results['min'])):
-            entry = results['histogram'][idx]
-            if entry['hist'] is not None:
-                entry['samples'] = np.sum(entry['hist'])
-                if density:
-                    entry['hist'] = entry['hist'].astype(float) / entry['samples']
+        histParams = [(entry['bins'], entry['range']) for entry in results['histogram']]
+        if 'counts' in partial:
+            hists = _histogramPartialStats(partial, histParams)['hist']
+        elif 'hist' in partial:
+            hists = partial['hist']
+        else:
+            # The range depends on the data, so histograms of non-integer
+            # data need a second pass
+            hists = self._histogramPass(
+                'Calculating histogram %d/%d', dtype, histParams, *args, **kwargs)
+            hists = _histogramPartialStats(hists, histParams)['hist']
+        for idx, entry in enumerate(results['histogram']):
+            entry['hist'] = hists[idx]
+            entry['bin_edges'] = np.histogram_bin_edges([], entry['bins'], entry['range'])
+            entry['samples'] = np.sum(entry['hist'])
+            if density:
+                entry['hist'] = entry['hist'].astype(float) / entry['samples']
         return results
 
+    def _histogramPass(self, message, dtype, histParams, *args, **kwargs):
+        """
+        Compute mergeable statistics for every tile of a region.  Tiles are
+        loaded and analyzed by a pool of worker threads and the partial
+        results are combined in tile order.
+
+        :param message: a log message with the tile position and count.
+        :param dtype: if not None, tiles of other data types are skipped,
+            except that uint8 tiles are scaled to uint16 if that is requested.
+        :param histParams: None or a list of (bins, range) tuples, one per
+            band, used to compute histograms of non-integer data.
+        :param args: parameters to pass to the tileIterator.
+        :param kwargs: parameters to pass to the tileIterator.
+        :returns: a partial result from _histogramPartial or None if there
+            were no tiles.
+        """
+        lastlog = time.time()
+        partial = None
+        workers = config.getConfig('histogram_workers') or os.cpu_count() or 1
+        pending = collections.deque()
+        with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as pool:
+            for tile in self.tileIterator(format=TILE_FORMAT_NUMPY, *args, **kwargs):
+                if time.time() - lastlog > 10:
+                    self.logger.info(
+                        message, tile['tile_position']['position'],
+                        tile['iterator_range']['position'])
+                    lastlog = time.time()
+                pending.append(pool.submit(self._histogramTile, tile, dtype, histParams))
+                # Limit how far ahead of the workers the iterator gets
+                if len(pending) >= workers * 2:
+                    partial = _mergeHistogramPartials(
+                        partial, pending.popleft().result(), histParams)
+            while len(pending):
+                partial = _mergeHistogramPartials(
+                    partial, pending.popleft().result(), histParams)
+        return partial
+
+    def _histogramTile(self, tile, dtype, histParams):
+        """
+        Load a tile and compute its partial histogram statistics.
+
+        :param tile: a tile from the tileIterator.
+        :param dtype: if not None, the required data type of the tile.
+        :param histParams: None or a list of (bins, range) tuples.
+        :returns: a partial result from _histogramPartial or None if the tile
+            is skipped.
+        """
+        tile = tile['tile']
+        if dtype is not None and tile.dtype != dtype:
+            if tile.dtype == np.uint8 and dtype == np.uint16:
+                tile = np.array(tile, dtype=np.uint16) * 257
+            else:
+                return None
+        return _histogramPartial(tile, histParams)
+
     def _unstyledClassKey(self):
         """
         Create a class key that doesn't use style.  If already created, just
@@ -1151,18 +1221,109 @@ class TileSource(IPyLeafletMixin):
         :param onlyMinMax: if True, only find the min and max.  If False, get
             the entire histogram.
         """
-        self._bandRanges[frame] = getattr(self, '_unstyledInstance', self).histogram(
-            dtype=dtype,
-            onlyMinMax=onlyMinMax,
-            output={'maxWidth': min(self.sizeX, analysisSize),
-                    'maxHeight': min(self.sizeY, analysisSize)},
-            resample=False,
-            frame=frame, **kwargs)
+        self._bandRanges[frame] = self._persistentStatistics(
+            lambda: getattr(self, '_unstyledInstance', self).histogram(
+                dtype=dtype,
+                onlyMinMax=onlyMinMax,
+                output={'maxWidth': min(self.sizeX, analysisSize),
+                        'maxHeight': min(self.sizeY, analysisSize)},
+                resample=False,
+                frame=frame, **kwargs),
+            'bandRanges', dtype, frame, analysisSize, onlyMinMax, **kwargs)
         if self._bandRanges[frame]:
             self.logger.info('Style range is %r', {
                 k: v for k, v in self._bandRanges[frame].items() if k in {
                     'min', 'max', 'mean', 'stdev'}})
 
+    def _statisticsKey(self, *args, **kwargs):
+        """
+        Get a key for band statistics in the persistent statistics store.
+        This is only available for sources that read a single file.  The key
+        is based on the unstyled LRU hash of the source and the modification
+        time and size of the file, so statistics of a changed file are not
+        reused.
+
+        :param args: values that identify the statistics.
+        :param kwargs: values that identify the statistics.
+        :returns: a string key or None if the statistics can't be stored.
+        """
+        signature = self._fileSignature()
+        if signature is None:
+            return None
+        initArgs, initKwargs = getattr(self, '_initValues', ((), {}))
+        initKwargs = dict(initKwargs, style=getattr(self, '_unstyledStyle', None))
+        return strhash(
+            self.__class__.__name__, self.getLRUHash(*initArgs, **initKwargs),
+            *signature[1:], *args, **kwargs)
+
+    def _fileSignature(self):
+        """
+        Identify the version of the file read by this source.
+
+        :returns: a tuple of the path, modification time in nanoseconds, and
+            size of the file, or None if the source doesn't read a single
+            regular file.
+        """
+        getPath = getattr(self, '_getLargeImagePath', None)
+        if getPath is None:
+            return None
+        try:
+            path = getPath()
+            info = os.stat(path)
+        except (TypeError, ValueError, OSError):
+            return None
+        if not stat.S_ISREG(info.st_mode):
+            return None
+        return (str(path), info.st_mtime_ns, info.st_size)
+
+    def _persistentIndex(self, name, version, compute):
+        """
+        Get an index of the file read by this source from the persistent
+        source index store.  If it is not present, compute and store it.
+
+        :param name: the name of the kind of index.
+        :param version: the version of the index.  This should be changed
+            whenever the contents of the index change.
+        :param compute: a function without parameters that computes the
+            index.
+        :returns: the index.
+        """
+        store = getIndexStore()
+        signature = self._fileSignature() if store is not None else None
+        if signature is None:
+            return compute()
+        key = strhash('sourceIndex', name, version, *signature)
+        try:
+            return store[key]
+        except KeyError:
+            pass
+        value = compute()
+        store[key] = value
+        return value
+
+    def _persistentStatistics(self, compute, *args, **kwargs):
+        """
+        Get band statistics from the persistent statistics store.  If they
+        are not present, compute and store them.
+
+        :param compute: a function without parameters that computes the
+            statistics.
+        :param args: values that identify the statistics.
+        :param kwargs: values that identify the statistics.
+        :returns: the statistics.
+        """
+        store = getStatisticsStore()
+        key = self._statisticsKey(*args, **kwargs) if store is not None else None
+        if key is not None:
+            try:
+                return store[key]
+            except KeyError:
+                pass
+        value = compute()
+        if key is not None and value is not None:
+            store[key] = value
+        return value
+
     def _validateMinMaxValue(self, value, frame, dtype):
         """
         Validate the min/max setting and return a specific string or float
@@ -1457,6 +1618,10 @@ class TileSource(IPyLeafletMixin):
                 (image.shape[0], image.shape[1], newwidth),
                 np.float32 if image.dtype != np.float64 else image.dtype)
         image = self._applyStyleFunction(image, sc, 'pre')
+        # Without style functions, integer bands can be styled via lookup
+        # tables, since the result only depends on each band value.
+        useLookupTables = not sc.style.get('function') and not any(
+            entry.get('function') for entry in sc.style['bands'])
         for eidx, entry in enumerate(sc.style['bands']):
             sc.styleIndex = eidx
             sc.dtype = sc.dtype if sc.dtype is not None else entry.get('dtype')
@@ -1513,6 +1678,9 @@ class TileSource(IPyLeafletMixin):
                 'max', entry.get('max', 'auto'), image.dtype, sc.bandidx, frame)
             sc.clamp = entry.get('clamp', True)
             delta = sc.max - sc.min if sc.max != sc.min else 1
+            if useLookupTables and sc.band.dtype in {np.dtype(np.uint8), np.dtype(np.uint16)}:
+                self._applyStyleLookupTable(sc, eidx, delta)
+                continue
             if sc.nodata is not None:
                 sc.mask = sc.band != float(sc.nodata)
             else:
@@ -1575,6 +1743,84 @@ class TileSource(IPyLeafletMixin):
         sc.output = self._applyStyleFunction(sc.output, sc, 'post')
         return sc.output
 
+    def _styleLookupTable(self, sc, eidx, delta):
+        """
+        Get a lookup table for a style band entry applied to an integer band.
+        This maps each possible band value to the value that is composited
+        into each output channel, and matches the result of applying the
+        nodata, min, max, clamp, palette, and scheme of the entry directly.
+
+        :param sc: the style context.
+        :param eidx: the index of the style band entry.
+        :param delta: the difference between the band maximum and minimum.
+        :returns: a lookup table with one row per band value and one column
+            per composited channel, and a list of the composited channels.
+        """
+        multiply = sc.composite == 'multiply'
+        key = (sc.band.dtype.str, sc.min, sc.max, sc.nodata, sc.clamp, sc.discrete,
+               multiply, bool(eidx), sc.output.shape[2], sc.palette.tobytes())
+        with self._sourceLock:
+            if getattr(self, '_styleLookupTables', None) is None:
+                self._styleLookupTables = {}
+            lookupTables = self._styleLookupTables
+        # Other threads may clear the tables, so this is a single lookup
+        entry = lookupTables.get(key)
+        if entry is not None:
+            return entry
+        values = np.arange(np.iinfo(sc.band.dtype).max + 1, dtype=sc.band.dtype)
+        if sc.nodata is not None:
+            mask = values != float(sc.nodata)
+        else:
+            mask = np.full(values.shape, True)
+        band = (values - sc.min) / delta
+        if not sc.clamp:
+            mask = mask & (band >= 0) & (band <= 1)
+        channels = []
+        columns = []
+        # Multiply has no effect on the first entry
+        for channel in range(sc.output.shape[2] if eidx or not multiply else 0):
+            if np.all(sc.palette[:, channel] == sc.palette[0, channel]):
+                if ((sc.palette[0, channel] == 0 and not multiply) or
+                        (sc.palette[0, channel] == 255 and multiply)):
+                    continue
+                clrs = np.full(band.shape, sc.palette[0, channel], dtype=band.dtype)
+            elif not sc.discrete:
+                clrs = np.interp(band, sc.palettebase, sc.palette[:, channel])
+            else:
+                clrs = sc.palette[
+                    np.floor(band * len(sc.palette)).astype(int).clip(
+                        0, len(sc.palette) - 1), channel]
+            channels.append(channel)
+            columns.append(np.where(mask, clrs / 255, 1) if multiply else np.where(mask, clrs, 0))
+        # Multiplying is done at full precision; other composites are stored
+        # in the output's precision, so the table can be as well.
+        lookupTable = np.stack(columns, axis=1).astype(
+            np.float64 if multiply else sc.output.dtype) if channels else None
+        with self._sourceLock:
+            if len(lookupTables) >= 64:
+                lookupTables.clear()
+            lookupTables[key] = (lookupTable, channels)
+        return lookupTable, channels
+
+    def _applyStyleLookupTable(self, sc, eidx, delta):
+        """
+        Composite an integer band into the output using a lookup table.
+
+        :param sc: the style context.
+        :param eidx: the index of the style band entry.
+        :param delta: the difference between the band maximum and minimum.
+        """
+        lookupTable, channels = self._styleLookupTable(sc, eidx, delta)
+        if not channels:
+            return
+        height, width = sc.band.shape[:2]
+        values = np.take(lookupTable, sc.band, axis=0)
+        if sc.composite == 'multiply':
+            values = sc.output[:height, :width, channels] * values
+        elif eidx:
+            values = np.maximum(sc.output[:height, :width, channels], values)
+        sc.output[:height, :width, channels] = values
+
     def _outputTileNumpyStyle(self, tile, applyStyle, x, y, z, frame=None):
         """
         Convert a tile to a numpy array.  Optionally apply the style to a tile.
@@ -1600,11 +1846,99 @@ class TileSource(IPyLeafletMixin):
             tile = extend
         return tile, mode
 
+    def _outputHasStyle(self):
+        """
+        Check if output tiles are styled or ICC color corrected.
+
+        :returns: truthy if tiles are styled or corrected.
+        """
+        return (
+            len(set(getattr(self, 'style', {})) - {'icc'}) or
+            getattr(self, 'style', {}).get('icc', config.getConfig('icc_correction', True)))
+
+    def _decodedTileKey(self, x, y, z, sparseFallback=False, **kwargs):
+        """
+        Get the key of a tile in the decoded tile cache.  This is the same for
+        all styles and encodings of a source.
+
+        :param x: the tile x value.
+        :param y: the tile y value.
+        :param z: the tile z value.
+        :param sparseFallback: the getTile sparseFallback parameter.
+        :param kwargs: other getTile parameters.
+        :returns: a string key or None if the tile should not be cached.
+        """
+        if not hasattr(self, '_initValues') or set(kwargs) - {'frame'}:
+            return None
+        if not hasattr(self, '_decodedSourceKey'):
+            args, initKwargs = self._initValues
+            initKwargs = {k: v for k, v in initKwargs.items() if k not in {
+                'encoding', 'jpegQuality', 'jpegSubsampling', 'tiffCompression', 'edge'}}
+            initKwargs['style'] = getattr(self, '_unstyledStyle', None)
+            self._decodedSourceKey = (
+                self.__class__.__name__ + ' ' + self.getLRUHash(*args, **initKwargs))
+        # Sources read the frame from the style or the parameters
+        return strhash(self._decodedSourceKey, x, y, z, kwargs.get('frame'),
+                       self._getFrame(**kwargs), bool(sparseFallback))
+
+    def _outputDecodedTile(self, entry, x, y, z, pilImageAllowed=False,
+                           numpyAllowed=False, **kwargs):
+        """
+        Style and encode a tile from the decoded tile cache.
+
+        :param entry: the decoded tile cache entry.  See storeDecodedTile.
+        :param x: tile x value.
+        :param y: tile y value.
+        :param z: tile z value.
+        :param pilImageAllowed: True if a PIL image may be returned.
+        :param numpyAllowed: True if a numpy image may be returned.  'always'
+            to return a numpy array.
+        :param kwargs: other getTile parameters.
+        :returns: the output tile or None if the output would differ from
+            that of the source's original tile, such as when a compressed tile
+            could be returned unchanged.
+        """
+        tile, tileEncoding, applyStyle = entry
+        if (tileEncoding != TILE_FORMAT_NUMPY and numpyAllowed != 'always' and
+                not (applyStyle and self._outputHasStyle())):
+            return None
+        kwargs.pop('sparseFallback', None)
+        return self._outputTile(tile, TILE_FORMAT_NUMPY, x, y, z, pilImageAllowed,
+                                numpyAllowed, applyStyle=applyStyle, **kwargs)
+
+    def _outputUniformTile(self, tile, isEdge, pilImageAllowed, numpyAllowed,
+                           applyStyle):
+        """
+        Encode a tile where every pixel has the same value.  Encoded tiles are
+        shared by all sources, so a sparse or mostly empty image doesn't
+        encode the same empty tile repeatedly.  Tiles that will be styled,
+        cropped, or returned as an image object are returned as numpy arrays
+        to be handled like any other tile.
+
+        :param tile: a UniformTile.
+        :param isEdge: True if this is an edge tile that will be adjusted.
+        :param pilImageAllowed: True if a PIL image may be returned.
+        :param numpyAllowed: True if a numpy image may be returned.
+        :param applyStyle: if True and there is a style, apply it.
+        :returns: either the encoded tile or a numpy array.
+        """
+        if self._dtype is None or str(self._dtype) == 'check':
+            self._dtype = tile.dtype
+            self._bandCount = len(tile.color)
+        if (pilImageAllowed or numpyAllowed or isEdge or
+                tile.width != self.tileWidth or tile.height != self.tileHeight or
+                (applyStyle and (getattr(self, 'style', None) or
+                                 hasattr(self, '_iccprofiles')))):
+            return tile.toNumpy()
+        return _encodeUniformTile(
+            tile.color, tile.dtype.str, tile.width, tile.height, self.encoding,
+            self.jpegQuality, self.jpegSubsampling, self.tiffCompression)
+
     def _outputTile(self, tile, tileEncoding, x, y, z, pilImageAllowed=False,
                     numpyAllowed=False, applyStyle=True, **kwargs):
         """
-        Convert a tile from a numpy array, PIL image, or image in memory to the
-        desired encoding.
+        Convert a tile from a numpy array, PIL image, image in memory, or
+        UniformTile to the desired encoding.
 
         :param tile: the tile to convert.
         :param tileEncoding: the current tile encoding.
@@ -1625,9 +1959,13 @@ class TileSource(IPyLeafletMixin):
             maxX = (x + 1) * self.tileWidth
             maxY = (y + 1) * self.tileHeight
             isEdge = maxX > sizeX or maxY > sizeY
-        hasStyle = (
-            len(set(getattr(self, 'style', {})) - {'icc'}) or
-            getattr(self, 'style', {}).get('icc', config.getConfig('icc_correction', True)))
+        hasStyle = self._outputHasStyle()
+        if isinstance(tile, UniformTile):
+            tile = self._outputUniformTile(
+                tile, isEdge, pilImageAllowed, numpyAllowed, applyStyle)
+            if not isinstance(tile, np.ndarray):
+                return tile
+            tileEncoding = TILE_FORMAT_NUMPY
         if (tileEncoding not in (TILE_FORMAT_PIL, TILE_FORMAT_NUMPY) and
                 numpyAllowed != 'always' and tileEncoding == self.encoding and
                 not isEdge and (not applyStyle or not hasStyle)):
@@ -1648,6 +1986,8 @@ class TileSource(IPyLeafletMixin):
         mode = None
         if (numpyAllowed == 'always' or tileEncoding == TILE_FORMAT_NUMPY or
                 (applyStyle and hasStyle) or isEdge):
+            tile, mode = _imageToNumpy(tile)
+            storeDecodedTile(self, (tile, tileEncoding, applyStyle))
             tile, mode = self._outputTileNumpyStyle(
                 tile, applyStyle, x, y, z, self._getFrame(**kwargs))
         if isEdge:
@@ -1849,12 +2189,14 @@ class TileSource(IPyLeafletMixin):
                     self._bandInfoNoStats = bandInfo
                 return self._bandInfoNoStats
             analysisSize = 2048
-            histogram = self.histogram(
-                onlyMinMax=True,
-                output={'maxWidth': min(self.sizeX, analysisSize),
-                        'maxHeight': min(self.sizeY, analysisSize)},
-                resample=False,
-                **kwargs)
+            histogram = self._persistentStatistics(
+                lambda: self.histogram(
+                    onlyMinMax=True,
+                    output={'maxWidth': min(self.sizeX, analysisSize),
+                            'maxHeight': min(self.sizeY, analysisSize)},
+                    resample=False,
+                    **kwargs),
+                'bandInformation', analysisSize, **kwargs)
             bands = histogram['min'].shape[0]
             interp = bandInterp.get(bands, 3)
             bandInfo = {
@@ -1950,6 +2292,127 @@ class TileSource(IPyLeafletMixin):
         """
         raise NotImplementedError
 
+    def getTiles(self, requests, **kwargs):
+        """
+        Get a list of tiles from a tile source.  This returns the same results
+        as calling getTile for each request, but sources may override it to
+        combine the reads of adjacent tiles.
+
+        :param requests: an iterable of tile requests.  Each request is either
+            an (x, y, z) tuple or a dictionary with x, y, and z and, optionally,
+            any other parameter accepted by getTile.
+        :param kwargs: parameters passed to getTile for every request.  Values
+            specified in a request dictionary take precedence.
+        :returns: a list of tiles in the same order as the requests.  See
+            getTile.
+        """
+        requests = self._tileRequestList(requests, kwargs)
+        cached = self._cachedTiles(requests)
+        return [cached[idx] if idx in cached else self.getTile(x, y, z, **params)
+                for idx, (x, y, z, params) in enumerate(requests)]
+
+    def _tileRequestList(self, requests, kwargs):
+        """
+        Normalize the requests passed to getTiles.
+
+        :param requests: an iterable of (x, y, z) tuples or dictionaries.  See
+            getTiles.
+        :param kwargs: parameters that apply to every request.
+        :returns: a list of (x, y, z, params) tuples.
+        """
+        result = []
+        for request in requests:
+            params = kwargs.copy()
+            if isinstance(request, dict):
+                params.update(request)
+                x, y, z = params.pop('x'), params.pop('y'), params.pop('z')
+            else:
+                x, y, z = request
+            result.append((x, y, z, params))
+        return result
+
+    def _cachedTiles(self, requests):
+        """
+        Look up all of a list of tile requests in the tile cache at once.
+        Caches that support it, such as memcached, fetch the tiles in a single
+        round trip rather than one per tile.
+
+        :param requests: a list of (x, y, z, params) tuples as returned by
+            _tileRequestList.
+        :returns: a dictionary of the index of each request whose tile was
+            cached and its tile.
+        """
+        getCachedMany = getattr(self.getTile, 'getCachedMany', None)
+        if getCachedMany is None or len(requests) < 2:
+            return {}
+        return getCachedMany(self, [((x, y, z), params) for x, y, z, params in requests])
+
+    def _getTilesInRuns(self, requests, kwargs):
+        """
+        Get a list of tiles as in getTiles, reading horizontal runs of
+        requested tiles together.  Sources that use this must implement
+        _readTileRun and get their uncached tile data via _tileFromRun.
+
+        Tiles that are already cached are found with one cache lookup and are
+        not part of any run, so they are never read again from the file.
+
+        :param requests: an iterable of tile requests.  See getTiles.
+        :param kwargs: parameters passed to getTile for every request.
+        :returns: a list of tiles in the same order as the requests.
+        """
+        requests = self._tileRequestList(requests, kwargs)
+        cached = self._cachedTiles(requests)
+        runs = {}
+        for idx in range(len(requests) - 1, -1, -1):
+            if idx in cached:
+                continue
+            x, y, z, params = requests[idx]
+            frame = int(params.get('frame') or 0)
+            runs[(x, y, z, frame)] = min(
+                runs.get((x + 1, y, z, frame), 0) + 1, self._maxTileRun)
+        previous = getattr(_tileBatch, 'batch', None)
+        _tileBatch.batch = {'source': self, 'runs': runs, 'stash': {}}
+        try:
+            return [cached[idx] if idx in cached else self.getTile(x, y, z, **params)
+                    for idx, (x, y, z, params) in enumerate(requests)]
+        finally:
+            _tileBatch.batch = previous
+
+    def _tileFromRun(self, x, y, z, frame=None):
+        """
+        Get the raw data for a tile.  When called within _getTilesInRuns, this
+        reads the remainder of the run of requested tiles starting at this
+        tile and keeps the others until they are asked for.
+
+        :param x, y, z: the tile position.
+        :param frame: the frame number.
+        :returns: the raw tile data as returned by _readTileRun.
+        """
+        frame = int(frame or 0)
+        batch = getattr(_tileBatch, 'batch', None)
+        if batch is None or batch['source'] is not self:
+            return self._readTileRun(x, y, z, 1, frame)[0]
+        key = (x, y, z, frame)
+        if key in batch['stash']:
+            return batch['stash'].pop(key)
+        tiles = self._readTileRun(x, y, z, batch['runs'].get(key, 1), frame)
+        for idx in range(1, len(tiles)):
+            batch['stash'][(x + idx, y, z, frame)] = tiles[idx]
+        return tiles[0]
+
+    def _readTileRun(self, x, y, z, count, frame):
+        """
+        Read the raw data for a horizontal run of tiles.
+
+        :param x, y, z: the position of the first tile in the run.
+        :param count: the number of tiles to read.  The tiles at x through
+            x + count - 1 are all within the image.
+        :param frame: the frame number.
+        :returns: a list of count tiles, each in the form the source's getTile
+            passes to _outputTile.
+        """
+        raise NotImplementedError
+
     def getTileMimeType(self):
         """
         Return the default mimetype for image tiles.
@@ -2088,7 +2551,7 @@ class TileSource(IPyLeafletMixin):
                 del targetRegion[key]
         return targetRegion
 
-    def getRegion(self, format=(TILE_FORMAT_IMAGE, ), **kwargs):
+    def getRegion(self, format=(TILE_FORMAT_IMAGE, ), out=None, **kwargs):
         """
         Get a rectangular region from the current tile source.  Aspect ratio is
         preserved.  If neither width nor height is given, the original size of
@@ -2099,6 +2562,11 @@ class TileSource(IPyLeafletMixin):
             Formats are members of (TILE_FORMAT_PIL, TILE_FORMAT_NUMPY,
             TILE_FORMAT_IMAGE).  If TILE_FORMAT_IMAGE, encoding may be
             specified.
+        :param out: None or a numpy array (such as a numpy.memmap) with a shape
+            of (height, width, bands) of the output region.  The region is
+            assembled directly into this array, which is returned if the format
+            allows numpy arrays.  This can't be used if the region needs to be
+            scaled or when the encoding is TILED.
         :param kwargs: optional arguments.  Some options are region, output,
             encoding, jpegQuality, jpegSubsampling, tiffCompression, fill.  See
             tileIterator.
@@ -2119,30 +2587,27 @@ class TileSource(IPyLeafletMixin):
         top = iterInfo['region']['top']
         left = iterInfo['region']['left']
         mode = None if TILE_FORMAT_NUMPY in format else iterInfo['mode']
-        outWidth = iterInfo['output']['width']
-        outHeight = iterInfo['output']['height']
+        outWidth = int(math.floor(iterInfo['output']['width']))
+        outHeight = int(math.floor(iterInfo['output']['height']))
         tiled = TILE_FORMAT_IMAGE in format and kwargs.get('encoding') == 'TILED'
-        image = None
-        for tile in self._tileIterator(iterInfo):
-            # Add each tile to the image
-            subimage, _ = _imageToNumpy(tile['tile'])
-            x0, y0 = tile['x'] - left, tile['y'] - top
-            if x0 < 0:
-                subimage = subimage[:, -x0:]
-                x0 = 0
-            if y0 < 0:
-                subimage = subimage[-y0:, :]
-                y0 = 0
-            subimage = subimage[:min(subimage.shape[0], regionHeight - y0),
-                                :min(subimage.shape[1], regionWidth - x0)]
-            image = self._addRegionTileToImage(
-                image, subimage, x0, y0, regionWidth, regionHeight, tiled, tile, **kwargs)
-        # Scale if we need to
-        outWidth = int(math.floor(outWidth))
-        outHeight = int(math.floor(outHeight))
+        if out is not None and (tiled or outWidth != regionWidth or outHeight != regionHeight):
+            msg = 'An out array can only be used for regions that are not scaled or tiled.'
+            raise ValueError(msg)
         if tiled:
+            image = None
+            for tile in self._loadedTileIterator(iterInfo):
+                # Add each tile to the image
+                subimage, x0, y0 = self._regionSubimage(
+                    tile, left, top, regionWidth, regionHeight)
+                image = self._addRegionTileToImage(
+                    image, subimage, x0, y0, regionWidth, regionHeight, tiled, tile, **kwargs)
             return self._encodeTiledImage(image, outWidth, outHeight, iterInfo, **kwargs)
-        if outWidth != regionWidth or outHeight != regionHeight:
+        image = self._assembleRegion(iterInfo, out)
+        # Scale if we need to
+        if isinstance(image, np.memmap) and (
+                outWidth != regionWidth or outHeight != regionHeight):
+            image = self._scaleRegionInStrips(image, outWidth, outHeight, mode, format)
+        elif outWidth != regionWidth or outHeight != regionHeight:
             dtype = image.dtype
             image = _imageToPIL(image, mode).resize(
                 (outWidth, outHeight),
@@ -2157,6 +2622,220 @@ class TileSource(IPyLeafletMixin):
             image = _letterboxImage(_imageToPIL(image, mode), maxWidth, maxHeight, kwargs['fill'])
         return _encodeImage(image, format=format, **kwargs)
 
+    def _regionSubimage(self, tile, left, top, width, height):
+        """
+        Get the image data of a tile cropped to the part that is within a
+        region.
+
+        :param tile: a tile from the tile iterator.
+        :param left: the left of the region in the tile's coordinates.
+        :param top: the top of the region in the tile's coordinates.
+        :param width: the width of the region.
+        :param height: the height of the region.
+        :returns: subimage, x, y: a numpy array with the cropped tile and the
+            location of its upper left point within the region.
+        """
+        subimage, _ = _imageToNumpy(tile['tile'])
+        x0, y0 = tile['x'] - left, tile['y'] - top
+        if x0 < 0:
+            subimage = subimage[:, -x0:]
+            x0 = 0
+        if y0 < 0:
+            subimage = subimage[-y0:, :]
+            y0 = 0
+        subimage = subimage[:min(subimage.shape[0], height - y0),
+                            :min(subimage.shape[1], width - x0)]
+        return subimage, x0, y0
+
+    def _assembleRegion(self, iterInfo, out=None):
+        """
+        Assemble the tiles of a region into a numpy array.  The output array
+        is allocated once based on the data type and band count of the first
+        tile.  The remaining tiles are fetched a row at a time and copied into
+        place by a pool of worker threads.
+
+        :param iterInfo: tile iterator information.  See _tileIteratorInfo.
+        :param out: None to allocate the output array, or a numpy array of
+            shape (height, width, bands) of the region to fill.
+        :returns: a numpy array with the region.
+        """
+        width = iterInfo['region']['width']
+        height = iterInfo['region']['height']
+        left = iterInfo['region']['left']
+        top = iterInfo['region']['top']
+        if out is not None and (len(out.shape) != 3 or out.shape[:2] != (height, width)):
+            msg = 'The out array must have a shape of (%d, %d, bands).' % (height, width)
+            raise ValueError(msg)
+        tiles = self._tileIterator(iterInfo)
+        first = next(tiles)
+        subimage, x0, y0 = self._regionSubimage(first, left, top, width, height)
+        first.release()
+        image = out
+        if image is None:
+            if ((iterInfo['xmax'] - iterInfo['xmin']) *
+                    (iterInfo['ymax'] - iterInfo['ymin']) == 1 and
+                    (x0, y0, width, height) == (0, 0, subimage.shape[1], subimage.shape[0])):
+                return subimage
+            image = self._allocateRegion(height, width, subimage.shape[2], subimage.dtype)
+        deferred = [(subimage, x0, y0)]
+        workers = min(iterInfo['ymax'] - iterInfo['ymin'],
+                      config.getConfig('region_workers') or os.cpu_count() or 1)
+        if workers > 1:
+            pending = collections.deque()
+            with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as pool:
+                for row in self._tileRows(tiles):
+                    pending.append(pool.submit(self._addRegionRow, image, row, left, top))
+                    # Limit how far ahead of the workers the iterator gets
+                    if len(pending) >= workers * 2:
+                        deferred.extend(pending.popleft().result())
+                while len(pending):
+                    deferred.extend(pending.popleft().result())
+        else:
+            for row in self._tileRows(tiles):
+                deferred.extend(self._addRegionRow(image, row, left, top))
+        # Tiles with more bands than the output array require expanding it, so
+        # they are added after all other tiles are in place.
+        for subimage, x0, y0 in deferred:
+            if subimage.shape[2] > image.shape[2]:
+                if out is not None:
+                    msg = 'The out array has fewer bands than the region.'
+                    raise ValueError(msg)
+                image, subimage = _makeSameChannelDepth(image, subimage)
+            else:
+                _, subimage = _makeSameChannelDepth(image[:1, :1], subimage)
+            image[y0:y0 + subimage.shape[0], x0:x0 + subimage.shape[1], :] = subimage
+        return image
+
+    def _allocateRegion(self, height, width, bands, dtype):
+        """
+        Allocate a zeroed numpy array for a region.  If the array would be
+        larger than the max_region_memory config value or can't be allocated
+        in memory, a numpy.memmap backed by a temporary file is returned
+        instead.
+
+        :param height: the height of the array.
+        :param width: the width of the array.
+        :param bands: the number of bands of the array.
+        :param dtype: the data type of the array.
+        :returns: a numpy array or numpy.memmap.
+        """
+        shape = (height, width, bands)
+        limit = config.getConfig('max_region_memory')
+        if limit is None and psutil:
+            limit = psutil.virtual_memory().available // 2
+        if limit is None or height * width * bands * np.dtype(dtype).itemsize <= limit:
+            try:
+                return np.zeros(shape, dtype=dtype)
+            except MemoryError:
+                pass
+        self.logger.info(
+            'Using a memory-mapped file to get region of %d x %d pixels', width, height)
+        try:
+            # The file is removed when closed; the map keeps its own handle.
+            with tempfile.TemporaryFile(prefix='largeImageRegion_') as fptr:
+                return np.memmap(fptr, dtype=dtype, mode='w+', shape=shape)
+        except (OSError, ValueError):
+            raise exceptions.TileSourceError(
+                'Insufficient memory to get region of %d x %d pixels.' % (
+                    width, height))
+
+    def _scaleRegionInStrips(self, image, outWidth, outHeight, mode, format,
+                             stripBytes=64 * 1024 ** 2):
+        """
+        Scale a region that may be larger than memory, such as a numpy.memmap,
+        a strip at a time.  PIL resamples horizontally and then vertically; this
+        does the same passes in the same order with the same filters, so the
+        result matches scaling the whole image with PIL.  The intermediate
+        image is stored transposed so that both passes work on contiguous
+        strips.
+
+        :param image: the numpy array of the region.
+        :param outWidth: the output width.
+        :param outHeight: the output height.
+        :param mode: None or a PIL mode to convert the image to before scaling.
+        :param format: the output formats.  If this includes TILE_FORMAT_NUMPY
+            and the image is uint16, the output is uint16.
+        :param stripBytes: the approximate size of each strip in bytes.
+        :returns: a numpy array or numpy.memmap of the scaled region.
+        """
+        height, width = image.shape[:2]
+        resample = (getattr(PIL.Image, 'Resampling', PIL.Image).BICUBIC
+                    if outWidth > width else
+                    getattr(PIL.Image, 'Resampling', PIL.Image).LANCZOS)
+        # PIL scales images with alpha premultiplied
+        premultiplied = {'LA': 'La', 'RGBA': 'RGBa'}
+        intermediate = None
+        stripHeight = max(1, stripBytes // max(1, width * image.shape[2] * image.dtype.itemsize))
+        for y0 in range(0, height, stripHeight):
+            strip = _imageToPIL(image[y0:y0 + stripHeight], mode)
+            smode = strip.mode
+            if smode in premultiplied:
+                strip = strip.convert(premultiplied[smode])
+            strip = strip.resize((outWidth, strip.height), resample)
+            strip = np.frombuffer(strip.tobytes(), dtype=np.uint8).reshape(
+                strip.height, strip.width, len(smode))
+            if intermediate is None:
+                intermediate = self._allocateRegion(outWidth, height, len(smode), np.uint8)
+            intermediate[:, y0:y0 + strip.shape[0]] = strip.transpose((1, 0, 2))
+        result = None
+        imode = premultiplied.get(smode, smode)
+        stripWidth = max(1, stripBytes // max(1, height * len(smode)))
+        for x0 in range(0, outWidth, stripWidth):
+            strip = np.ascontiguousarray(intermediate[x0:x0 + stripWidth])
+            strip = PIL.Image.frombuffer(
+                imode, (strip.shape[1], strip.shape[0]), strip.tobytes(), 'raw', imode, 0, 1)
+            strip = strip.resize((outHeight, strip.height), resample)
+            if imode != smode:
+                strip = strip.convert(smode)
+            strip = _imageToNumpy(strip)[0].transpose((1, 0, 2))
+            if image.dtype == np.uint16 and TILE_FORMAT_NUMPY in format:
+                strip = strip.astype(np.uint16) * 257
+            if result is None:
+                result = self._allocateRegion(outHeight, outWidth, strip.shape[2], strip.dtype)
+            result[:, x0:x0 + strip.shape[1]] = strip
+        return result
+
+    def _tileRows(self, tiles):
+        """
+        Group tiles from the tile iterator by row.
+
+        :param tiles: an iterator of tiles.
+        :yields: lists of tiles that share the same level_y.
+        """
+        row = []
+        for tile in tiles:
+            if len(row) and tile['level_y'] != row[0]['level_y']:
+                yield row
+                row = []
+            row.append(tile)
+        if len(row):
+            yield row
+
+    def _addRegionRow(self, image, tiles, left, top):
+        """
+        Fetch a row of tiles and copy them into a region.  Tiles are released
+        once they are copied.
+
+        :param image: the numpy array of the region.
+        :param tiles: a list of tiles from the tile iterator.
+        :param left: the left of the region in the tile's coordinates.
+        :param top: the top of the region in the tile's coordinates.
+        :returns: a list of (subimage, x, y) tuples of tiles that have more
+            bands than the region and therefore weren't added.
+        """
+        height, width = image.shape[:2]
+        deferred = []
+        self._fetchTileRow(tiles)
+        for tile in tiles:
+            subimage, x0, y0 = self._regionSubimage(tile, left, top, width, height)
+            tile.release()
+            if subimage.shape[2] > image.shape[2]:
+                deferred.append((subimage, x0, y0))
+                continue
+            _, subimage = _makeSameChannelDepth(image[:1, :1], subimage)
+            image[y0:y0 + subimage.shape[0], x0:x0 + subimage.shape[1], :] = subimage
+        return deferred
+
     def _addRegionTileToImage(
             self, image, subimage, x, y, width, height, tiled=False, tile=None, **kwargs):
         """
@@ -2555,7 +3234,7 @@ class TileSource(IPyLeafletMixin):
         return level
 
     def tileIterator(self, format=(TILE_FORMAT_NUMPY, ), resample=True,
-                     **kwargs):
+                     prefetch=None, workers=None, **kwargs):
         """
         Iterate on all tiles in the specified region at the specified scale.
         Each tile is returned as part of a dictionary that includes
@@ -2708,6 +3387,14 @@ class TileSource(IPyLeafletMixin):
             Some of these are aliased: 'none', 'lzw', 'deflate'.
         :param frame: the frame number within the tile source.  None is the
             same as 0 for multi-frame sources.
+        :param prefetch: if a positive integer, load up to this many tiles
+            ahead of the tile that was most recently yielded using a pool of
+            worker threads.  Tiles are still yielded in the same order and
+            their image data is already loaded when they are yielded.  This is
+            useful when every tile will be accessed.
+        :param workers: the number of worker threads to use when prefetching
+            tiles.  If unspecified, this is the lesser of prefetch and the
+            number of logical cpus.
         :param kwargs: optional arguments.
         :yields: an iterator that returns a dictionary as listed above.
         """
@@ -2728,10 +3415,100 @@ class TileSource(IPyLeafletMixin):
         if (resample in (False, None) or
                 round(iterInfo['requestedScale'], 2) == 1.0):
             resample = False
+        if prefetch and int(prefetch) > 0:
+            yield from self._prefetchTileIterator(
+                iterInfo, format, resample, kwargs, int(prefetch), workers)
+            return
         for tile in self._tileIterator(iterInfo):
             tile.setFormat(format, resample, kwargs)
             yield tile
 
+    def _prefetchTileIterator(self, iterInfo, format, resample, imageKwargs,
+                              prefetch, workers=None):
+        """
+        Iterate through tiles, loading the image data of upcoming tiles on a
+        pool of worker threads.  Upcoming tiles are gathered in windows; the
+        source tiles of each window are looked up in the tile cache at once,
+        and only tiles that aren't cached are loaded by the workers.
+
+        :param iterInfo: tile iterator information.  See _tileIteratorInfo.
+        :param format: a tuple of allowed formats passed to each tile's
+            setFormat.
+        :param resample: the resample value passed to each tile's setFormat.
+        :param imageKwargs: the image parameters passed to each tile's
+            setFormat.
+        :param prefetch: the maximum number of tiles to load ahead of the tile
+            that is being yielded.
+        :param workers: the number of worker threads.  None to use the lesser
+            of prefetch and the number of logical cpus.
+        :yields: loaded tiles in the same order as _tileIterator.
+        """
+        workers = int(workers) if workers else min(prefetch, os.cpu_count() or 1)
+        pool = concurrent.futures.ThreadPoolExecutor(max_workers=max(1, workers))
+        pending = collections.deque()
+        tiles = self._tileIterator(iterInfo)
+        try:
+            while True:
+                # Refill once half of the window has been yielded, so that
+                # cache lookups are batched without exceeding prefetch
+                if len(pending) <= prefetch // 2:
+                    window = []
+                    for tile in tiles:
+                        tile.setFormat(format, resample, imageKwargs)
+                        window.append(tile)
+                        if len(pending) + len(window) > prefetch:
+                            break
+                    pending.extend(self._prefetchWindow(pool, window))
+                if not len(pending):
+                    break
+                yield self._prefetchedTile(*pending.popleft())
+        finally:
+            for _, future in pending:
+                if future is not None:
+                    future.cancel()
+            pool.shutdown(wait=False)
+
+    def _prefetchWindow(self, pool, tiles):
+        """
+        Start loading a window of tiles for _prefetchTileIterator.  Source
+        tiles that are in the tile cache are assigned to their tiles without
+        using the worker threads.
+
+        :param pool: the executor used to load uncached tiles.
+        :param tiles: a list of LazyTileDict tiles.
+        :returns: a list of (tile, future) tuples.  The future is None for
+            tiles whose source tile was cached.
+        """
+        loadable = [tile for tile in tiles if not tile.retile]
+        cached = self._cachedTiles([(tile.x, tile.y, tile.level, {
+            'pilImageAllowed': True, 'numpyAllowed': True,
+            'sparseFallback': True, 'frame': tile.frame,
+        }) for tile in loadable])
+        for idx, tileData in cached.items():
+            loadable[idx].sourceTile = tileData
+        return [(tile, None if tile.sourceTile is not None else
+                 pool.submit(tile.__getitem__, 'tile')) for tile in tiles]
+
+    def _prefetchedTile(self, tile, future):
+        """
+        Wait for a prefetched tile to finish loading.  If loading failed, the
+        tile is released so that the error is raised again when the tile data
+        is accessed.
+
+        :param tile: the tile that is being loaded.
+        :param future: the future loading the tile or None if the tile's
+            source tile was cached and it is loaded on this thread.
+        :returns: the tile.
+        """
+        try:
+            if future is None:
+                tile['tile']
+            else:
+                future.result()
+        except Exception:
+            tile.release()
+        return tile
+
     def tileIteratorAtAnotherScale(self, sourceRegion, sourceScale=None,
                                    targetScale=None, targetUnits=None,
                                    **kwargs):
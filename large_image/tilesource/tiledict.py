@@ -43,6 +43,8 @@ class LazyTileDict(dict):
         self.requestedScale = tileInfo.get('requestedScale')
         self.metadata = tileInfo.get('metadata')
         self.retile = tileInfo.get('retile') and self.metadata
+        # If set, this is used in place of calling getTile on the source
+        self.sourceTile = None
 
         self.deferredKeys = ('tile', 'format')
         self.alwaysAllowPIL = True
@@ -122,11 +124,12 @@ class LazyTileDict(dict):
         xmax = int((self['x'] + self.width - 1) // self.metadata['tileWidth'] + 1)
         ymin = int(max(0, self['y'] // self.metadata['tileHeight']))
         ymax = int((self['y'] + self.height - 1) // self.metadata['tileHeight'] + 1)
-        for x in range(xmin, xmax):
-            for y in range(ymin, ymax):
-                tileData = self.source.getTile(
-                    x, y, self.level,
-                    numpyAllowed='always', sparseFallback=True, frame=self.frame)
+        for y in range(ymin, ymax):
+            # Fetch a row of tiles at a time so that sources can combine reads
+            tiles = self.source.getTiles(
+                [(x, y, self.level) for x in range(xmin, xmax)],
+                numpyAllowed='always', sparseFallback=True, frame=self.frame)
+            for x, tileData in zip(range(xmin, xmax), tiles):
                 tileData, _ = _imageToNumpy(tileData)
                 if retile is None:
                     retile = np.zeros(
@@ -163,10 +166,13 @@ class LazyTileDict(dict):
             self.loaded = True
 
             if not self.retile:
-                tileData = self.source.getTile(
-                    self.x, self.y, self.level,
-                    pilImageAllowed=True, numpyAllowed=True,
-                    sparseFallback=True, frame=self.frame)
+                if self.sourceTile is not None:
+                    tileData, self.sourceTile = self.sourceTile, None
+                else:
+                    tileData = self.source.getTile(
+                        self.x, self.y, self.level,
+                        pilImageAllowed=True, numpyAllowed=True,
+                        sparseFallback=True, frame=self.frame)
                 if self.crop:
                     tileData, _ = _imageToNumpy(tileData)
                     tileData = tileData[self.crop[1]:self.crop[3], self.crop[0]:self.crop[2]]
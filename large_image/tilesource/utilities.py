@@ -1,5 +1,7 @@
+import functools
 import io
 import math
+import threading
 import types
 import xml.etree.ElementTree
 from collections import defaultdict
@@ -64,6 +66,45 @@ class ImageBytes(bytes):
         return f'ImageBytes<{len(self)}> (wrapped image bytes)'
 
 
+class UniformTile:
+    """
+    A tile where every pixel has the same value, such as a missing tile in a
+    sparse file or an area outside of all of the data.  A source can return
+    this from getTile in place of a numpy array so that the encoded tile can
+    be shared by every tile with the same color and size.
+    """
+
+    def __init__(self, color, width, height, dtype=None):
+        """
+        Describe a uniform tile.
+
+        :param color: a sequence with one value per band or a single value.
+        :param width: the width of the tile in pixels.
+        :param height: the height of the tile in pixels.
+        :param dtype: the numpy dtype of the tile.  If None, this is based on
+            the color values.
+        """
+        self.color = tuple(color) if isinstance(color, (list, tuple)) else (color, )
+        self.width = int(width)
+        self.height = int(height)
+        self.dtype = np.dtype(dtype) if dtype is not None else np.array(self.color).dtype
+
+    def __repr__(self):
+        return 'UniformTile(%r, %d, %d, %s)' % (self.color, self.width, self.height, self.dtype)
+
+    @property
+    def shape(self):
+        return (self.height, self.width, len(self.color))
+
+    def toNumpy(self):
+        """
+        Get the tile as a numpy array.
+
+        :returns: a numpy array with three dimensions.
+        """
+        return np.full(self.shape, self.color, dtype=self.dtype)
+
+
 class JSONDict(dict):
     """Wrapper class to improve Jupyter repr of JSON-able dicts."""
 
@@ -133,6 +174,28 @@ def _encodeImageBinary(image, encoding, jpegQuality, jpegSubsampling, tiffCompre
     )
 
 
+@functools.lru_cache(maxsize=256)
+def _encodeUniformTile(color, dtype, width, height, encoding, jpegQuality,
+                       jpegSubsampling, tiffCompression):
+    """
+    Encode a tile where every pixel has the same value.  The result is
+    memoized, so this must only be called with hashable parameters.
+
+    :param color: a tuple with one value per band.
+    :param dtype: the numpy dtype of the tile as a string.
+    :param width: the width of the tile in pixels.
+    :param height: the height of the tile in pixels.
+    :param encoding: a valid PIL encoding (typically 'PNG' or 'JPEG').
+    :param jpegQuality: the quality to use when encoding a JPEG.
+    :param jpegSubsampling: the subsampling level to use when encoding a JPEG.
+    :param tiffCompression: the compression format to use when encoding a TIFF.
+    :returns: a binary image.
+    """
+    tile = UniformTile(color, width, height, dtype).toNumpy()
+    return _encodeImageBinary(
+        _imageToPIL(tile), encoding, jpegQuality, jpegSubsampling, tiffCompression)
+
+
 def _encodeImage(image, encoding='JPEG', jpegQuality=95, jpegSubsampling=0,
                  format=(TILE_FORMAT_IMAGE, ), tiffCompression='raw',
                  **kwargs):
@@ -181,6 +244,8 @@ def _imageToPIL(image, setMode=None):
     :param setMode: if specified, the output image is converted to this mode.
     :returns: a PIL image.
     """
+    if isinstance(image, UniformTile):
+        image = image.toNumpy()
     if isinstance(image, np.ndarray):
         mode = 'L'
         if len(image.shape) == 3:
@@ -220,6 +285,8 @@ def _imageToNumpy(image):
     :param image: input image.
     :returns: a numpy array and a target PIL image mode.
     """
+    if isinstance(image, UniformTile):
+        image = image.toNumpy()
     if not isinstance(image, np.ndarray):
         if not isinstance(image, PIL.Image.Image):
             image = PIL.Image.open(io.BytesIO(image))
@@ -567,6 +634,10 @@ def _arrayToPalette(palette):
     return np.array(arr)
 
 
+_recentPalettes = {}
+_recentPalettesLock = threading.Lock()
+
+
 def getPaletteColors(value):
     """
     Given a list or a name, return a list of colors in the form of a numpy
@@ -582,6 +653,28 @@ def getPaletteColors(value):
         above.
     :returns: a numpy array of RGBA value on the scale of [0-255].
     """
+    # Resolving named palettes can take longer than applying them to a tile.
+    # The repr of a large numpy array is abbreviated, so arrays aren't
+    # remembered.
+    key = repr(value) if not isinstance(value, np.ndarray) else None
+    palette = _recentPalettes.get(key) if key is not None else None
+    if palette is None:
+        palette = _resolvePalette(value)
+        if key is not None:
+            with _recentPalettesLock:
+                if len(_recentPalettes) > 100:
+                    _recentPalettes.clear()
+                _recentPalettes[key] = palette
+    return palette.copy()
+
+
+def _resolvePalette(value):
+    """
+    Resolve a palette as described in getPaletteColors.
+
+    :param value: Either a list, a single color name, or a palette name.
+    :returns: a numpy array of RGBA value on the scale of [0-255].
+    """
     palette = None
     if isinstance(value, (tuple, list)):
         palette = value
@@ -962,6 +1055,135 @@ def getTileFramesQuadInfo(metadata, options=None):
     return status
 
 
+def _histogramPartial(tile, histogram=None):
+    """
+    Compute mergeable per-band statistics for a single tile.  Integer data of
+    16 bits or less is tallied with a count of every possible value, from
+    which exact statistics and histograms with any bins and range can be
+    derived later.  Other data records the per-band minimum, maximum, sum, and
+    sum of squares, plus a histogram per band if histogram parameters are
+    given.
+
+    :param tile: a numpy array of shape (height, width, bands).
+    :param histogram: None or a list of (bins, range) tuples, one per band.
+        If the list is shorter than the number of bands, the last entry is
+        used for the remaining bands.
+    :returns: a dictionary that can be combined with other partial results
+        via _mergeHistogramPartials.
+    """
+    if len(tile.shape) < 3:
+        tile = tile[:, :, np.newaxis]
+    bands = tile.shape[2]
+    data = tile.reshape(-1, bands)
+    partial = {'dtype': tile.dtype, 'count': data.shape[0]}
+    if np.issubdtype(tile.dtype, np.integer) and tile.dtype.itemsize <= 2:
+        offset = int(np.iinfo(tile.dtype).min)
+        span = int(np.iinfo(tile.dtype).max) - offset + 1
+        # Tally all bands at once by shifting each band into its own span
+        values = data.astype(np.intp) + (np.arange(bands, dtype=np.intp) * span - offset)
+        partial['offset'] = offset
+        partial['counts'] = np.bincount(
+            values.ravel(), minlength=bands * span).reshape(bands, span)
+        return partial
+    partial['min'] = np.amin(data, axis=0)
+    partial['max'] = np.amax(data, axis=0)
+    fdata = data.astype(float)
+    partial['sum'] = np.sum(fdata, axis=0)
+    partial['sum2'] = np.einsum('ij,ij->j', fdata, fdata)
+    if histogram:
+        partial['hist'] = [np.histogram(
+            data[:, idx], *histogram[min(idx, len(histogram) - 1)])[0]
+            for idx in range(bands)]
+    return partial
+
+
+def _histogramPartialStats(partial, histogram=None):
+    """
+    Convert a partial result that tallies every value to one with the
+    per-band minimum, maximum, sum, and sum of squares.
+
+    :param partial: a partial result from _histogramPartial.
+    :param histogram: None or a list of (bins, range) tuples, one per band.
+        If specified, a histogram is computed for each band.
+    :returns: a partial result without value counts.
+    """
+    if 'counts' not in partial:
+        return partial
+    counts = partial['counts']
+    values = np.arange(counts.shape[1]) + partial['offset']
+    present = counts > 0
+    first = np.argmax(present, axis=1)
+    last = counts.shape[1] - 1 - np.argmax(present[:, ::-1], axis=1)
+    fvalues = values.astype(float)
+    stats = {
+        'dtype': partial['dtype'],
+        'count': partial['count'],
+        'min': values[first].astype(partial['dtype']),
+        'max': values[last].astype(partial['dtype']),
+        'sum': counts @ fvalues,
+        'sum2': counts @ (fvalues * fvalues),
+    }
+    if histogram:
+        # Weighting each possible value by its count gives the same result as
+        # a histogram of the original data.
+        stats['hist'] = [np.histogram(
+            values, *histogram[min(idx, len(histogram) - 1)], weights=counts[idx])[0]
+            for idx in range(counts.shape[0])]
+    return stats
+
+
+def _mergeHistogramPartials(partial, other, histogram=None):
+    """
+    Combine two partial results from _histogramPartial.  Only the bands of
+    the first partial result are kept.
+
+    :param partial: a partial result or None.
+    :param other: a partial result or None.
+    :param histogram: the histogram parameters used when the partial results
+        were created.  This is needed if a partial result that tallies values
+        is combined with one that does not.
+    :returns: the combined partial result.
+    """
+    if partial is None or other is None:
+        return partial if other is None else other
+    bands = partial['counts' if 'counts' in partial else 'min'].shape[0]
+    dtype = np.promote_types(partial['dtype'], other['dtype'])
+    if 'counts' in partial and 'counts' in other:
+        start = min(partial['offset'], other['offset'])
+        stop = max(partial['offset'] + partial['counts'].shape[1],
+                   other['offset'] + other['counts'].shape[1])
+        counts = partial['counts']
+        if (start, stop) != (partial['offset'], partial['offset'] + counts.shape[1]):
+            counts = np.zeros((bands, stop - start), dtype=counts.dtype)
+            pos = partial['offset'] - start
+            counts[:, pos:pos + partial['counts'].shape[1]] = partial['counts']
+        pos = other['offset'] - start
+        obands = min(bands, other['counts'].shape[0])
+        counts[:obands, pos:pos + other['counts'].shape[1]] += other['counts'][:obands]
+        return {'dtype': dtype, 'count': partial['count'] + other['count'],
+                'offset': start, 'counts': counts}
+    partial = _histogramPartialStats(partial, histogram)
+    other = _histogramPartialStats(other, histogram)
+    obands = min(bands, other['min'].shape[0])
+    result = {
+        'dtype': dtype,
+        'count': partial['count'] + other['count'],
+        'min': partial['min'].astype(dtype),
+        'max': partial['max'].astype(dtype),
+        'sum': partial['sum'].copy(),
+        'sum2': partial['sum2'].copy(),
+    }
+    result['min'][:obands] = np.minimum(result['min'][:obands], other['min'][:obands])
+    result['max'][:obands] = np.maximum(result['max'][:obands], other['max'][:obands])
+    result['sum'][:obands] += other['sum'][:obands]
+    result['sum2'][:obands] += other['sum2'][:obands]
+    if 'hist' in partial and 'hist' in other:
+        result['hist'] = [
+            hist + other['hist'][idx] if idx < obands else hist
+            for idx, hist in enumerate(partial['hist'])]
+    return result
+
+
 _recentThresholds = {}
 
 
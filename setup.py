@@ -116,6 +116,12 @@ setup(
     include_package_data=True,
     keywords='large_image',
     packages=['large_image'],
+    entry_points={
+        'large_image.cache': [
+            'disk = large_image.cache_util.diskcache:DiskCache',
+            'shared = large_image.cache_util.sharedcache:SharedMemoryCache',
+        ],
+    },
     url='https://github.com/girder/large_image',
     python_requires='>=3.6',
     zip_safe=False,
@@ -35,7 +35,7 @@ import numpy as np
 
 import large_image.tilesource.base
 from large_image import config
-from large_image.cache_util import LruCacheMetaclass, methodcache
+from large_image.cache_util import LruCacheMetaclass, decodedtilecache, methodcache
 from large_image.constants import TILE_FORMAT_NUMPY, SourcePriority
 from large_image.exceptions import TileSourceError, TileSourceFileNotFoundError
 from large_image.tilesource import FileTileSource, nearPowerOfTwo
@@ -568,6 +568,7 @@ class BioformatsFileTileSource(FileTileSource, metaclass=LruCacheMetaclass):
         return result[::scale, ::scale, ::]
 
     @methodcache()
+    @decodedtilecache
     def getTile(self, x, y, z, pilImageAllowed=False, numpyAllowed=False, **kwargs):
         self._xyzInRange(x, y, z)
         ft = fc = fz = 0
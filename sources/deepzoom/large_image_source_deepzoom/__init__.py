@@ -5,7 +5,7 @@ from xml.etree import ElementTree
 
 import PIL.Image
 
-from large_image.cache_util import LruCacheMetaclass, methodcache
+from large_image.cache_util import LruCacheMetaclass, decodedtilecache, methodcache
 from large_image.constants import TILE_FORMAT_PIL, SourcePriority
 from large_image.exceptions import TileSourceError, TileSourceFileNotFoundError
 from large_image.tilesource import FileTileSource, etreeToDict
@@ -101,6 +101,7 @@ class DeepzoomFileTileSource(FileTileSource, metaclass=LruCacheMetaclass):
         return result
 
     @methodcache()
+    @decodedtilecache
     def getTile(self, x, y, z, pilImageAllowed=False, numpyAllowed=False, **kwargs):
         self._xyzInRange(x, y, z)
         tilename = '%d_%d.%s' % (x, y, self._info['Format'])
@@ -8,7 +8,7 @@ from importlib.metadata import version as _importlib_version
 import numpy as np
 
 from large_image import config
-from large_image.cache_util import LruCacheMetaclass, methodcache
+from large_image.cache_util import LruCacheMetaclass, decodedtilecache, methodcache
 from large_image.constants import TILE_FORMAT_PIL, SourcePriority
 from large_image.exceptions import TileSourceError, TileSourceFileNotFoundError
 from large_image.tilesource import FileTileSource
@@ -315,10 +315,26 @@ class DICOMFileTileSource(FileTileSource, metaclass=LruCacheMetaclass):
         return result
 
     @methodcache()
+    @decodedtilecache
     def getTile(self, x, y, z, pilImageAllowed=False, numpyAllowed=False, **kwargs):
         frame = self._getFrame(**kwargs)
         self._xyzInRange(x, y, z, frame)
+        tile = self._tileFromRun(x, y, z, frame)
+        return self._outputTile(tile, TILE_FORMAT_PIL, x, y, z,
+                                pilImageAllowed, numpyAllowed, **kwargs)
+
+    def getTiles(self, requests, **kwargs):
+        """
+        Get a list of tiles.  Horizontally adjacent tiles are fetched with a
+        single read_region call, so the frames they need are requested
+        together.  See the base class for parameters.
+        """
+        return self._getTilesInRuns(requests, kwargs)
+
+    def _readTileRun(self, x, y, z, count, frame):
         x0, y0, x1, y1, step = self._xyzToCorners(x, y, z)
+        if count > 1:
+            x1 = self._xyzToCorners(x + count - 1, y, z)[2]
         bw = self.tileWidth * step
         bh = self.tileHeight * step
         level = 0
@@ -335,11 +351,30 @@ class DICOMFileTileSource(FileTileSource, metaclass=LruCacheMetaclass):
         y0f = int(y0 // levelfactor)
         x1f = min(int(math.ceil(x1 / levelfactor)), self._dicom.levels[level].size.width)
         y1f = min(int(math.ceil(y1 / levelfactor)), self._dicom.levels[level].size.height)
-        bw = int(bw // levelfactor)
-        bh = int(bh // levelfactor)
-        tile = self._dicom.read_region(
+        region = self._dicom.read_region(
             (x0f, y0f), self._dicom.levels[level].level, (x1f - x0f, y1f - y0f))
-        format = TILE_FORMAT_PIL
+        tiles = []
+        for idx in range(count):
+            tile = region
+            if count > 1:
+                tx0f = int((x0 + idx * bw) // levelfactor) - x0f
+                tx1f = min(int(math.ceil((x0 + (idx + 1) * bw) / levelfactor)) - x0f,
+                           region.width)
+                tile = region.crop((tx0f, 0, tx1f, region.height))
+            tiles.append(self._padAndScaleTile(
+                tile, int(bw // levelfactor), int(bh // levelfactor)))
+        return tiles
+
+    def _padAndScaleTile(self, tile, bw, bh):
+        """
+        Pad a tile read from a level to the full tile size and scale it to the
+        output tile size.
+
+        :param tile: a PIL image read from a level.
+        :param bw: the width of a full tile in the level.
+        :param bh: the height of a full tile in the level.
+        :returns: a PIL image.
+        """
         if tile.width < bw or tile.height < bh:
             tile = _imageToNumpy(tile)[0]
             tile = np.pad(
@@ -349,8 +384,7 @@ class DICOMFileTileSource(FileTileSource, metaclass=LruCacheMetaclass):
             tile = _imageToPIL(tile)
         if bw > self.tileWidth or bh > self.tileHeight:
             tile = tile.resize((self.tileWidth, self.tileHeight))
-        return self._outputTile(tile, format, x, y, z,
-                                pilImageAllowed, numpyAllowed, **kwargs)
+        return tile
 
     def getAssociatedImagesList(self):
         """
@@ -22,7 +22,6 @@ import tempfile
 import threading
 
 import numpy as np
-import PIL.Image
 from osgeo import gdal, gdal_array, gdalconst, osr
 
 try:
@@ -41,9 +40,8 @@ import pyproj
 # isort: on
 
 import large_image
-from large_image.cache_util import LruCacheMetaclass, methodcache
-from large_image.constants import (TILE_FORMAT_IMAGE, TILE_FORMAT_NUMPY,
-                                   TILE_FORMAT_PIL, TileOutputMimeTypes)
+from large_image.cache_util import LruCacheMetaclass, decodedtilecache, methodcache
+from large_image.constants import TILE_FORMAT_IMAGE, TILE_FORMAT_NUMPY, TileOutputMimeTypes
 from large_image.exceptions import (TileSourceError,
                                     TileSourceFileNotFoundError,
                                     TileSourceInefficientError)
@@ -51,7 +49,7 @@ from large_image.tilesource.geo import (GDALBaseFileTileSource, InitPrefix,
                                         NeededInitPrefix,
                                         ProjUnitsAcrossLevel0,
                                         ProjUnitsAcrossLevel0_MaxSize)
-from large_image.tilesource.utilities import JSONDict
+from large_image.tilesource.utilities import JSONDict, UniformTile
 
 try:
     from importlib.metadata import PackageNotFoundError
@@ -682,6 +680,7 @@ class GDALFileTileSource(GDALBaseFileTileSource, metaclass=LruCacheMetaclass):
         return int(band)
 
     @methodcache()
+    @decodedtilecache
     def getTile(self, x, y, z, pilImageAllowed=False, numpyAllowed=False, **kwargs):
         if not self.projection:
             self._xyzInRange(x, y, z)
@@ -700,9 +699,9 @@ class GDALFileTileSource(GDALBaseFileTileSource, metaclass=LruCacheMetaclass):
             bounds = self.getBounds(self.projection)
             if (xmin >= bounds['xmax'] or xmax <= bounds['xmin'] or
                     ymin >= bounds['ymax'] or ymax <= bounds['ymin']):
-                pilimg = PIL.Image.new('RGBA', (self.tileWidth, self.tileHeight))
                 return self._outputTile(
-                    pilimg, TILE_FORMAT_PIL, x, y, z, applyStyle=False, **kwargs)
+                    UniformTile((0, 0, 0, 0), self.tileWidth, self.tileHeight, np.uint8),
+                    TILE_FORMAT_NUMPY, x, y, z, applyStyle=False, **kwargs)
             res = (self.unitsAcrossLevel0 / self.tileSize) * (2 ** -z)
             if not hasattr(self, '_warpSRS'):
                 self._warpSRS = (self.getProj4String(),
@@ -13,11 +13,11 @@ import numpy as np
 import yaml
 
 import large_image
-from large_image.cache_util import LruCacheMetaclass, methodcache
+from large_image.cache_util import LruCacheMetaclass, decodedtilecache, methodcache
 from large_image.constants import TILE_FORMAT_NUMPY, SourcePriority
 from large_image.exceptions import TileSourceError, TileSourceFileNotFoundError
 from large_image.tilesource import FileTileSource
-from large_image.tilesource.utilities import _makeSameChannelDepth
+from large_image.tilesource.utilities import UniformTile, _makeSameChannelDepth
 
 try:
     from importlib.metadata import PackageNotFoundError
@@ -944,6 +944,20 @@ class MultiFileTileSource(FileTileSource, metaclass=LruCacheMetaclass):
         base[y:y + tile.shape[0], x:x + tile.shape[1], :] = tile
         return base
 
+    def _sourceIntersectsTile(self, sourceEntry, corners):
+        """
+        Check if a source has any data within a tile.
+
+        :param sourceEntry: the current record from the sourceList.
+        :param corners: the four corners of the tile in the main image space
+            coordinates.
+        :returns: True if the source's bounding box overlaps the tile.
+        """
+        bbox = self._sources[sourceEntry['sourcenum']]['bbox']
+        return not (
+            corners[2][0] <= bbox['left'] or corners[0][0] >= bbox['right'] or
+            corners[2][1] <= bbox['top'] or corners[0][1] >= bbox['bottom'])
+
     def _addSourceToTile(self, tile, sourceEntry, corners, scale):
         """
         Add a source to the current tile.
@@ -960,13 +974,12 @@ class MultiFileTileSource(FileTileSource, metaclass=LruCacheMetaclass):
             output pixel.
         :returns: a numpy array of the tile.
         """
+        # If tile is outside of bounding box, skip it
+        if not self._sourceIntersectsTile(sourceEntry, corners):
+            return tile
         source = self._sources[sourceEntry['sourcenum']]
         ts = self._openSource(source, sourceEntry['kwargs'])
-        # If tile is outside of bounding box, skip it
         bbox = source['bbox']
-        if (corners[2][0] <= bbox['left'] or corners[0][0] >= bbox['right'] or
-                corners[2][1] <= bbox['top'] or corners[0][1] >= bbox['bottom']):
-            return tile
         transform = bbox.get('transform')
         srccorners = (
             list(np.dot(bbox['inverse'], np.array(corners).T).T)
@@ -1021,6 +1034,7 @@ class MultiFileTileSource(FileTileSource, metaclass=LruCacheMetaclass):
         return tile
 
     @methodcache()
+    @decodedtilecache
     def getTile(self, x, y, z, pilImageAllowed=False, numpyAllowed=False, **kwargs):
         frame = self._getFrame(**kwargs)
         self._xyzInRange(x, y, z, frame, len(self._frames) if hasattr(self, '_frames') else None)
@@ -1043,6 +1057,14 @@ class MultiFileTileSource(FileTileSource, metaclass=LruCacheMetaclass):
             1,
         ]]
         sourceList = self._frames[frame]['sources']
+        # If no source has data in the tile, it is just the background color
+        if not any(self._sourceIntersectsTile(sourceEntry, corners)
+                   for sourceEntry in sourceList):
+            colors = self._info.get('backgroundColor', [0])
+            if colors:
+                return self._outputTile(
+                    UniformTile(colors, self.tileWidth, self.tileHeight),
+                    TILE_FORMAT_NUMPY, x, y, z, pilImageAllowed, numpyAllowed, **kwargs)
         tile = None
         # If the first source does not completely cover the output tile or uses
         # a transformation, create a tile that is the desired size and fill it
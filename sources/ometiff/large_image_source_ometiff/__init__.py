@@ -24,7 +24,7 @@ import PIL.Image
 from large_image_source_tiff import TiffFileTileSource
 from large_image_source_tiff.exceptions import InvalidOperationTiffError, IOTiffError, TiffError
 
-from large_image.cache_util import LruCacheMetaclass, methodcache
+from large_image.cache_util import LruCacheMetaclass, decodedtilecache, methodcache
 from large_image.constants import TILE_FORMAT_NUMPY, TILE_FORMAT_PIL, SourcePriority
 from large_image.exceptions import TileSourceError, TileSourceFileNotFoundError
 
@@ -66,6 +66,10 @@ _omeUnitsToMeters = {
     '\u00c5': 1e-10,
 }
 
+# The version of the parsed OME metadata in the source index; change this if
+# the parsing changes
+_omeIndexVersion = 2
+
 
 class OMETiffFileTileSource(TiffFileTileSource, metaclass=LruCacheMetaclass):
     """
@@ -102,19 +106,18 @@ class OMETiffFileTileSource(TiffFileTileSource, metaclass=LruCacheMetaclass):
         self._largeImagePath = str(self._getLargeImagePath())
 
         try:
-            base = self.getTiffDir(0, mustBeTiled=None)
+            index = self._persistentIndex('ometiff', _omeIndexVersion, self._indexOME)
+            # When the index was just computed, the first directory was opened
+            # to compute it; otherwise, open it without parsing its OME XML
+            base = self.__dict__.pop('_omeIndexBase', None) or self.getTiffDir(
+                0, mustBeTiled=None, descriptionRecord=index['description'])
         except TiffError:
             if not os.path.isfile(self._largeImagePath):
                 raise TileSourceFileNotFoundError(self._largeImagePath) from None
             msg = 'Not a recognized OME Tiff'
             raise TileSourceError(msg)
-        info = getattr(base, '_description_record', None)
-        if not info or not info.get('OME'):
-            msg = 'Not an OME Tiff'
-            raise TileSourceError(msg)
-        self._omeinfo = info['OME']
-        self._checkForOMEZLoop()
-        self._parseOMEInfo()
+        self._omeinfo = index['omeinfo']
+        self._omebase = self._omeinfo['Image'][0]['Pixels']
         omeimages = [
             entry['Pixels'] for entry in self._omeinfo['Image'] if
             len(entry['Pixels']['TiffData']) == len(self._omebase['TiffData'])]
@@ -126,13 +129,14 @@ class OMETiffFileTileSource(TiffFileTileSource, metaclass=LruCacheMetaclass):
         self._omeLevels = [omebylevel.get(key) for key in range(max(omebylevel.keys()) + 1)]
         if base._tiffInfo.get('istiled'):
             self._tiffDirectories = [
-                self.getTiffDir(int(entry['TiffData'][0].get('IFD', 0)))
+                self.getTiffDir(int(entry['TiffData'][0].get('IFD', 0)), descriptionRecord=(
+                    base._description_record
+                    if not int(entry['TiffData'][0].get('IFD', 0)) else None))
                 if entry else None
                 for entry in self._omeLevels]
         else:
             self._tiffDirectories = [
-                self.getTiffDir(0, mustBeTiled=None)
-                if entry else None
+                base if entry else None
                 for entry in self._omeLevels]
             self._checkForInefficientDirectories(warn=False)
             _maxChunk = min(base.imageWidth, base.tileWidth * self._skippedLevels ** 2) * \
@@ -152,6 +156,34 @@ class OMETiffFileTileSource(TiffFileTileSource, metaclass=LruCacheMetaclass):
         self._associatedImages = {}
         self._checkForInefficientDirectories()
 
+    def _indexOME(self):
+        """
+        Read the OME metadata from the image description of the first tiff
+        directory and parse it.  The directory is kept as _omeIndexBase.
+
+        :returns: a dictionary with 'description', the parsed image
+            description of the first directory, and 'omeinfo', the parsed OME
+            record.
+        """
+        self._omeIndexBase = base = self.getTiffDir(0, mustBeTiled=None)
+        info = getattr(base, '_description_record', None)
+        if not info or not info.get('OME'):
+            msg = 'Not an OME Tiff'
+            raise TileSourceError(msg)
+        return {'description': info, 'omeinfo': self._indexOMEInfo(info['OME'])}
+
+    def _indexOMEInfo(self, omeinfo):
+        """
+        Parse the OME metadata into the form used by this source.
+
+        :param omeinfo: the OME record from the image description.
+        :returns: the parsed OME record.
+        """
+        self._omeinfo = omeinfo
+        self._checkForOMEZLoop()
+        self._parseOMEInfo()
+        return self._omeinfo
+
     def _checkForOMEZLoop(self):
         """
         Check if the OME description lists a Z-loop that isn't referenced by
@@ -320,6 +352,7 @@ class OMETiffFileTileSource(TiffFileTileSource, metaclass=LruCacheMetaclass):
         return result
 
     @methodcache()
+    @decodedtilecache
     def getTile(self, x, y, z, pilImageAllowed=False, numpyAllowed=False,
                 sparseFallback=False, **kwargs):
         if (z < 0 or z >= len(self._omeLevels) or (
@@ -22,7 +22,7 @@ import openslide
 import PIL
 import tifftools
 
-from large_image.cache_util import LruCacheMetaclass, methodcache
+from large_image.cache_util import LruCacheMetaclass, decodedtilecache, methodcache
 from large_image.constants import TILE_FORMAT_PIL, SourcePriority
 from large_image.exceptions import TileSourceError, TileSourceFileNotFoundError
 from large_image.tilesource import FileTileSource, nearPowerOfTwo
@@ -275,8 +275,22 @@ class OpenslideFileTileSource(FileTileSource, metaclass=LruCacheMetaclass):
         return results
 
     @methodcache()
+    @decodedtilecache
     def getTile(self, x, y, z, pilImageAllowed=False, numpyAllowed=False, **kwargs):
         self._xyzInRange(x, y, z)
+        tile = self._tileFromRun(x, y, z)
+        return self._outputTile(tile, TILE_FORMAT_PIL, x, y, z, pilImageAllowed,
+                                numpyAllowed, **kwargs)
+
+    def getTiles(self, requests, **kwargs):
+        """
+        Get a list of tiles.  Horizontally adjacent tiles are read from the
+        slide with a single read_region call.  See the base class for
+        parameters.
+        """
+        return self._getTilesInRuns(requests, kwargs)
+
+    def _readTileRun(self, x, y, z, count, frame):
         svslevel = self._svslevels[z]
         # When we read a region from the SVS, we have to ask for it in the
         # SVS level 0 coordinate system.  Our x and y is in tile space at the
@@ -288,20 +302,30 @@ class OpenslideFileTileSource(FileTileSource, metaclass=LruCacheMetaclass):
         # We ask to read an area that will cover the tile at the z level.  The
         # scale we computed in the __init__ process for this svs level tells
         # how much larger a region we need to read.
+        width = self.tileWidth * svslevel['scale']
+        height = self.tileHeight * svslevel['scale']
+        # A run of tiles can only be cropped from a single read if tile
+        # boundaries fall on whole pixels of the svs level.
+        if count > 1 and (
+                self._openslide.level_downsamples[svslevel['svslevel']] * svslevel['scale'] !=
+                scale):
+            return [self._readTileRun(x + idx, y, z, 1, frame)[0] for idx in range(count)]
         try:
-            tile = self._openslide.read_region(
-                (offsetx, offsety), svslevel['svslevel'],
-                (self.tileWidth * svslevel['scale'],
-                 self.tileHeight * svslevel['scale']))
+            region = self._openslide.read_region(
+                (offsetx, offsety), svslevel['svslevel'], (width * count, height))
         except openslide.lowlevel.OpenSlideError as exc:
             raise TileSourceError(
                 'Failed to get OpenSlide region (%r).' % exc)
-        # Always scale to the svs level 0 tile size.
-        if svslevel['scale'] != 1:
-            tile = tile.resize((self.tileWidth, self.tileHeight),
-                               getattr(PIL.Image, 'Resampling', PIL.Image).LANCZOS)
-        return self._outputTile(tile, TILE_FORMAT_PIL, x, y, z, pilImageAllowed,
-                                numpyAllowed, **kwargs)
+        tiles = []
+        for idx in range(count):
+            tile = region if count == 1 else region.crop(
+                (idx * width, 0, (idx + 1) * width, height))
+            # Always scale to the svs level 0 tile size.
+            if svslevel['scale'] != 1:
+                tile = tile.resize((self.tileWidth, self.tileHeight),
+                                   getattr(PIL.Image, 'Resampling', PIL.Image).LANCZOS)
+            tiles.append(tile)
+        return tiles
 
     def getPreferredLevel(self, level):
         """
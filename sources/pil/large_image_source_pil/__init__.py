@@ -24,7 +24,7 @@ import PIL.Image
 
 import large_image
 from large_image import config
-from large_image.cache_util import LruCacheMetaclass, methodcache, strhash
+from large_image.cache_util import LruCacheMetaclass, decodedtilecache, methodcache, strhash
 from large_image.constants import TILE_FORMAT_PIL, SourcePriority
 from large_image.exceptions import TileSourceError, TileSourceFileNotFoundError
 from large_image.tilesource import FileTileSource
@@ -259,6 +259,7 @@ class PILFileTileSource(FileTileSource, metaclass=LruCacheMetaclass):
         return results
 
     @methodcache()
+    @decodedtilecache
     def getTile(self, x, y, z, pilImageAllowed=False, numpyAllowed=False,
                 mayRedirect=False, **kwargs):
         frame = self._getFrame(**kwargs)
@@ -23,7 +23,6 @@ import warnings
 from contextlib import suppress
 
 import numpy as np
-import PIL.Image
 import rasterio as rio
 from affine import Affine
 from rasterio import warp
@@ -31,17 +30,16 @@ from rasterio.enums import ColorInterp, Resampling
 from rasterio.errors import RasterioIOError
 
 import large_image
-from large_image.cache_util import LruCacheMetaclass, methodcache
+from large_image.cache_util import LruCacheMetaclass, decodedtilecache, methodcache
 from large_image.constants import (TILE_FORMAT_IMAGE, TILE_FORMAT_NUMPY,
-                                   TILE_FORMAT_PIL, TileInputUnits,
-                                   TileOutputMimeTypes)
+                                   TileInputUnits, TileOutputMimeTypes)
 from large_image.exceptions import (TileSourceError,
                                     TileSourceFileNotFoundError,
                                     TileSourceInefficientError)
 from large_image.tilesource.geo import (GDALBaseFileTileSource,
                                         ProjUnitsAcrossLevel0,
                                         ProjUnitsAcrossLevel0_MaxSize)
-from large_image.tilesource.utilities import JSONDict
+from large_image.tilesource.utilities import JSONDict, UniformTile
 
 try:
     from importlib.metadata import PackageNotFoundError
@@ -552,6 +550,7 @@ class RasterioFileTileSource(GDALBaseFileTileSource, metaclass=LruCacheMetaclass
         return result
 
     @methodcache()
+    @decodedtilecache
     def getTile(self, x, y, z, pilImageAllowed=False, numpyAllowed=False, **kwargs):
         if not self.projection:
             self._xyzInRange(x, y, z)
@@ -583,9 +582,9 @@ class RasterioFileTileSource(GDALBaseFileTileSource, metaclass=LruCacheMetaclass
                 ymin >= bounds['ymax'] or
                 ymax <= bounds['ymin']
             ):
-                pilimg = PIL.Image.new('RGBA', (self.tileWidth, self.tileHeight))
                 return self._outputTile(
-                    pilimg, TILE_FORMAT_PIL, x, y, z, applyStyle=False, **kwargs,
+                    UniformTile((0, 0, 0, 0), self.tileWidth, self.tileHeight, np.uint8),
+                    TILE_FORMAT_NUMPY, x, y, z, applyStyle=False, **kwargs,
                 )
 
             xres = (xmax - xmin) / self.tileWidth
@@ -22,7 +22,7 @@ import re
 import numpy as np
 from PIL import Image, ImageDraw, ImageFont
 
-from large_image.cache_util import LruCacheMetaclass, methodcache, strhash
+from large_image.cache_util import LruCacheMetaclass, decodedtilecache, methodcache, strhash
 from large_image.constants import TILE_FORMAT_NUMPY, TILE_FORMAT_PIL, SourcePriority
 from large_image.exceptions import TileSourceError
 from large_image.tilesource import TileSource
@@ -276,6 +276,7 @@ class TestTileSource(TileSource, metaclass=LruCacheMetaclass):
         return image
 
     @methodcache()
+    @decodedtilecache
     def getTile(self, x, y, z, *args, **kwargs):
         frame = self._getFrame(**kwargs)
         self._xyzInRange(x, y, z, frame, len(self._frames) if hasattr(self, '_frames') else None)
@@ -15,11 +15,13 @@
 ##############################################################################
 
 import base64
+import concurrent.futures
 import io
 import itertools
 import json
 import math
 import os
+import threading
 
 import cachetools
 import numpy as np
@@ -27,14 +29,16 @@ import PIL.Image
 import tifftools
 
 from large_image import config
-from large_image.cache_util import LruCacheMetaclass, methodcache
+from large_image.cache_util import LruCacheMetaclass, decodedtilecache, methodcache
 from large_image.constants import TILE_FORMAT_NUMPY, TILE_FORMAT_PIL, SourcePriority
 from large_image.exceptions import TileSourceError, TileSourceFileNotFoundError
 from large_image.tilesource import FileTileSource, nearPowerOfTwo
+from large_image.tilesource.utilities import UniformTile
 
 from . import tiff_reader
-from .exceptions import (InvalidOperationTiffError, IOOpenTiffError,
-                         IOTiffError, TiffError, ValidationTiffError)
+from .exceptions import (EmptyTileTiffError, InvalidOperationTiffError,
+                         IOOpenTiffError, IOTiffError, TiffError,
+                         ValidationTiffError)
 
 try:
     from importlib.metadata import PackageNotFoundError
@@ -50,10 +54,58 @@ except PackageNotFoundError:
 
 
 @cachetools.cached(cache=cachetools.LRUCache(maxsize=10))
-def _cached_read_tiff(path):
+def _cached_read_tiff(path, signature=None):
+    # The signature is part of the cache key, so changed files are read again
     return tifftools.read_tiff(path)
 
 
+# Guards the per-source caches of directory readers
+_directoryCacheLock = threading.Lock()
+# The version of the directory index; change this if _indexTiffInfo changes
+_tiffIndexVersion = 1
+# Tags used to determine the levels, frames, and associated images of a file
+_indexedTags = {
+    tifftools.Tag.ImageWidth.value,
+    tifftools.Tag.ImageLength.value,
+    tifftools.Tag.TileWidth.value,
+    tifftools.Tag.TileLength.value,
+    tifftools.Tag.SamplesPerPixel.value,
+    tifftools.Tag.BitsPerSample.value,
+    tifftools.Tag.PlanarConfig.value,
+    tifftools.Tag.Photometric.value,
+    tifftools.Tag.Orientation.value,
+    tifftools.Tag.Compression.value,
+    tifftools.Tag.ICCProfile.value,
+}
+
+
+def _indexTiffInfo(info):
+    """
+    Reduce the directory information read by tifftools to the tags that are
+    used to open a file.  Tile offsets and other large tags are omitted, so
+    the index of a file with many directories is compact.
+
+    :param info: the information returned by tifftools.read_tiff.
+    :returns: a dictionary with a list of 'ifds' in the same form as
+        tifftools, each of which has only 'tags'.
+    """
+    def indexIfd(ifd):
+        tags = {}
+        for tag, entry in ifd['tags'].items():
+            if tag == tifftools.Tag.SubIfd.value and 'ifds' in entry:
+                tags[tag] = {'ifds': [
+                    [indexIfd(subifd) for subifd in subifds] for subifds in entry['ifds']]}
+            elif tag in _indexedTags:
+                tags[tag] = {'data': entry['data']}
+            elif (tag == tifftools.Tag.ImageDescription.value and
+                    isinstance(entry['data'], str) and entry['data'].lstrip().startswith('{')):
+                # Only JSON descriptions are used for frame metadata
+                tags[tag] = {'data': entry['data']}
+        return {'tags': tags}
+
+    return {'ifds': [indexIfd(ifd) for ifd in info['ifds']]}
+
+
 class TiffFileTileSource(FileTileSource, metaclass=LruCacheMetaclass):
     """
     Provides tile access to TIFF files.
@@ -182,7 +234,8 @@ class TiffFileTileSource(FileTileSource, metaclass=LruCacheMetaclass):
         self._checkForInefficientDirectories()
         self._checkForVendorSpecificTags()
 
-    def getTiffDir(self, directoryNum, mustBeTiled=True, subDirectoryNum=0, validate=True):
+    def getTiffDir(self, directoryNum, mustBeTiled=True, subDirectoryNum=0, validate=True,
+                   descriptionRecord=None):
         """
         Get a tile tiff directory reader class.
 
@@ -192,6 +245,8 @@ class TiffFileTileSource(FileTileSource, metaclass=LruCacheMetaclass):
             only non-tiled images validate.  None validates both.
         :param subDirectoryNum: if set, the number of the TIFF subdirectory.
         :param validate: if False, don't validate that images can be read.
+        :param descriptionRecord: if set, the parsed image description of the
+            directory from a previous read, so it isn't parsed again.
         :returns: a class that can read from a specific tiff directory.
         """
         return tiff_reader.TiledTiffDirectory(
@@ -199,7 +254,8 @@ class TiffFileTileSource(FileTileSource, metaclass=LruCacheMetaclass):
             directoryNum=directoryNum,
             mustBeTiled=mustBeTiled,
             subDirectoryNum=subDirectoryNum,
-            validate=validate)
+            validate=validate,
+            descriptionRecord=descriptionRecord)
 
     def _scanDirectories(self):
         lastException = None
@@ -325,7 +381,8 @@ class TiffFileTileSource(FileTileSource, metaclass=LruCacheMetaclass):
             bitspersample,
         ))
         self._bandCount = dir0._tiffInfo.get('samplesperpixel')
-        info = _cached_read_tiff(self._largeImagePath)
+        info = self._persistentIndex('tiff', _tiffIndexVersion, lambda: _indexTiffInfo(
+            _cached_read_tiff(self._largeImagePath, self._fileSignature())))
         self._info = info
         frames = []
         associated = []  # for now, a list of directories
@@ -631,6 +688,7 @@ class TiffFileTileSource(FileTileSource, metaclass=LruCacheMetaclass):
         return results
 
     @methodcache()
+    @decodedtilecache
     def getTile(self, x, y, z, pilImageAllowed=False, numpyAllowed=False,
                 sparseFallback=False, **kwargs):
         frame = self._getFrame(**kwargs)
@@ -657,6 +715,11 @@ class TiffFileTileSource(FileTileSource, metaclass=LruCacheMetaclass):
                         raise
                 allowStyle = False
                 format = TILE_FORMAT_PIL
+            elif numpyAllowed == 'always':
+                # Decode on this thread rather than in _outputTile, so tiles
+                # requested via getTiles are decoded in parallel
+                tile = dir.getTileArray(x, y)
+                format = TILE_FORMAT_NUMPY
             else:
                 tile = dir.getTile(x, y)
                 format = 'JPEG'
@@ -674,47 +737,86 @@ class TiffFileTileSource(FileTileSource, metaclass=LruCacheMetaclass):
                 numpyAllowed=numpyAllowed, sparseFallback=sparseFallback,
                 exception=e, **kwargs)
 
+    def getTiles(self, requests, **kwargs):
+        """
+        Get a list of tiles.  Tiles that aren't cached are read a row at a
+        time, so that tiles that share data, such as the strips of untiled
+        images, are read together.  When numpy arrays are requested, these
+        tiles are read and decoded by a pool of threads.  See the base class
+        for parameters.
+        """
+        requests = self._tileRequestList(requests, kwargs)
+        results = self._cachedTiles(requests)
+        uncached = sorted(
+            (idx for idx in range(len(requests)) if idx not in results),
+            key=lambda idx: (requests[idx][2], requests[idx][1], requests[idx][0]))
+        workers = min(len(uncached), config.getConfig('tile_decode_workers') or os.cpu_count() or 1)
+        if workers < 2 or not any(
+                requests[idx][3].get('numpyAllowed') == 'always' for idx in uncached):
+            for idx in uncached:
+                x, y, z, params = requests[idx]
+                results[idx] = self.getTile(x, y, z, **params)
+        else:
+            with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as pool:
+                futures = {idx: pool.submit(self.getTile, *requests[idx][:3], **requests[idx][3])
+                           for idx in uncached}
+                for idx, future in futures.items():
+                    results[idx] = future.result()
+        return [results[idx] for idx in range(len(requests))]
+
     def _getDirFromCache(self, dirnum, subdir=None):
-        if not hasattr(self, '_directoryCache') or not hasattr(self, '_directoryCacheMaxSize'):
-            self._directoryCache = {}
-            self._directoryCacheMaxSize = max(20, self.levels * (2 + (
-                self.metadata.get('IndexRange', {}).get('IndexC', 1))))
-        key = (dirnum, subdir)
-        result = self._directoryCache.get(key)
-        if result is None:
-            if len(self._directoryCache) >= self._directoryCacheMaxSize:
-                self._directoryCache = {}
-            try:
-                result = self.getTiffDir(dirnum, mustBeTiled=None, subDirectoryNum=subdir)
-            except IOTiffError:
-                result = None
+        """
+        Get a directory reader for a frame from a least recently used cache of
+        readers.  Readers whose file handles are idle have them closed by the
+        shared handle pool, but keep their metadata, so reusing them doesn't
+        validate the directory again.
+
+        :param dirnum: the number of the TIFF directory.
+        :param subdir: the number of the TIFF subdirectory or None.
+        :returns: a directory reader or None if the directory can't be read.
+        """
+        with _directoryCacheLock:
+            if getattr(self, '_directoryCache', None) is None:
+                self._directoryCache = cachetools.LRUCache(max(20, self.levels * (2 + (
+                    self.metadata.get('IndexRange', {}).get('IndexC', 1)))))
+            key = (dirnum, subdir)
+            if key in self._directoryCache:
+                return self._directoryCache[key]
+        try:
+            result = self.getTiffDir(dirnum, mustBeTiled=None, subDirectoryNum=subdir)
+        except IOTiffError:
+            result = None
+        with _directoryCacheLock:
             self._directoryCache[key] = result
         return result
 
     def getTileIOTiffError(self, x, y, z, pilImageAllowed=False,
                            numpyAllowed=False, sparseFallback=False,
                            exception=None, **kwargs):
-        if sparseFallback:
-            if z:
-                noedge = kwargs.copy()
-                noedge.pop('edge', None)
-                noedge['inSparseFallback'] = True
-                image = self.getTile(
-                    x // 2, y // 2, z - 1, pilImageAllowed=True, numpyAllowed=False,
-                    sparseFallback=sparseFallback, edge=False,
-                    **noedge)
-                if not isinstance(image, PIL.Image.Image):
-                    image = PIL.Image.open(io.BytesIO(image))
-                image = image.crop((
-                    self.tileWidth / 2 if x % 2 else 0,
-                    self.tileHeight / 2 if y % 2 else 0,
-                    self.tileWidth if x % 2 else self.tileWidth / 2,
-                    self.tileHeight if y % 2 else self.tileHeight / 2))
-                image = image.resize((self.tileWidth, self.tileHeight))
-            else:
-                image = PIL.Image.new('RGBA', (self.tileWidth, self.tileHeight))
+        if sparseFallback and z:
+            noedge = kwargs.copy()
+            noedge.pop('edge', None)
+            noedge['inSparseFallback'] = True
+            image = self.getTile(
+                x // 2, y // 2, z - 1, pilImageAllowed=True, numpyAllowed=False,
+                sparseFallback=sparseFallback, edge=False,
+                **noedge)
+            if not isinstance(image, PIL.Image.Image):
+                image = PIL.Image.open(io.BytesIO(image))
+            image = image.crop((
+                self.tileWidth / 2 if x % 2 else 0,
+                self.tileHeight / 2 if y % 2 else 0,
+                self.tileWidth if x % 2 else self.tileWidth / 2,
+                self.tileHeight if y % 2 else self.tileHeight / 2))
+            image = image.resize((self.tileWidth, self.tileHeight))
             return self._outputTile(image, TILE_FORMAT_PIL, x, y, z, pilImageAllowed,
                                     numpyAllowed, applyStyle=False, **kwargs)
+        # Tiles of sparse files that have no data are transparent
+        if sparseFallback or isinstance(exception, EmptyTileTiffError):
+            return self._outputTile(
+                UniformTile((0, 0, 0, 0), self.tileWidth, self.tileHeight, np.uint8),
+                TILE_FORMAT_NUMPY, x, y, z, pilImageAllowed, numpyAllowed,
+                applyStyle=False, **kwargs)
         raise TileSourceError('Internal I/O failure: %s' % exception.args[0])
 
     def getTileFromEmptyDirectory(self, x, y, z, **kwargs):
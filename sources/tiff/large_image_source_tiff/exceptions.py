@@ -15,6 +15,13 @@ class IOTiffError(TiffError):
     """
 
 
+class EmptyTileTiffError(IOTiffError):
+    """
+    An exception caused by reading a tile that has no data in the file, such
+    as a tile of a sparse image.
+    """
+
+
 class IOOpenTiffError(IOTiffError):
     """
     An exception caused by an internal failure where the file cannot be opened
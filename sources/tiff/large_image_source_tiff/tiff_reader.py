@@ -27,11 +27,18 @@ import cachetools
 import numpy as np
 import PIL.Image
 
+try:
+    import simplejpeg
+except ImportError:
+    simplejpeg = None
+
 from large_image import config
-from large_image.cache_util import methodcache, strhash
+from large_image.cache_util import getDecodedStripCache, getHandlePool, methodcache, strhash
+from large_image.cache_util.metrics import recordCacheEvent
 from large_image.tilesource import etreeToDict
 
-from .exceptions import InvalidOperationTiffError, IOOpenTiffError, IOTiffError, ValidationTiffError
+from .exceptions import (EmptyTileTiffError, InvalidOperationTiffError,
+                         IOOpenTiffError, IOTiffError, ValidationTiffError)
 
 try:
     from libtiff import libtiff_ctypes
@@ -78,7 +85,8 @@ class TiledTiffDirectory:
         'IsMSB2LSB', 'NumberOfStrips',
     ]
 
-    def __init__(self, filePath, directoryNum, mustBeTiled=True, subDirectoryNum=0, validate=True):
+    def __init__(self, filePath, directoryNum, mustBeTiled=True, subDirectoryNum=0, validate=True,
+                 descriptionRecord=None):
         """
         Create a new reader for a tiled image file directory in a TIFF file.
 
@@ -94,6 +102,10 @@ class TiledTiffDirectory:
         :type subDirectoryNum: int
         :param validate: if False, don't validate that images can be read.
         :type mustBeTiled: bool
+        :param descriptionRecord: if set, the parsed image description of
+            this directory from a previous read, such as from a source index.
+            The image description is not parsed again.
+        :type descriptionRecord: dict
         :raises: InvalidOperationTiffError or IOTiffError or
             ValidationTiffError
         """
@@ -104,6 +116,8 @@ class TiledTiffDirectory:
 
         self._tiffFile = None
         self._tileLock = threading.RLock()
+        self._filePath = filePath
+        self._knownDescriptionRecord = descriptionRecord
 
         self._open(filePath, directoryNum, subDirectoryNum)
         self._loadMetadata()
@@ -132,7 +146,7 @@ class TiledTiffDirectory:
         :type subDirectoryNum: int
         :raises: InvalidOperationTiffError or IOTiffError
         """
-        self._close()
+        self._closeHandle()
         if not os.path.isfile(filePath):
             raise InvalidOperationTiffError(
                 'TIFF file does not exist: %s' % filePath)
@@ -174,10 +188,30 @@ class TiledTiffDirectory:
                     'Could not set TIFF subdirectory to %d' % subDirectoryNum)
 
     def _close(self):
-        if self._tiffFile:
+        if getattr(self, '_tiffFile', None):
+            getHandlePool().discard(self)
+        self._closeHandle()
+
+    def _closeHandle(self):
+        """
+        Close the TIFF file, keeping the directory's metadata.  This is called
+        by the handle pool when the handle is idle.
+        """
+        if getattr(self, '_tiffFile', None):
             self._tiffFile.close()
             self._tiffFile = None
 
+    def _reopenHandle(self):
+        """
+        Reopen the TIFF file if the handle pool closed it.  The directory's
+        metadata was kept, so it isn't read or validated again.
+        """
+        with self._tileLock:
+            if self._tiffFile is None:
+                self._open(self._filePath, self._directoryNum, self._subDirectoryNum)
+                if getattr(self, '_fileno', None) is not None:
+                    self._fileno = libtiff_ctypes.libtiff.TIFFFileno(self._tiffFile)
+
     def _validate(self):  # noqa
         """
         Validate that this TIFF file and directory are suitable for reading.
@@ -291,6 +325,7 @@ class TiledTiffDirectory:
             self._stripHeight = self._tileHeight
             self._tileHeight = self._stripHeight * self._stripsPerTile
             self._stripCount = int(math.ceil(float(self._imageHeight) / self._stripHeight))
+            self._stripCacheKey = self._getStripCacheKey()
         if info.get('orientation') in {
                 libtiff_ctypes.ORIENTATION_LEFTTOP,
                 libtiff_ctypes.ORIENTATION_RIGHTTOP,
@@ -298,7 +333,7 @@ class TiledTiffDirectory:
                 libtiff_ctypes.ORIENTATION_LEFTBOT}:
             self._imageWidth, self._imageHeight = self._imageHeight, self._imageWidth
             self._tileWidth, self._tileHeight = self._tileHeight, self._tileWidth
-        self.parse_image_description(info.get('imagedescription', ''))
+        self._loadImageDescription(info.get('imagedescription', ''))
         # From TIFF specification, tag 0x128, 2 is inches, 3 is centimeters.
         units = {2: 25.4, 3: 10}
         # If the resolution value is less than a threshold (100), don't use it,
@@ -317,6 +352,34 @@ class TiledTiffDirectory:
         if not self._pixelInfo.get('height') and self._imageHeight:
             self._pixelInfo['height'] = self._imageHeight
 
+    def _loadImageDescription(self, meta):
+        """
+        Parse the image description of this directory, unless its parsed
+        record was supplied when the directory was opened.
+
+        :param meta: the image description.
+        """
+        if self._knownDescriptionRecord is None:
+            self.parse_image_description(meta)
+            return
+        self._pixelInfo = {}
+        self._embeddedImages = {}
+        self._description_record = self._knownDescriptionRecord
+
+    def _getStripCacheKey(self):
+        """
+        Get the key that identifies the decoded strips of this directory in
+        the decoded strip cache.  The file's modification time and size keep
+        strips of a file that was replaced from being used.
+
+        :return: the key.
+        :rtype: str
+        """
+        stat = os.stat(self._filePath)
+        return strhash(
+            self._filePath, stat.st_mtime_ns, stat.st_size,
+            self._directoryNum, self._subDirectoryNum)
+
     @methodcache(key=partial(strhash, '_getJpegTables'))
     def _getJpegTables(self):
         """
@@ -434,6 +497,96 @@ class TiledTiffDirectory:
             raise IOTiffError(
                 'Invalid type for TIFFTAG_TILEBYTECOUNTS: %s' % tileByteCountsLibtiffType)
 
+    def _getTileLocations(self):
+        """
+        Get the file offsets and byte counts of all tiles.  These are read
+        from libtiff once, so that raw tiles can then be read from the file
+        without using the libtiff handle.
+
+        :return: a tuple of numpy arrays of the offset and the size in bytes
+            of each tile, or None if the locations can't be determined.
+        """
+        if not hasattr(self, '_tileLocations'):
+            with self._tileLock:
+                self._tileLocations = self._readTileLocations()
+        return self._tileLocations
+
+    def _readTileLocations(self):
+        """
+        Read the file offsets and byte counts of all tiles with libtiff.
+
+        :return: a tuple of numpy arrays of the offset and the size in bytes
+            of each tile, or None if the locations can't be determined.
+        """
+        # libtiff 4 reports both arrays as 64-bit values regardless of how
+        # they are stored in the file
+        if not self._tiffInfo.get('istiled') or not hasattr(os, 'pread'):
+            return None
+        try:
+            if self._getTileByteCountsType() is not ctypes.c_uint64:
+                return None
+        except IOTiffError:
+            return None
+        count = libtiff_ctypes.libtiff.TIFFNumberOfTiles(self._tiffFile).value
+        if libtiff_ctypes.libtiff.TIFFGetField.argtypes:
+            libtiff_ctypes.libtiff.TIFFGetField.argtypes = \
+                libtiff_ctypes.libtiff.TIFFGetField.argtypes[:2] + \
+                [ctypes.POINTER(ctypes.POINTER(ctypes.c_uint64))]
+        locations = []
+        for tag in (libtiff_ctypes.TIFFTAG_TILEOFFSETS, libtiff_ctypes.TIFFTAG_TILEBYTECOUNTS):
+            values = ctypes.POINTER(ctypes.c_uint64)()
+            if libtiff_ctypes.libtiff.TIFFGetField(
+                    self._tiffFile, tag, ctypes.byref(values)) != 1 or not values:
+                return None
+            # Copy the values, since libtiff owns the memory
+            locations.append(np.ctypeslib.as_array(values, (count, )).copy())
+        self._fileno = libtiff_ctypes.libtiff.TIFFFileno(self._tiffFile)
+        return tuple(locations)
+
+    def _readRawTile(self, tileNum, rawTileSize):
+        """
+        Read the raw encoded data of a tile.  When the tile locations are
+        known, this is a positional read of libtiff's file descriptor, which
+        doesn't need a lock and doesn't affect libtiff's own reads.
+        Otherwise, the tile is read with libtiff.
+
+        :param tileNum: The internal tile number of the desired tile.
+        :type tileNum: int
+        :param rawTileSize: the size of the tile's data in bytes.
+        :type rawTileSize: int
+        :return: the raw tile data.
+        :rtype: bytearray
+        :raises: IOTiffError
+        """
+        locations = self._getTileLocations()
+        if locations is not None:
+            try:
+                data = os.pread(self._fileno, rawTileSize, int(locations[0][tileNum]))
+            except OSError:
+                msg = 'Failed to read raw tile'
+                raise IOTiffError(msg)
+            if len(data) < rawTileSize:
+                msg = 'Buffer underflow when reading tile'
+                raise IOTiffError(msg)
+            return bytearray(data)
+        frameBuffer = ctypes.create_string_buffer(rawTileSize)
+
+        bytesRead = libtiff_ctypes.libtiff.TIFFReadRawTile(
+            self._tiffFile, tileNum,
+            frameBuffer, rawTileSize).value
+        if bytesRead == -1:
+            msg = 'Failed to read raw tile'
+            raise IOTiffError(msg)
+        elif bytesRead < rawTileSize:
+            msg = 'Buffer underflow when reading tile'
+            raise IOTiffError(msg)
+        elif bytesRead > rawTileSize:
+            # It's unlikely that this will ever occur, but incomplete reads will
+            # be checked for by looking for the JPEG end marker
+            msg = 'Buffer overflow when reading tile'
+            raise IOTiffError(msg)
+        return bytearray(frameBuffer.raw)
+
     def _getJpegFrameSize(self, tileNum):
         """
         Get the file size in bytes of the raw encoded JPEG frame for a tile.
@@ -444,9 +597,13 @@ class TiledTiffDirectory:
         :rtype: int
         :raises: InvalidOperationTiffError or IOTiffError
         """
-        # TODO: is it worth it to memoize this?
+        locations = self._getTileLocations()
+        if locations is not None:
+            if tileNum >= len(locations[1]):
+                msg = 'Tile number out of range'
+                raise InvalidOperationTiffError(msg)
+            return int(locations[1][tileNum])
 
-        # TODO: remove this check, for additional speed
         totalTileCount = libtiff_ctypes.libtiff.TIFFNumberOfTiles(
             self._tiffFile).value
         if tileNum >= totalTileCount:
@@ -499,43 +656,28 @@ class TiledTiffDirectory:
         rawTileSize = self._getJpegFrameSize(tileNum)
         if rawTileSize <= 0:
             msg = 'No raw tile data'
-            raise IOTiffError(msg)
+            raise EmptyTileTiffError(msg)
 
-        frameBuffer = ctypes.create_string_buffer(rawTileSize)
-
-        bytesRead = libtiff_ctypes.libtiff.TIFFReadRawTile(
-            self._tiffFile, tileNum,
-            frameBuffer, rawTileSize).value
-        if bytesRead == -1:
-            msg = 'Failed to read raw tile'
-            raise IOTiffError(msg)
-        elif bytesRead < rawTileSize:
-            msg = 'Buffer underflow when reading tile'
-            raise IOTiffError(msg)
-        elif bytesRead > rawTileSize:
-            # It's unlikely that this will ever occur, but incomplete reads will
-            # be checked for by looking for the JPEG end marker
-            msg = 'Buffer overflow when reading tile'
-            raise IOTiffError(msg)
+        frame = self._readRawTile(tileNum, rawTileSize)
         if entire:
-            return frameBuffer.raw[:]
+            return bytes(frame)
 
-        if frameBuffer.raw[:2] != b'\xff\xd8':
+        if frame[:2] != b'\xff\xd8':
             msg = 'Missing JPEG Start Of Image marker in frame'
             raise IOTiffError(msg)
-        if frameBuffer.raw[-2:] != b'\xff\xd9':
+        if frame[-2:] != b'\xff\xd9':
             msg = 'Missing JPEG End Of Image marker in frame'
             raise IOTiffError(msg)
-        if frameBuffer.raw[2:4] in (b'\xff\xc0', b'\xff\xc2'):
+        if frame[2:4] in (b'\xff\xc0', b'\xff\xc2'):
             frameStartPos = 2
         else:
             # VIPS may encode TIFFs with the quantization (but not Huffman)
             # tables also at the start of every frame, so locate them for
             # removal
             # VIPS seems to prefer Baseline DCT, so search for that first
-            frameStartPos = frameBuffer.raw.find(b'\xff\xc0', 2, -2)
+            frameStartPos = frame.find(b'\xff\xc0', 2, -2)
             if frameStartPos == -1:
-                frameStartPos = frameBuffer.raw.find(b'\xff\xc2', 2, -2)
+                frameStartPos = frame.find(b'\xff\xc2', 2, -2)
                 if frameStartPos == -1:
                     msg = 'Missing JPEG Start Of Frame marker'
                     raise IOTiffError(msg)
@@ -543,19 +685,19 @@ class TiledTiffDirectory:
         # 0, 1, 2, change the component ids to R, G, B to ensure color space
         # information is preserved.
         if self._tiffInfo.get('photometric') == libtiff_ctypes.PHOTOMETRIC_RGB:
-            sof = frameBuffer.raw.find(b'\xff\xc0')
+            sof = frame.find(b'\xff\xc0')
             if sof == -1:
-                sof = frameBuffer.raw.find(b'\xff\xc2')
-            sos = frameBuffer.raw.find(b'\xff\xda')
+                sof = frame.find(b'\xff\xc2')
+            sos = frame.find(b'\xff\xda')
             if (sof >= frameStartPos and sos >= frameStartPos and
-                    frameBuffer[sof + 2:sof + 4] == b'\x00\x11' and
-                    frameBuffer[sof + 10:sof + 19:3] == b'\x00\x01\x02' and
-                    frameBuffer[sos + 5:sos + 11:2] == b'\x00\x01\x02'):
+                    frame[sof + 2:sof + 4] == b'\x00\x11' and
+                    frame[sof + 10:sof + 19:3] == b'\x00\x01\x02' and
+                    frame[sos + 5:sos + 11:2] == b'\x00\x01\x02'):
                 for idx, val in enumerate(b'RGB'):
-                    frameBuffer[sof + 10 + idx * 3] = val
-                    frameBuffer[sos + 5 + idx * 2] = val
+                    frame[sof + 10 + idx * 3] = val
+                    frame[sos + 5 + idx * 2] = val
         # Strip the Start / End Of Image markers
-        tileData = frameBuffer.raw[frameStartPos:-2]
+        tileData = bytes(frame[frameStartPos:-2])
         return tileData
 
     def _getUncompressedTile(self, tileNum):
@@ -569,38 +711,21 @@ class TiledTiffDirectory:
         :rtype: PIL.Image
         :raises: IOTiffError
         """
-        with self._tileLock:
-            if self._tiffInfo.get('istiled'):
+        if not self._tiffInfo.get('istiled'):
+            data = self._getStrips(tileNum)
+            tileSize = data.size
+        else:
+            with self._tileLock:
                 tileSize = libtiff_ctypes.libtiff.TIFFTileSize(self._tiffFile).value
-            else:
-                stripSize = libtiff_ctypes.libtiff.TIFFStripSize(
-                    self._tiffFile).value
-                stripsCount = min(self._stripsPerTile, self._stripCount - tileNum)
-                tileSize = stripSize * self._stripsPerTile
-        imageBuffer = ctypes.create_string_buffer(tileSize)
-        with self._tileLock:
-            if self._tiffInfo.get('istiled'):
+                imageBuffer = ctypes.create_string_buffer(tileSize)
                 readSize = libtiff_ctypes.libtiff.TIFFReadEncodedTile(
                     self._tiffFile, tileNum, imageBuffer, tileSize)
-            else:
-                readSize = 0
-                for stripNum in range(stripsCount):
-                    chunkSize = libtiff_ctypes.libtiff.TIFFReadEncodedStrip(
-                        self._tiffFile,
-                        tileNum + stripNum,
-                        ctypes.byref(imageBuffer, stripSize * stripNum),
-                        stripSize).value
-                    if chunkSize <= 0:
-                        msg = 'Read an unexpected number of bytes from an encoded strip'
-                        raise IOTiffError(msg)
-                    readSize += chunkSize
-                if readSize < tileSize:
-                    ctypes.memset(ctypes.byref(imageBuffer, readSize), 0, tileSize - readSize)
-                    readSize = tileSize
-        if readSize < tileSize:
-            raise IOTiffError(
-                'Read an unexpected number of bytes from an encoded tile' if readSize >= 0 else
-                'Failed to read from an encoded tile')
+            if readSize < tileSize:
+                raise IOTiffError(
+                    'Read an unexpected number of bytes from an encoded tile' if readSize >= 0
+                    else 'Failed to read from an encoded tile')
+            data = np.ctypeslib.as_array(ctypes.cast(
+                imageBuffer, ctypes.POINTER(ctypes.c_uint8)), (tileSize, ))
         tw, th = self._tileWidth, self._tileHeight
         if self._tiffInfo.get('orientation') in {
                 libtiff_ctypes.ORIENTATION_LEFTTOP,
@@ -625,10 +750,8 @@ class TiledTiffDirectory:
             (64, libtiff_ctypes.SAMPLEFORMAT_INT): np.int64,
             (64, libtiff_ctypes.SAMPLEFORMAT_IEEEFP): np.float64,
         }
-        image = np.ctypeslib.as_array(ctypes.cast(
-            imageBuffer, ctypes.POINTER(ctypes.c_uint8)), (tileSize, )).view(
-                formattbl[format]).reshape(
-                    (th, tw, self._tiffInfo.get('samplesperpixel')))
+        image = data.view(formattbl[format]).reshape(
+            (th, tw, self._tiffInfo.get('samplesperpixel')))
         if (self._tiffInfo.get('samplesperpixel') == 3 and
                 self._tiffInfo.get('photometric') == libtiff_ctypes.PHOTOMETRIC_YCBCR):
             if self._tiffInfo.get('bitspersample') == 16:
@@ -637,6 +760,69 @@ class TiledTiffDirectory:
             image = np.array(image.convert('RGB'))
         return image
 
+    def _getStrips(self, tileNum):
+        """
+        Get the undecoded bytes of the strips that make up a tile of an untiled
+        image.  Strips span the width of the image, so the same strips are
+        needed by every tile in a row of a rotated image.  Decoded strips are
+        kept in the decoded strip cache so that each is only decoded once.
+
+        :param tileNum: The internal strip number of the first strip of the
+            tile.
+        :return: a one-dimensional uint8 numpy array with the strips, padded
+            with zeros to the size of a whole tile.
+        :raises: IOTiffError
+        """
+        cache, cacheLock = getDecodedStripCache()
+        stripsCount = min(self._stripsPerTile, self._stripCount - tileNum)
+        strips = []
+        # Holding the tile lock while checking the cache means that concurrent
+        # requests for tiles that share strips wait for one decode
+        with self._tileLock:
+            stripSize = libtiff_ctypes.libtiff.TIFFStripSize(self._tiffFile).value
+            for stripNum in range(tileNum, tileNum + stripsCount):
+                key = (self._stripCacheKey, stripNum)
+                strip = None
+                if cache is not None:
+                    with cacheLock:
+                        strip = cache.get(key)
+                    recordCacheEvent(
+                        'decodedStripCache', self.__class__.__name__,
+                        'hit' if strip is not None else 'miss')
+                if strip is None:
+                    strip = self._readStrip(stripNum, stripSize)
+                    if cache is not None:
+                        with cacheLock:
+                            cache[key] = strip
+                strips.append(strip)
+        tileSize = stripSize * self._stripsPerTile
+        if tileSize > stripSize * stripsCount:
+            strips.append(np.zeros((tileSize - stripSize * stripsCount, ), dtype=np.uint8))
+        # This copies the strips, so the cached arrays are never modified
+        return np.concatenate(strips)
+
+    def _readStrip(self, stripNum, stripSize):
+        """
+        Read and decode a strip.  This must be called with the tile lock held.
+
+        :param stripNum: The internal strip number.
+        :param stripSize: The size in bytes of a whole strip.
+        :return: a one-dimensional, read-only uint8 numpy array with the
+            strip, padded with zeros if the last strip of the image is short.
+        :raises: IOTiffError
+        """
+        # The buffer is zeroed when it is created
+        stripBuffer = ctypes.create_string_buffer(stripSize)
+        chunkSize = libtiff_ctypes.libtiff.TIFFReadEncodedStrip(
+            self._tiffFile, stripNum, stripBuffer, stripSize).value
+        if chunkSize <= 0:
+            msg = 'Read an unexpected number of bytes from an encoded strip'
+            raise IOTiffError(msg)
+        strip = np.ctypeslib.as_array(ctypes.cast(
+            stripBuffer, ctypes.POINTER(ctypes.c_uint8)), (stripSize, ))
+        strip.flags.writeable = False
+        return strip
+
     def _getTileRotated(self, x, y):
         """
         Get a tile from a rotated TIF.  This composites uncompressed tiles as
@@ -754,7 +940,7 @@ class TiledTiffDirectory:
     def pixelInfo(self):
         return self._pixelInfo
 
-    def getTile(self, x, y):
+    def getTile(self, x, y, _decodeFrame=None):
         """
         Get the complete JPEG image from a tile.
 
@@ -762,10 +948,19 @@ class TiledTiffDirectory:
         :type x: int
         :param y: The row index of the desired tile.
         :type y: int
+        :param _decodeFrame: for internal use, a function that decodes the
+            whole frame of a JPEG 2000 or complete JPEG tile.
         :return: either a buffer with a JPEG or a PIL image.
         :rtype: bytes
         :raises: InvalidOperationTiffError or IOTiffError
         """
+        with getHandlePool().use(self):
+            return self._getTile(x, y, _decodeFrame)
+
+    def _getTile(self, x, y, _decodeFrame=None):
+        """
+        Get a tile while the file handle is in use.  See getTile.
+        """
         if self._tiffInfo.get('orientation') not in {
                 libtiff_ctypes.ORIENTATION_TOPLEFT,
                 None}:
@@ -781,30 +976,46 @@ class TiledTiffDirectory:
                     None, libtiff_ctypes.SAMPLEFORMAT_UINT}):
             return self._getUncompressedTile(tileNum)
 
-        imageBuffer = io.BytesIO()
-
         if (self._tiffInfo.get('compression') == libtiff_ctypes.COMPRESSION_JPEG and
                 not getattr(self, '_completeJpeg', False)):
-            # Write JPEG Start Of Image marker
-            imageBuffer.write(b'\xff\xd8')
-            imageBuffer.write(self._getJpegTables())
-            imageBuffer.write(self._getJpegFrame(tileNum))
-            # Write JPEG End Of Image marker
-            imageBuffer.write(b'\xff\xd9')
-            return imageBuffer.getvalue()
-        # Get the whole frame, which is in a JPEG or JPEG 2000 format, and
-        # convert it to a PIL image
-        imageBuffer.write(self._getJpegFrame(tileNum, True))
-        image = PIL.Image.open(imageBuffer)
-        # Converting the image mode ensures that it gets loaded once and is in
-        # a form we expect.  If this isn't done, then PIL can load the image
-        # multiple times, which sometimes throws an exception in PIL's JPEG
-        # 2000 module.
-        if image.mode != 'L':
-            image = image.convert('RGB')
-        else:
-            image.load()
-        return image
+            # Add the JPEG Start Of Image marker, tables, and End Of Image
+            # marker to the frame
+            return b'\xff\xd8' + self._getJpegTables() + self._getJpegFrame(tileNum) + b'\xff\xd9'
+        return (_decodeFrame or _decodeFrameImage)(self._getJpegFrame(tileNum, True))
+
+    def getTileArray(self, x, y, out=None):
+        """
+        Get a tile decoded to a numpy array.  JPEG tiles are decoded with
+        simplejpeg when it is available, which doesn't hold the GIL, so tiles
+        can be decoded on several threads at once.
+
+        :param x: The column index of the desired tile.
+        :type x: int
+        :param y: The row index of the desired tile.
+        :type y: int
+        :param out: None or a numpy array with the height and width of a tile
+            to decode the tile into.  This can be a slice of a larger array.
+            If it is a contiguous uint8 array with the tile's number of bands,
+            JPEG tiles are decoded directly into it.
+        :return: a numpy array with three dimensions.  This is out if it was
+            specified.
+        :raises: InvalidOperationTiffError or IOTiffError
+        """
+        tile = self.getTile(x, y, _decodeFrame=partial(_decodeFrameArray, out=out))
+        if isinstance(tile, bytes):
+            tile = _decodeJpeg(tile, out)
+        if out is not None and tile is out:
+            return out
+        tile = np.asarray(tile)
+        if len(tile.shape) == 2:
+            tile = tile[:, :, np.newaxis]
+        if out is None:
+            return tile
+        if out.shape[:2] != tile.shape[:2]:
+            msg = 'The out array must have a shape of (%d, %d, bands).' % tile.shape[:2]
+            raise ValueError(msg)
+        out[:] = tile
+        return out
 
     def parse_image_description(self, meta=None):  # noqa
         self._pixelInfo = {}
@@ -869,3 +1080,70 @@ class TiledTiffDirectory:
         except Exception:
             pass
         return True
+
+
+def _decodeFrameImage(data):
+    """
+    Decode the whole frame of a tile to a PIL image.
+
+    :param data: a JPEG or JPEG 2000 image.
+    :returns: a loaded PIL image in either L or RGB mode.
+    """
+    image = PIL.Image.open(io.BytesIO(data))
+    # Converting the image mode ensures that it gets loaded once and is in a
+    # form we expect.  If this isn't done, then PIL can load the image
+    # multiple times, which sometimes throws an exception in PIL's JPEG 2000
+    # module.
+    if image.mode != 'L':
+        return image.convert('RGB')
+    image.load()
+    return image
+
+
+def _decodeFrameArray(data, out=None):
+    """
+    Decode the whole frame of a tile without first converting it to another
+    PIL image.
+
+    :param data: a JPEG or JPEG 2000 image.
+    :param out: None or a numpy array.  See _decodeJpeg.
+    :returns: out if the image was decoded into it, otherwise a numpy array
+        or a PIL image.
+    """
+    if data[:2] == b'\xff\xd8':
+        return _decodeJpeg(data, out)
+    image = PIL.Image.open(io.BytesIO(data))
+    if image.mode not in {'L', 'RGB'}:
+        image = image.convert('RGB')
+    return np.asarray(image)
+
+
+def _decodeJpeg(data, out=None):
+    """
+    Decode a JPEG image.
+
+    :param data: the JPEG image.
+    :param out: None or a numpy array.  If this is a contiguous uint8 array
+        with the shape of the decoded image, the image is decoded into it.
+    :returns: out if the image was decoded into it, otherwise a numpy array
+        or a PIL image.
+    """
+    if simplejpeg is not None:
+        try:
+            height, width, colorspace, _ = simplejpeg.decode_jpeg_header(data)
+            if colorspace in {'Gray', 'YCbCr', 'RGB'}:
+                colorspace = 'GRAY' if colorspace == 'Gray' else 'RGB'
+                shape = (height, width, 1 if colorspace == 'GRAY' else 3)
+                if (out is not None and out.shape == shape and
+                        out.dtype == np.uint8 and out.flags.c_contiguous):
+                    simplejpeg.decode_jpeg(data, colorspace, buffer=out)
+                    return out
+                return simplejpeg.decode_jpeg(data, colorspace)
+        except ValueError:
+            # Let PIL decode images that libjpeg-turbo considers damaged, so
+            # that they are handled the same as other tiles
+            pass
+    image = PIL.Image.open(io.BytesIO(data))
+    if image.mode not in {'L', 'RGB'}:
+        image = image.convert('RGB')
+    return image
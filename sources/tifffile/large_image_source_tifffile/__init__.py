@@ -8,7 +8,7 @@ import numpy as np
 import zarr
 
 import large_image
-from large_image.cache_util import LruCacheMetaclass, methodcache
+from large_image.cache_util import LruCacheMetaclass, decodedtilecache, methodcache
 from large_image.constants import TILE_FORMAT_NUMPY, SourcePriority
 from large_image.exceptions import TileSourceError, TileSourceFileNotFoundError
 from large_image.tilesource import FileTileSource
@@ -448,10 +448,26 @@ class TifffileFileTileSource(FileTileSource, metaclass=LruCacheMetaclass):
             return large_image.tilesource.base._imageToPIL(image)
 
     @methodcache()
+    @decodedtilecache
     def getTile(self, x, y, z, pilImageAllowed=False, numpyAllowed=False, **kwargs):
         frame = self._getFrame(**kwargs)
         self._xyzInRange(x, y, z, frame, self._framecount)
+        tile = self._tileFromRun(x, y, z, frame)
+        return self._outputTile(tile, TILE_FORMAT_NUMPY, x, y, z,
+                                pilImageAllowed, numpyAllowed, **kwargs)
+
+    def getTiles(self, requests, **kwargs):
+        """
+        Get a list of tiles.  Horizontally adjacent tiles are read from the
+        file with a single array selection.  See the base class for
+        parameters.
+        """
+        return self._getTilesInRuns(requests, kwargs)
+
+    def _readTileRun(self, x, y, z, count, frame):
         x0, y0, x1, y1, step = self._xyzToCorners(x, y, z)
+        if count > 1:
+            x1 = self._xyzToCorners(x + count - 1, y, z)[2]
         if len(self._series) > 1:
             sidx = frame // self._basis['P'][0]
         else:
@@ -502,8 +518,12 @@ class TifffileFileTileSource(FileTileSource, metaclass=LruCacheMetaclass):
         if baxis not in {'YXS', 'YX'}:
             tile = np.moveaxis(
                 tile, [baxis.index(a) for a in 'YXS' if a in baxis], range(len(baxis)))
-        return self._outputTile(tile, TILE_FORMAT_NUMPY, x, y, z,
-                                pilImageAllowed, numpyAllowed, **kwargs)
+        if count == 1:
+            return [tile]
+        # Each tile in the run is tileWidth columns of the selection.  Copy
+        # them so that cached tiles don't reference the whole run.
+        return [tile[:, idx * self.tileWidth:(idx + 1) * self.tileWidth].copy()
+                for idx in range(count)]
 
 
 def open(*args, **kwargs):
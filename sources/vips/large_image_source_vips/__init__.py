@@ -10,7 +10,8 @@ import numpy as np
 import pyvips
 
 from large_image import config
-from large_image.cache_util import LruCacheMetaclass, _cacheClearFuncs, methodcache
+from large_image.cache_util import (LruCacheMetaclass, _cacheClearFuncs,
+                                    decodedtilecache, methodcache)
 from large_image.constants import (NEW_IMAGE_PATH_FLAG, TILE_FORMAT_NUMPY,
                                    GValueToDtype, SourcePriority,
                                    dtypeToGValue)
@@ -203,6 +204,7 @@ class VipsFileTileSource(FileTileSource, metaclass=LruCacheMetaclass):
         }
 
     @methodcache()
+    @decodedtilecache
     def getTile(self, x, y, z, pilImageAllowed=False, numpyAllowed=False, **kwargs):
         frame = self._getFrame(**kwargs)
         self._xyzInRange(x, y, z, frame, len(self._frames))
@@ -1,15 +1,24 @@
 import concurrent.futures
+import functools
 import threading
 import time
 
 import cachetools
+import numpy as np
 import pytest
 
 import large_image.cache_util.cache
 from large_image import config
-from large_image.cache_util import (LruCacheMetaclass, MemCache, cachesClear,
-                                    cachesInfo, getTileCache, methodcache,
+from large_image.cache_util import (DiskCache, HandlePool, LruCacheMetaclass,
+                                    MemCache, SharedMemoryCache, SourceCache,
+                                    TieredCache, TinyLFUCache, cachesClear,
+                                    cachesInfo, clearCacheMetrics,
+                                    getCacheMetrics, getTileCache, methodcache,
                                     strhash)
+from large_image.cache_util.base import CompressedArray, LRUCache, compressValue, decompressValue
+from large_image.cache_util.cachefactory import _availableCaches
+from large_image.cache_util.sourcecache import sourceFootprint
+from large_image.exceptions import TileSourceAssetstoreError, TileSourceXYZRangeError
 
 
 class Fib:
@@ -34,6 +43,187 @@ def testLRUCacheTools():
     cache_test(cachetools.Cache(1000))
 
 
+def testLRUCacheEvictions():
+    cache = LRUCache(10)
+    for idx in range(100):
+        cache[idx] = idx
+    assert cache.evictions == 90
+    cache.clear()
+    assert cache.evictions == 90
+
+
+class FakeSource:
+    def __init__(self, size):
+        self.data = {'image': np.zeros(size, dtype=np.uint8)}
+
+
+def testSourceFootprint():
+    source = FakeSource(100000)
+    assert 100000 < sourceFootprint(source) < 110000
+    other = FakeSource(0)
+    other.data = source.data
+    seen = set()
+    sourceFootprint(source, seen)
+    assert sourceFootprint(other, seen) < 1000
+
+
+def testSourceCacheTimeout(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(time, 'monotonic', lambda: now[0])
+    cache = SourceCache(10, timeout=60)
+    cache['a'] = FakeSource(10)
+    now[0] += 30
+    cache['b'] = FakeSource(10)
+    now[0] += 40
+    assert 'a' in cache
+    # Checks are periodic
+    assert cache['b'] is not None
+    assert 'a' not in cache
+    assert 'b' in cache
+    assert cache.evictions == 1
+
+
+def testSourceCacheFootprint():
+    cache = SourceCache(10, maxFootprint=250000)
+    cache['a'] = FakeSource(100000)
+    cache['b'] = FakeSource(100000)
+    assert 200000 < cache.footprint < 250000
+    assert cache['a'] is not None
+    cache['c'] = FakeSource(100000)
+    assert 'b' not in cache
+    assert 'a' in cache
+    assert 'c' in cache
+    assert cache.evictions == 1
+    # The most recently used source is always kept
+    cache['d'] = FakeSource(1000000)
+    assert list(cache) == ['d']
+
+
+def testSourceCacheMemoryPressure(monkeypatch):
+    pytest.importorskip('psutil')
+
+    class Memory:
+        total = 1000000
+        available = 500000
+
+    monkeypatch.setattr(
+        large_image.cache_util.sourcecache.psutil, 'virtual_memory', lambda: Memory)
+    cache = SourceCache(10, minAvailable=20)
+    for key in 'abcd':
+        cache[key] = FakeSource(100000)
+    assert len(cache) == 4
+    Memory.available = 150000
+    cache['e'] = FakeSource(100000)
+    assert list(cache) == ['b', 'c', 'd', 'e']
+    Memory.available = 0
+    cache['f'] = FakeSource(100000)
+    assert list(cache) == ['d', 'e', 'f']
+    # The most recently used source is always kept
+    Memory.total = 10000000
+    cache['g'] = FakeSource(100000)
+    assert list(cache) == ['g']
+
+
+def testSourceCacheChecksOnInsert(monkeypatch):
+    measured = []
+    footprint = large_image.cache_util.sourcecache.sourceFootprint
+
+    def recordFootprint(value, *args, **kwargs):
+        measured.append(value)
+        return footprint(value, *args, **kwargs)
+
+    monkeypatch.setattr(
+        large_image.cache_util.sourcecache, 'sourceFootprint', recordFootprint)
+    cache = SourceCache(10, maxFootprint=250000)
+    cache['a'] = FakeSource(100000)
+    # Placeholders for sources that are being opened aren't measured and
+    # don't cause sources to be evicted
+    cache['b'] = ('placeholder', None)
+    cache['c'] = FakeSource(200000)
+    assert list(cache) == ['b', 'c']
+    # Only the added source is measured
+    assert len(measured) == 2
+    assert measured[-1] is cache['c']
+    cache['d'] = ('placeholder', None)
+    assert list(cache) == ['b', 'c', 'd']
+    assert cache.evictions == 1
+
+
+def testSourceCacheMeasuresOnePerCheck(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(time, 'monotonic', lambda: now[0])
+    measured = []
+    footprint = large_image.cache_util.sourcecache.sourceFootprint
+
+    def recordFootprint(value, *args, **kwargs):
+        measured.append(value)
+        return footprint(value, *args, **kwargs)
+
+    monkeypatch.setattr(
+        large_image.cache_util.sourcecache, 'sourceFootprint', recordFootprint)
+    cache = SourceCache(10, maxFootprint=1000000)
+    sources = {key: FakeSource(10000) for key in 'abc'}
+    for key in 'abc':
+        cache[key] = sources[key]
+    measured[:] = []
+    # Lookups between checks don't measure anything
+    assert cache['c'] is sources['c']
+    assert not len(measured)
+    # Each periodic check measures the source measured least recently
+    for key in 'abca':
+        now[0] += SourceCache.checkInterval
+        assert cache['b'] is sources['b']
+        assert measured[-1] is sources[key]
+    assert len(measured) == 4
+    # Sources that grow are counted when they are measured again
+    sources['b'].data = np.zeros(500000, dtype=np.uint8)
+    now[0] += SourceCache.checkInterval
+    assert cache['b'] is sources['b']
+    assert cache.footprint > 500000
+
+
+class FakeHandle:
+    def __init__(self):
+        self.isOpen = True
+        self.opens = 0
+
+    def _reopenHandle(self):
+        if not self.isOpen:
+            self.isOpen = True
+            self.opens += 1
+
+    def _closeHandle(self):
+        self.isOpen = False
+
+
+def testHandlePool():
+    pool = HandlePool(2)
+    handles = [FakeHandle() for _ in range(4)]
+    with pool.use(handles[0]):
+        for handle in handles[1:]:
+            with pool.use(handle):
+                assert handle.isOpen
+        # Handles in use are not closed
+        assert handles[0].isOpen
+        assert [handle.isOpen for handle in handles[1:]] == [False, False, True]
+    assert len(pool) == 2
+    assert pool.evictions == 2
+    with pool.use(handles[1]):
+        assert handles[1].isOpen
+        assert handles[1].opens == 1
+    assert [handle.isOpen for handle in handles] == [False, True, False, True]
+    pool.discard(handles[3])
+    assert len(pool) == 1
+    # Objects that were garbage collected are dropped when the pool is full
+    with pool.use(FakeHandle()):
+        pass
+    with pool.use(handles[0]), pool.use(handles[2]):
+        pass
+    assert len(pool) == 2
+    assert pool.evictions == 4
+    assert [handle.isOpen for handle in handles] == [True, False, True, True]
+
+
 @pytest.mark.singular()
 def testCacheMemcached():
     cache_test(MemCache())
@@ -51,6 +241,25 @@ def testCheckCacheMemcached():
     assert val == 354224848179261915075
 
 
+@pytest.mark.singular()
+def testCacheMemcachedChunks():
+    cache = MemCache()
+    tile = np.random.default_rng(0).integers(0, 65535, (512, 512, 3), dtype=np.uint16)
+    cache['tile'] = tile
+    assert np.array_equal(cache['tile'], tile)
+    histogram = {'histogram': [np.arange(200000) for _ in range(3)]}
+    cache['histogram'] = histogram
+    assert np.array_equal(cache['histogram']['histogram'][2], histogram['histogram'][2])
+    # Replacing a value uses new chunks
+    cache['tile'] = tile[::-1]
+    assert np.array_equal(cache['tile'], tile[::-1])
+    # A missing chunk is a cache miss
+    hashedKey = cache._hashKey('tile')
+    del cache._client[cache._client[hashedKey].chunkKeys(hashedKey)[1]]
+    with pytest.raises(KeyError):
+        cache['tile']
+
+
 def testBadMemcachedUrl():
     # go though and check if all 100 fib numbers are in cache
     # it is stored in cache as ('fib', #)
@@ -61,6 +270,347 @@ def testBadMemcachedUrl():
         cache['(2,)']
 
 
+def testTieredCache():
+    shared = cachetools.LRUCache(1000)
+    cache = TieredCache(shared, 100, getsizeof=lambda v: 1)
+    cache_test(cache)
+    assert cache['(100,)'] == 354224848179261915075
+    assert shared['(100,)'] == 354224848179261915075
+    info = cache.tierInfo()
+    assert info['local']['items'] == 100
+    assert info['shared']['items'] == 100
+    assert info['shared']['hits'] == 0
+    # Values evicted from the local tier are promoted when read
+    for idx in range(100):
+        cache['extra%d' % idx] = idx
+    assert '(2,)' not in cache
+    assert cache['(2,)'] == 1
+    assert '(2,)' in cache
+    info = cache.tierInfo()
+    assert info['local']['items'] == 100
+    assert info['shared']['items'] == 200
+    assert info['shared']['hits'] == 1
+    with pytest.raises(KeyError):
+        cache['missing']
+    assert cache.tierInfo()['shared']['misses'] == info['shared']['misses'] + 1
+    del cache['(2,)']
+    with pytest.raises(KeyError):
+        cache['(2,)']
+    cache.clear()
+    assert len(shared) == 0
+    assert cache.tierInfo()['local']['items'] == 0
+
+
+@pytest.mark.singular()
+def testCacheTieredMemcached():
+    cache = TieredCache(MemCache(), 1024 ** 2)
+    cache_test(cache)
+    assert cache['(100,)'] == 354224848179261915075
+    assert cache.tierInfo()['local']['hits'] > 0
+
+
+def testDiskCache(tmp_path):
+    path = tmp_path / 'tiles.sqlite'
+    cache = DiskCache(path)
+    cache_test(cache)
+    assert cache['(100,)'] == 354224848179261915075
+    assert len(cache) == 100
+    # Values persist in a new instance
+    cache = DiskCache(path)
+    assert cache['(3,)'] == 2
+    assert '(3,)' in cache
+    del cache['(3,)']
+    assert '(3,)' not in cache
+    with pytest.raises(KeyError):
+        cache['(3,)']
+    cache.clear()
+    assert len(cache) == 0
+
+
+@pytest.mark.parametrize(('eviction', 'kept', 'evicted'), [
+    ('lru', 'hot', 'cold'),
+    ('lfu', 'cold', 'hot'),
+])
+def testDiskCacheEviction(tmp_path, eviction, kept, evicted):
+    cache = DiskCache(tmp_path / 'tiles.sqlite', maxsize=1024 ** 2, eviction=eviction)
+    # cold is read often but not recently; hot is read recently but rarely
+    for key, reads in [('cold', 3), ('hot', 1)] + [('fill%d' % idx, 3) for idx in range(5)]:
+        cache[key] = b'x' * 4096
+        for _ in range(reads):
+            cache[key]
+        cache._flushAccessed()
+        time.sleep(0.01)
+    # Shrink the cache so one value is evicted
+    cache._maxsize = cache.currsize - 1
+    cache._cull()
+    assert len(cache) == 6
+    assert kept in cache
+    assert evicted not in cache
+
+
+def _diskCacheWriter(path, start):
+    cache = DiskCache(path)
+    for idx in range(start, start + 50):
+        cache['key%d' % idx] = idx
+    return sum(cache['key%d' % idx] for idx in range(start, start + 50))
+
+
+def testDiskCacheProcesses(tmp_path):
+    path = tmp_path / 'tiles.sqlite'
+    with concurrent.futures.ProcessPoolExecutor(max_workers=4) as executor:
+        results = list(executor.map(_diskCacheWriter, [path] * 4, [0, 50, 100, 150]))
+    assert sum(results) == sum(range(200))
+    assert len(DiskCache(path)) == 200
+
+
+@pytest.mark.singular()
+def testGetTileCacheDisk(tmp_path):
+    large_image.cache_util.cache._tileCache = None
+    large_image.cache_util.cache._tileLock = None
+    config.setConfig('cache_backend', 'disk')
+    config.setConfig('cache_disk_path', str(tmp_path / 'tiles.sqlite'))
+    try:
+        large_image.cache_util.cachefactory.loadCaches()
+        _availableCaches.setdefault('disk', DiskCache)
+        tileCache, tileLock = getTileCache()
+        assert isinstance(tileCache, DiskCache)
+        tileCache['key'] = 'value'
+        cachesClear(exiting=True)
+        assert tileCache['key'] == 'value'
+        cachesClear()
+        assert 'key' not in tileCache
+        # Without a path, the python cache is used
+        large_image.cache_util.cache._tileCache = None
+        large_image.cache_util.cache._tileLock = None
+        config.setConfig('cache_disk_path', None)
+        tileCache, tileLock = getTileCache()
+        assert isinstance(tileCache, cachetools.LRUCache)
+    finally:
+        config.setConfig('cache_disk_path', None)
+        large_image.cache_util.cache._tileCache = None
+        large_image.cache_util.cache._tileLock = None
+
+
+def testSharedMemoryCache(tmp_path):
+    path = tmp_path / 'tiles.shm'
+    cache = SharedMemoryCache(path, 1024 ** 2)
+    cache_test(cache)
+    assert cache['(100,)'] == 354224848179261915075
+    assert len(cache) == 100
+    # Another instance uses the same pool and keeps its size
+    other = SharedMemoryCache(path, 4 * 1024 ** 2)
+    assert other.maxsize == 1024 ** 2
+    assert other['(3,)'] == 2
+    del other['(3,)']
+    assert '(3,)' not in cache
+    with pytest.raises(KeyError):
+        cache['(3,)']
+    # The oldest values are replaced when the pool is full
+    for idx in range(200):
+        cache['fill%d' % idx] = b'x' * 10000
+    assert '(100,)' not in cache
+    assert 'fill199' in cache
+    assert cache.currsize == cache.maxsize
+    assert 50 < len(cache) < 200
+    other.clear()
+    assert len(cache) == 0
+    assert 'fill199' not in cache
+
+
+def _sharedCacheWorker(path, start):
+    cache = SharedMemoryCache(path, 1024 ** 2)
+    for idx in range(start, start + 50):
+        cache['key%d' % idx] = idx
+    # Read values written by other processes until they all appear
+    seen = set()
+    for _ in range(1000):
+        seen |= {idx for idx in range(200) if cache.get('key%d' % idx) == idx}
+        if len(seen) == 200:
+            break
+        time.sleep(0.01)
+    return len(seen)
+
+
+def testSharedMemoryCacheProcesses(tmp_path):
+    path = tmp_path / 'tiles.shm'
+    SharedMemoryCache(path, 1024 ** 2)
+    with concurrent.futures.ProcessPoolExecutor(max_workers=4) as executor:
+        results = list(executor.map(_sharedCacheWorker, [path] * 4, [0, 50, 100, 150]))
+    assert results == [200] * 4
+    assert len(SharedMemoryCache(path, 1024 ** 2)) == 200
+
+
+@pytest.mark.singular()
+def testGetTileCacheShared(tmp_path):
+    large_image.cache_util.cache._tileCache = None
+    large_image.cache_util.cache._tileLock = None
+    config.setConfig('cache_backend', 'shared')
+    config.setConfig('cache_shared_path', str(tmp_path / 'tiles.shm'))
+    try:
+        large_image.cache_util.cachefactory.loadCaches()
+        _availableCaches.setdefault('shared', SharedMemoryCache)
+        tileCache, tileLock = getTileCache()
+        assert isinstance(tileCache, SharedMemoryCache)
+        tileCache['key'] = 'value'
+        cachesClear(exiting=True)
+        assert tileCache['key'] == 'value'
+        assert cachesInfo()['tileCache']['items'] == 1
+    finally:
+        config.setConfig('cache_shared_path', None)
+        large_image.cache_util.cache._tileCache = None
+        large_image.cache_util.cache._tileLock = None
+
+
+def testTinyLFUCache():
+    cache = TinyLFUCache(1024 ** 2)
+    cache_test(cache)
+    assert cache['(100,)'] == 354224848179261915075
+    # Sizes are based on the values
+    cache.clear()
+    cache['array'] = np.zeros((256, 256, 4), dtype=np.uint16)
+    cache['bytes'] = b'x' * 4096
+    assert cache.currsize == 256 * 256 * 4 * 2 + 4096
+    assert cache.curritems == 2
+    with pytest.raises(ValueError):
+        cache['large'] = np.zeros((1024, 1024), dtype=np.uint16)
+    del cache['array']
+    assert 'array' not in cache
+    assert cache.currsize == 4096
+
+
+def testTinyLFUCacheScan():
+    cache = TinyLFUCache(100 * 1000)
+    hot = ['hot%d' % idx for idx in range(50)]
+    for key in hot:
+        cache[key] = b'x' * 1000
+    for _ in range(3):
+        for key in hot:
+            assert cache[key]
+    # A scan of many values that are used once doesn't evict the hot values
+    for idx in range(1000):
+        cache['scan%d' % idx] = b'x' * 1000
+    assert sum(key in cache for key in hot) == len(hot)
+    assert cache.currsize <= cache.maxsize
+    # Scanned values that were refused admission count as evictions
+    assert cache.evictions >= 1000 - len(cache)
+    # An LRU cache of the same size would have lost them
+    lru = cachetools.LRUCache(100)
+    for key in hot + ['scan%d' % idx for idx in range(1000)]:
+        lru[key] = 1
+    assert not any(key in lru for key in hot)
+
+
+def testTinyLFUCacheCost():
+    cache = TinyLFUCache(100 * 1000)
+    for idx in range(100):
+        cache.setWithCost('cheap%d' % idx, b'x' * 1000, 0.001)
+    # Values that are as frequent but more expensive replace cheap values
+    for idx in range(50):
+        cache.setWithCost('costly%d' % idx, b'x' * 1000, 1)
+    assert sum('costly%d' % idx in cache for idx in range(50)) >= 45
+    # A value that is larger than the values it replaces needs to be worth
+    # more than all of them
+    cache.setWithCost('large', b'x' * 20000, 0.005)
+    cache.setWithCost('pushed', b'x' * 1000, 1)
+    assert 'large' not in cache
+    cache.setWithCost('large', b'x' * 20000, 1)
+    cache.setWithCost('pushed', b'x' * 1000, 1)
+    assert 'large' in cache
+    assert cache.currsize <= cache.maxsize
+
+
+@pytest.mark.singular()
+def testGetTileCacheTinyLFU():
+    large_image.cache_util.cache._tileCache = None
+    large_image.cache_util.cache._tileLock = None
+    config.setConfig('cache_backend', 'python')
+    config.setConfig('cache_python_policy', 'tinylfu')
+    try:
+        tileCache, tileLock = getTileCache()
+        assert isinstance(tileCache, TinyLFUCache)
+        assert cachesInfo()['tileCache']['items'] == 0
+    finally:
+        config.setConfig('cache_python_policy', 'lru')
+        large_image.cache_util.cache._tileCache = None
+        large_image.cache_util.cache._tileLock = None
+
+
+@pytest.mark.parametrize('codec', ['auto', 'zstd', 'lz4', 'zlib'])
+def testCompressValue(codec):
+    rng = np.random.default_rng(0)
+    sparse = (rng.poisson(0.05, (512, 512, 2)) * 1000).astype(np.uint16)
+    config.setConfig('cache_compression', codec)
+    try:
+        compressed = compressValue(sparse)
+        assert isinstance(compressed, CompressedArray)
+        assert len(compressed.data) * 5 < sparse.nbytes
+        result = decompressValue(compressed)
+        assert result.dtype == sparse.dtype
+        assert np.array_equal(result, sparse)
+        assert result.flags.writeable
+        result = decompressValue(compressValue(sparse[::3, ::2, 1].astype('>f8')))
+        assert np.array_equal(result, sparse[::3, ::2, 1])
+        # Small, incompressible, and non-array values are not compressed
+        assert compressValue(sparse[:10]) is not None
+        assert not isinstance(compressValue(sparse[:10]), CompressedArray)
+        noise = rng.integers(0, 256, (512, 512), dtype=np.uint8)
+        assert compressValue(noise) is noise
+        assert compressValue(b'x' * 100000) == b'x' * 100000
+    finally:
+        config.setConfig('cache_compression', None)
+    assert compressValue(sparse) is sparse
+
+
+@pytest.mark.parametrize('cacheClass', [DiskCache, SharedMemoryCache])
+def testCacheCompression(tmp_path, cacheClass):
+    cache = cacheClass(tmp_path / 'cache', 16 * 1024 ** 2)
+    tile = np.zeros((1024, 1024), dtype=np.uint16)
+    tile[::7, ::5] = 4000
+    config.setConfig('cache_compression', 'auto')
+    try:
+        cache['tile'] = tile
+        assert cache.currsize < tile.nbytes / 5
+    finally:
+        config.setConfig('cache_compression', None)
+    assert np.array_equal(cache['tile'], tile)
+
+
+@pytest.mark.parametrize('cacheClass', [DiskCache, SharedMemoryCache])
+def testCacheGetMany(tmp_path, cacheClass):
+    cache = cacheClass(tmp_path / 'tiles', 1024 ** 2)
+    cache.setMany({'key%d' % idx: b'value%d' % idx for idx in range(10)})
+    assert cache['key3'] == b'value3'
+    found = cache.getMany(['key%d' % idx for idx in range(5, 15)])
+    assert found == {'key%d' % idx: b'value%d' % idx for idx in range(5, 10)}
+    assert cache.getMany([]) == {}
+
+
+@pytest.mark.singular()
+def testCacheMemcachedGetMany():
+    cache = MemCache()
+    tile = np.random.default_rng(0).integers(0, 65535, (512, 512, 3), dtype=np.uint16)
+    cache.setMany({'small': b'value', 'tile': tile})
+    found = cache.getMany(['small', 'tile', 'missing'])
+    assert set(found) == {'small', 'tile'}
+    assert found['small'] == b'value'
+    assert np.array_equal(found['tile'], tile)
+
+
+def testTieredCacheGetMany():
+    shared = cachetools.LRUCache(1000)
+    cache = TieredCache(shared, 10, getsizeof=lambda v: 1)
+    cache.setMany({'key%d' % idx: idx for idx in range(20)})
+    assert len(shared) == 20
+    found = cache.getMany(['key%d' % idx for idx in range(25)])
+    assert found == {'key%d' % idx: idx for idx in range(20)}
+    info = cache.tierInfo()
+    assert info['local']['hits'] == 10
+    assert info['shared']['hits'] == 10
+    assert info['shared']['misses'] == 5
+    # Values found in the shared tier were promoted
+    assert 'key0' in cache
+
+
 @pytest.mark.singular()
 def testGetTileCachePython():
     large_image.cache_util.cache._tileCache = None
@@ -79,6 +629,16 @@ def testGetTileCacheMemcached():
     assert isinstance(tileCache, MemCache)
 
 
+@pytest.mark.singular()
+def testGetTileCacheTiered():
+    large_image.cache_util.cache._tileCache = None
+    large_image.cache_util.cache._tileLock = None
+    config.setConfig('cache_backend', 'tiered')
+    tileCache, tileLock = getTileCache()
+    assert isinstance(tileCache, TieredCache)
+    assert 'local' in cachesInfo()['tileCache']['tiers']
+
+
 class TestClass:
     def testLRUThreadSafety(self):
         # The cachetools LRU cache is not thread safe, and if two threads ask
@@ -128,6 +688,63 @@ class TestClass:
         for sum in sums:
             assert sum == loopSize * (loopSize - 1) / 2 + loopSize * sumDelta
 
+    @pytest.mark.parametrize(('timeout', 'calls'), [(60, 1), (0, 4), (0.05, 4)])
+    def testMethodCacheSingleFlight(self, timeout, calls):
+        self.cache = cachetools.LRUCache(10)
+        self.cache_lock = threading.Lock()
+        callList = []
+
+        @methodcache(lambda x: x)
+        def slow(self, x):
+            callList.append(x)
+            time.sleep(0.5)
+            return x * 2
+
+        orig = config.getConfig('cache_inflight_timeout')
+        try:
+            config.setConfig('cache_inflight_timeout', timeout)
+            with concurrent.futures.ThreadPoolExecutor(max_workers=4) as executor:
+                results = list(executor.map(lambda x: slow(self, x), [3] * 4))
+        finally:
+            config.setConfig('cache_inflight_timeout', orig)
+        assert results == [6] * 4
+        assert len(callList) == calls
+        assert not large_image.cache_util.cache._inFlight
+
+    def testMethodCacheSingleFlightPerCache(self):
+        class Directory:
+            def __init__(self, name):
+                self.name = name
+                self.cache = cachetools.LRUCache(10)
+
+            @methodcache(key=functools.partial(strhash, 'tables'))
+            def tables(self):
+                time.sleep(0.3)
+                return 'tables of %s' % self.name
+
+        # Objects with their own caches and the same keys don't share calls
+        directories = [Directory('A'), Directory('B')]
+        with concurrent.futures.ThreadPoolExecutor(max_workers=2) as executor:
+            results = list(executor.map(lambda dir: dir.tables(), directories))
+        assert results == ['tables of A', 'tables of B']
+        assert not large_image.cache_util.cache._inFlight
+
+    def testMethodCacheGetCachedMany(self):
+        self.cache = cachetools.LRUCache(10)
+        self.cache_lock = threading.Lock()
+        callList = []
+
+        @methodcache(lambda x: str(x))
+        def double(self, x):
+            callList.append(x)
+            return x * 2
+
+        assert double(self, 1) == 2
+        assert double(self, 3) == 6
+        found = double.getCachedMany(self, [((x, ), {}) for x in range(5)])
+        assert found == {1: 2, 3: 6}
+        assert callList == [1, 3]
+
     class ExampleWithMetaclass(metaclass=LruCacheMetaclass):
         cacheName = 'test'
         cacheMaxSize = 4
@@ -178,3 +795,113 @@ class TestClass:
         assert cachesInfo()['test']['used'] == 1
         cachesClear()
         assert cachesInfo()['test']['used'] == 0
+
+    def testMethodCacheMetrics(self):
+        self.cache = cachetools.LRUCache(10)
+        self.cache_lock = threading.Lock()
+
+        @methodcache(lambda x: str(x))
+        def double(self, x):
+            time.sleep(0.01)
+            return x * 2
+
+        clearCacheMetrics()
+        double(self, 1)
+        double(self, 1)
+        double(self, 2)
+        metrics = getCacheMetrics('methodcache')['TestClass.double']
+        assert metrics['hits'] == 1
+        assert metrics['misses'] == 2
+        assert metrics['computes'] == 2
+        assert metrics['stores'] == 2
+        assert metrics['hitRate'] == 1 / 3
+        assert metrics['latency']['compute']['count'] == 2
+        assert metrics['latency']['compute']['mean'] >= 0.01
+        # Slow sleeps can land in a larger bucket, so only the total is checked
+        assert sum(metrics['latency']['compute']['buckets'].values()) == 2
+        orig = config.getConfig('cache_metrics')
+        try:
+            config.setConfig('cache_metrics', False)
+            double(self, 2)
+        finally:
+            config.setConfig('cache_metrics', orig)
+        assert getCacheMetrics('methodcache')['TestClass.double']['hits'] == 1
+        clearCacheMetrics()
+        assert getCacheMetrics() == {}
+
+    def testNegativeCache(self):
+        self.cache = cachetools.LRUCache(10)
+        self.cache_lock = threading.Lock()
+        callList = []
+
+        @methodcache(lambda x: str(x))
+        def check(self, x):
+            callList.append(x)
+            if x < 0:
+                raise TileSourceXYZRangeError('negative %d' % x)
+            if x == 0:
+                msg = 'assetstore'
+                raise TileSourceAssetstoreError(msg)
+            return x
+
+        orig = config.getConfig('cache_negative_ttl')
+        large_image.cache_util.cache._negativeCache = None
+        large_image.cache_util.cache._negativeLock = None
+        try:
+            config.setConfig('cache_negative_ttl', 0.2)
+            for _ in range(3):
+                with pytest.raises(TileSourceXYZRangeError, match='negative -1'):
+                    check(self, -1)
+            assert callList == [-1]
+            # Errors that may be transient are not recorded
+            for _ in range(2):
+                with pytest.raises(TileSourceAssetstoreError):
+                    check(self, 0)
+            assert callList == [-1, 0, 0]
+            assert cachesInfo()['negativeCache']['items'] == 1
+            # Recorded errors expire
+            time.sleep(0.3)
+            with pytest.raises(TileSourceXYZRangeError):
+                check(self, -1)
+            assert callList == [-1, 0, 0, -1]
+            cachesClear()
+            with pytest.raises(TileSourceXYZRangeError):
+                check(self, -1)
+            assert callList == [-1, 0, 0, -1, -1]
+        finally:
+            config.setConfig('cache_negative_ttl', orig)
+            large_image.cache_util.cache._negativeCache = None
+            large_image.cache_util.cache._negativeLock = None
+
+    @pytest.mark.singular()
+    def testNegativeCacheTiles(self):
+        cachesClear()
+        clearCacheMetrics()
+        ts = large_image.open('large_image://test', sizeX=1000, sizeY=1000)
+        for _ in range(3):
+            with pytest.raises(TileSourceXYZRangeError):
+                ts.getTile(10, 0, 2)
+        metrics = cachesInfo()['negativeCache']['metrics']['TestTileSource.getTile']
+        assert metrics['stores'] == 1
+        assert metrics['hits'] == 2
+        # The tile cache isn't consulted for a recorded error
+        assert cachesInfo()['tileCache']['metrics']['TestTileSource.getTile']['misses'] == 1
+
+    @pytest.mark.singular()
+    def testCachesInfoMetrics(self):
+        cachesClear()
+        clearCacheMetrics()
+        large_image.cache_util.cache._tileCache = None
+        large_image.cache_util.cache._tileLock = None
+        config.setConfig('cache_backend', 'python')
+        ts = large_image.open('large_image://test', sizeX=1000, sizeY=1000)
+        ts = large_image.open('large_image://test', sizeX=1000, sizeY=1000)
+        ts.getTile(0, 0, 0)
+        ts.getTile(0, 0, 0)
+        info = cachesInfo()
+        assert info['tilesource']['metrics']['TestTileSource']['hits'] == 1
+        assert info['tilesource']['metrics']['TestTileSource']['computes'] == 1
+        tileMetrics = info['tileCache']['metrics']['TestTileSource.getTile']
+        assert tileMetrics['hits'] == 1
+        assert tileMetrics['misses'] == 1
+        assert info['tileCache']['evictions'] == 0
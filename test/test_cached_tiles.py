@@ -91,6 +91,29 @@ class LargeImageCachedTilesTest:
         utilities.checkTilesZXY(source, meta, params, utilities.PNGHeader)
         assert large_image_source_test._counters['tiles'] == counter3
 
+    @pytest.mark.singular()
+    def testDecodedTilesFromTest(self, monitorTileCounts):
+        cachesClear()
+        params = {'sizeX': 1000, 'sizeY': 800, 'frames': 2}
+        style = {'band': 1, 'palette': 'viridis', 'min': 0, 'max': 255}
+        source = monitorTileCounts(None, **params)
+        tile = source.getTile(1, 1, 2, frame=1)
+        assert large_image_source_test._counters['tiles'] == 1
+        # Other styles and encodings reuse the decoded tile
+        styledTile = monitorTileCounts(None, style=style, **params).getTile(1, 1, 2, frame=1)
+        jpegTile = monitorTileCounts(None, encoding='JPEG', **params).getTile(1, 1, 2, frame=1)
+        assert large_image_source_test._counters['tiles'] == 1
+        assert styledTile != tile
+        assert large_image.cache_util.cachesInfo()['decodedTileCache']['items'] == 1
+        # The results match tiles that are decoded again
+        cachesClear()
+        assert monitorTileCounts(None, **params).getTile(1, 1, 2, frame=1) == tile
+        assert monitorTileCounts(None, style=style, **params).getTile(
+            1, 1, 2, frame=1) == styledTile
+        assert monitorTileCounts(None, encoding='JPEG', **params).getTile(
+            1, 1, 2, frame=1) == jpegTile
+        assert large_image_source_test._counters['tiles'] == 2
+
     @pytest.mark.singular()
     def testLargeRegion(self):
         imagePath = datastore.fetch(
@@ -161,9 +184,32 @@ class TestMemcachedCache(LargeImageCachedTilesTest):
         config.setConfig('cache_backend', 'memcached')
 
 
+class TestTieredCache(LargeImageCachedTilesTest):
+    @classmethod
+    def setup_class(cls):
+        large_image.cache_util.cache._tileCache = None
+        large_image.cache_util.cache._tileLock = None
+        config.setConfig('cache_backend', 'tiered')
+
+
 class TestPythonCache(LargeImageCachedTilesTest):
     @classmethod
     def setup_class(cls):
         large_image.cache_util.cache._tileCache = None
         large_image.cache_util.cache._tileLock = None
         config.setConfig('cache_backend', 'python')
+
+
+class TestTinyLFUCache(LargeImageCachedTilesTest):
+    @classmethod
+    def setup_class(cls):
+        large_image.cache_util.cache._tileCache = None
+        large_image.cache_util.cache._tileLock = None
+        config.setConfig('cache_backend', 'python')
+        config.setConfig('cache_python_policy', 'tinylfu')
+
+    @classmethod
+    def teardown_class(cls):
+        config.setConfig('cache_python_policy', 'lru')
+        large_image.cache_util.cache._tileCache = None
+        large_image.cache_util.cache._tileLock = None
@@ -1,17 +1,21 @@
+import concurrent.futures
 import io
 import json
 import os
 import re
 import sys
+import threading
 from pathlib import Path
 
+import cachetools
 import numpy as np
 import PIL.Image
 import pytest
 
 import large_image
-from large_image.cache_util import cachesClear
+from large_image.cache_util import cachesClear, methodcache
 from large_image.tilesource import nearPowerOfTwo
+from large_image.tilesource.utilities import UniformTile, _encodeUniformTile
 
 from . import utilities
 from .datastore import datastore, registry
@@ -271,6 +275,16 @@ def testBadGetPaletteColors(palette):
     assert large_image.tilesource.utilities.isValidPalette(palette) is False
 
 
+def testGetPaletteColorsConcurrently():
+    # Enough distinct palettes that the remembered palettes are cleared while
+    # other threads read them
+    palettes = [['#000', '#%06x' % idx] for idx in range(500)]
+    with concurrent.futures.ThreadPoolExecutor(max_workers=8) as pool:
+        results = list(pool.map(large_image.tilesource.utilities.getPaletteColors, palettes * 4))
+    for idx, palette in enumerate(results):
+        assert tuple(palette[1][:3]) == (0, (idx % 500) >> 8, idx % 500 & 255)
+
+
 def testGetAvailableNamedPalettes():
     assert len(large_image.tilesource.utilities.getAvailableNamedPalettes()) > 100
     assert len(large_image.tilesource.utilities.getAvailableNamedPalettes()) > \
@@ -806,3 +820,424 @@ def testStyleRepeatedFrame():
     assert ts4.getTile(0, 0, 0) == tile1
     assert ts5.getTile(0, 0, 0) == tile1
     assert ts6.getTile(0, 0, 0) == tile1
+
+
+@pytest.mark.parametrize('options', [
+    {},
+    {'tile_size': {'width': 300, 'height': 200}, 'tile_overlap': {'x': 20, 'y': 10}},
+    {'output': {'maxWidth': 700}, 'resample': True},
+    {'region': {'left': 150, 'top': 100, 'width': 900, 'height': 700}, 'frame': 2},
+])
+def testTileIteratorPrefetch(options):
+    ts = large_image.open('large_image://test', sizeX=2000, sizeY=1500, frames=3)
+    tiles = list(ts.tileIterator(format=large_image.constants.TILE_FORMAT_NUMPY, **options))
+    prefetched = list(ts.tileIterator(
+        format=large_image.constants.TILE_FORMAT_NUMPY, prefetch=4, workers=2, **options))
+    assert len(prefetched) == len(tiles)
+    for tile, ptile in zip(tiles, prefetched):
+        assert ptile.loaded
+        assert ptile['tile_position'] == tile['tile_position']
+        assert ptile['tile'].shape == tile['tile'].shape
+        assert np.array_equal(ptile['tile'], tile['tile'])
+
+
+def testTileIteratorPrefetchCached(monkeypatch):
+    ts = large_image.open('large_image://test', sizeX=2000, sizeY=1500)
+    tiles = list(ts.tileIterator(format=large_image.constants.TILE_FORMAT_NUMPY))
+    assert all(tile['tile'] is not None for tile in tiles)
+    submitted = []
+    submit = concurrent.futures.ThreadPoolExecutor.submit
+    monkeypatch.setattr(
+        concurrent.futures.ThreadPoolExecutor, 'submit',
+        lambda self, *args, **kwargs: submitted.append(args) or submit(self, *args, **kwargs))
+    # All of the source tiles are cached, so workers only load a final window
+    # with a single tile, which isn't looked up separately
+    prefetched = list(ts.tileIterator(
+        format=large_image.constants.TILE_FORMAT_NUMPY, prefetch=4, workers=2))
+    assert len(submitted) <= 1
+    assert len(prefetched) == len(tiles)
+    for tile, ptile in zip(tiles, prefetched):
+        assert ptile.loaded
+        assert np.array_equal(ptile['tile'], tile['tile'])
+    ts.cache.clear()
+    submitted.clear()
+    prefetched = list(ts.tileIterator(
+        format=large_image.constants.TILE_FORMAT_NUMPY, prefetch=4, workers=2))
+    assert len(submitted) == len(tiles)
+
+
+def testTileIteratorPrefetchEarlyExit():
+    ts = large_image.open('large_image://test', sizeX=2000, sizeY=1500)
+    iterator = ts.tileIterator(format=large_image.constants.TILE_FORMAT_NUMPY, prefetch=8)
+    tile = next(iterator)
+    assert tile['tile_position']['position'] == 0
+    iterator.close()
+
+
+def testGetTiles():
+    ts = large_image.open('large_image://test', sizeX=2000, sizeY=1500, frames=3)
+    requests = [(0, 0, 2), (1, 0, 2), {'x': 2, 'y': 1, 'z': 2, 'frame': 1}, (1, 0, 1)]
+    tiles = ts.getTiles(requests)
+    assert len(tiles) == len(requests)
+    assert tiles[0] == ts.getTile(0, 0, 2)
+    assert tiles[1] == ts.getTile(1, 0, 2)
+    assert tiles[2] == ts.getTile(2, 1, 2, frame=1)
+    assert tiles[3] == ts.getTile(1, 0, 1)
+    assert ts.getTiles([]) == []
+
+
+def testGetTilesInRuns():
+    class RunSource(large_image.tilesource.TileSource):
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            self.sizeX = 2000
+            self.sizeY = 1000
+            self.tileWidth = self.tileHeight = 256
+            self.levels = 4
+            self.reads = []
+
+        def getTile(self, x, y, z, pilImageAllowed=False, numpyAllowed=False, **kwargs):
+            self._xyzInRange(x, y, z)
+            tile = self._tileFromRun(x, y, z)
+            return self._outputTile(tile, large_image.constants.TILE_FORMAT_NUMPY,
+                                    x, y, z, pilImageAllowed, numpyAllowed, **kwargs)
+
+        def getTiles(self, requests, **kwargs):
+            return self._getTilesInRuns(requests, kwargs)
+
+        def _readTileRun(self, x, y, z, count, frame):
+            self.reads.append((x, y, z, count))
+            return [np.full((256, 256, 1), x + idx + y * 16, dtype=np.uint8)
+                    for idx in range(count)]
+
+    ts = RunSource(noCache=True)
+    tiles = ts.getTiles([(x, y, 3) for y in range(2) for x in range(8)], numpyAllowed='always')
+    assert ts.reads == [(0, 0, 3, 8), (0, 1, 3, 8)]
+    assert [tile[0, 0, 0] for tile in tiles] == [
+        x + y * 16 for y in range(2) for x in range(8)]
+    ts.reads = []
+    ts.getTiles([(x, 2, 3) for x in (0, 1, 2, 5, 6)], numpyAllowed='always')
+    assert ts.reads == [(0, 2, 3, 3), (5, 2, 3, 2)]
+    ts.reads = []
+    assert ts.getTile(7, 3, 3, numpyAllowed='always')[0, 0, 0] == 55
+    assert ts.reads == [(7, 3, 3, 1)]
+
+
+def testGetTilesCachedBatch():
+    class CountingCache(cachetools.LRUCache):
+        lookups = []
+
+        def getMany(self, keys):
+            self.lookups.append(len(keys))
+            return {key: self[key] for key in keys if key in self}
+
+    class CachedRunSource(large_image.tilesource.TileSource):
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            self.sizeX = 2000
+            self.sizeY = 1000
+            self.tileWidth = self.tileHeight = 256
+            self.levels = 4
+            self.reads = []
+            self.cache = CountingCache(1000)
+            self.cache_lock = threading.Lock()
+
+        @methodcache()
+        def getTile(self, x, y, z, pilImageAllowed=False, numpyAllowed=False, **kwargs):
+            self._xyzInRange(x, y, z)
+            tile = self._tileFromRun(x, y, z)
+            return self._outputTile(tile, large_image.constants.TILE_FORMAT_NUMPY,
+                                    x, y, z, pilImageAllowed, numpyAllowed, **kwargs)
+
+        def getTiles(self, requests, **kwargs):
+            return self._getTilesInRuns(requests, kwargs)
+
+        def _readTileRun(self, x, y, z, count, frame):
+            self.reads.append((x, y, z, count))
+            return [np.full((256, 256, 1), x + idx + y * 16, dtype=np.uint8)
+                    for idx in range(count)]
+
+    ts = CachedRunSource()
+    ts.getTiles([(x, 0, 3) for x in range(8)], numpyAllowed='always')
+    assert ts.reads == [(0, 0, 3, 8)]
+    ts.reads = []
+    # Cached tiles are found with one lookup and aren't part of a run
+    tiles = ts.getTiles([(x, y, 3) for y in range(2) for x in range(8)], numpyAllowed='always')
+    assert ts.reads == [(0, 1, 3, 8)]
+    assert ts.cache.lookups == [8, 16]
+    assert [tile[0, 0, 0] for tile in tiles] == [
+        x + y * 16 for y in range(2) for x in range(8)]
+    ts.reads = []
+    ts.getTiles([(x, 2, 3) for x in (0, 1, 2, 3)] + [(2, 1, 3)], numpyAllowed='always')
+    assert ts.reads == [(0, 2, 3, 4)]
+
+
+@pytest.mark.parametrize('options', [
+    {'encoding': 'PNG'},
+    {'encoding': 'JPEG', 'jpegQuality': 80},
+    {'encoding': 'PNG', 'edge': '#0000FF'},
+    {'encoding': 'PNG', 'style': {'min': 0, 'max': 100}},
+])
+def testUniformTile(options):
+    class UniformSource(large_image.tilesource.TileSource):
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            self.sizeX = 1000
+            self.sizeY = 1000
+            self.tileWidth = self.tileHeight = 256
+            self.levels = 3
+            self.uniform = True
+
+        def getTile(self, x, y, z, pilImageAllowed=False, numpyAllowed=False, **kwargs):
+            if self.uniform:
+                tile = UniformTile((10, 20, 30, 255), 256, 256, np.uint8)
+            else:
+                tile = np.full((256, 256, 4), (10, 20, 30, 255), dtype=np.uint8)
+            return self._outputTile(tile, large_image.constants.TILE_FORMAT_NUMPY,
+                                    x, y, z, pilImageAllowed, numpyAllowed, **kwargs)
+
+    ts = UniformSource(**options)
+    hits = _encodeUniformTile.cache_info().hits
+    results = []
+    for uniform in (True, False):
+        ts.uniform = uniform
+        results.append([(
+            ts.getTile(x, y, 2),
+            ts.getTile(x, y, 2, numpyAllowed='always'),
+            np.asarray(ts.getTile(x, y, 2, pilImageAllowed=True)),
+        ) for x in range(4) for y in range(4)])
+    for uniformTile, arrayTile in zip(*results):
+        assert uniformTile[0] == arrayTile[0]
+        assert np.array_equal(uniformTile[1], arrayTile[1])
+        assert np.array_equal(uniformTile[2], arrayTile[2])
+    assert ts.dtype == np.uint8
+    if 'style' in options:
+        assert _encodeUniformTile.cache_info().hits == hits
+    else:
+        # The encoded tile is reused
+        assert _encodeUniformTile.cache_info().hits >= hits + 3
+
+
+@pytest.mark.parametrize('options', [
+    {},
+    {'output': {'maxWidth': 700}},
+    {'region': {'left': 150, 'top': 100, 'width': 900, 'height': 700}, 'frame': 2},
+])
+def testGetRegionBatched(options):
+    ts = large_image.open('large_image://test', sizeX=2000, sizeY=1500, frames=3)
+    region, _ = ts.getRegion(format=large_image.constants.TILE_FORMAT_NUMPY, **options)
+    iterInfo = ts._tileIteratorInfo(**options)
+    expected = None
+    for tile in ts._tileIterator(iterInfo):
+        data = large_image.tilesource.utilities._imageToNumpy(tile['tile'])[0]
+        if expected is None:
+            expected = np.zeros(
+                (iterInfo['region']['height'], iterInfo['region']['width'], data.shape[2]),
+                dtype=data.dtype)
+        x0 = tile['x'] - iterInfo['region']['left']
+        y0 = tile['y'] - iterInfo['region']['top']
+        expected[y0:y0 + data.shape[0], x0:x0 + data.shape[1]] = data
+    if 'output' not in options:
+        assert np.array_equal(region[:, :, :expected.shape[2]], expected)
+    assert region.shape[0] == int(iterInfo['output']['height'])
+
+
+@pytest.mark.parametrize('workers', [1, 3])
+def testGetRegionWorkers(workers):
+    ts = large_image.open('large_image://test', sizeX=2000, sizeY=1500, frames=3)
+    region = {'left': 150, 'top': 100, 'width': 1200, 'height': 900}
+    orig = large_image.config.getConfig('region_workers')
+    try:
+        large_image.config.setConfig('region_workers', workers)
+        image, _ = ts.getRegion(
+            region=region, frame=1, format=large_image.constants.TILE_FORMAT_NUMPY)
+    finally:
+        large_image.config.setConfig('region_workers', orig)
+    expected = np.concatenate([np.concatenate([
+        ts.getRegion(region={'left': left, 'top': top, 'width': 400, 'height': 300},
+                     frame=1, format=large_image.constants.TILE_FORMAT_NUMPY)[0]
+        for left in range(150, 1350, 400)], axis=1) for top in range(100, 1000, 300)])
+    assert image.shape == (900, 1200, 3)
+    assert np.array_equal(image, expected)
+
+
+def testGetRegionOut(tmp_path):
+    ts = large_image.open('large_image://test', sizeX=2000, sizeY=1500)
+    region = {'left': 150, 'top': 100, 'width': 900, 'height': 700}
+    expected, _ = ts.getRegion(region=region, format=large_image.constants.TILE_FORMAT_NUMPY)
+    out = np.memmap(tmp_path / 'out.raw', dtype=np.uint8, mode='w+', shape=(700, 900, 3))
+    image, _ = ts.getRegion(region=region, format=large_image.constants.TILE_FORMAT_NUMPY, out=out)
+    assert image is out
+    assert np.array_equal(out, expected)
+    with pytest.raises(ValueError):
+        ts.getRegion(region=region, format=large_image.constants.TILE_FORMAT_NUMPY,
+                     out=np.zeros((10, 10, 3), dtype=np.uint8))
+    with pytest.raises(ValueError):
+        ts.getRegion(region=region, output={'maxWidth': 400},
+                     format=large_image.constants.TILE_FORMAT_NUMPY, out=out)
+
+
+@pytest.mark.parametrize(('options', 'kwargs'), [
+    ({}, {}),
+    ({'output': {'maxWidth': 700}}, {}),
+    ({'output': {'maxWidth': 2500}}, {}),
+    ({'output': {'maxWidth': 400, 'maxHeight': 800}}, {'monochrome': True}),
+    ({'output': {'maxWidth': 400}}, {'bands': 'red=0-65535,green=0-65535,blue=0-65535'}),
+    ({'output': {'maxWidth': 400}, 'format': large_image.constants.TILE_FORMAT_PIL}, {}),
+    ({'output': {'maxWidth': 700}, 'format': large_image.constants.TILE_FORMAT_IMAGE,
+      'encoding': 'PNG'}, {'bands': 'red,green,blue,alpha'}),
+])
+def testGetRegionMemmap(options, kwargs):
+    ts = large_image.open('large_image://test', sizeX=2000, sizeY=1500, **kwargs)
+    options = {'format': large_image.constants.TILE_FORMAT_NUMPY,
+               'region': {'left': 150, 'top': 100, 'width': 1234, 'height': 987},
+               **options}
+    expected, _ = ts.getRegion(**options)
+    orig = large_image.config.getConfig('max_region_memory')
+    try:
+        large_image.config.setConfig('max_region_memory', 1)
+        image, _ = ts.getRegion(**options)
+    finally:
+        large_image.config.setConfig('max_region_memory', orig)
+    if options['format'] == large_image.constants.TILE_FORMAT_NUMPY:
+        assert isinstance(image, np.memmap)
+        assert image.dtype == expected.dtype
+        assert np.array_equal(image, expected)
+    elif options['format'] == large_image.constants.TILE_FORMAT_PIL:
+        assert image.mode == expected.mode
+        assert np.array_equal(np.asarray(image), np.asarray(expected))
+    else:
+        assert image == expected
+
+
+@pytest.mark.parametrize('bands', [None, 'red,green,blue,alpha'])
+def testScaleRegionInStrips(bands):
+    ts = large_image.open('large_image://test', sizeX=2000, sizeY=1500, bands=bands)
+    image, _ = ts.getRegion(format=large_image.constants.TILE_FORMAT_NUMPY)
+    for width, height in [(700, 525), (2500, 1875), (333, 900)]:
+        expected = large_image.tilesource.utilities._imageToNumpy(
+            large_image.tilesource.utilities._imageToPIL(image).resize(
+                (width, height),
+                PIL.Image.Resampling.BICUBIC if width > 2000 else PIL.Image.Resampling.LANCZOS))[0]
+        result = ts._scaleRegionInStrips(
+            image, width, height, None, (large_image.constants.TILE_FORMAT_NUMPY, ),
+            stripBytes=50000)
+        assert np.array_equal(result, expected)
+
+
+@pytest.mark.parametrize(('workers', 'bands'), [
+    (1, None),
+    (3, None),
+    (None, 'red=0-65535,green=0-65535'),
+])
+def testHistogramSinglePass(workers, bands):
+    ts = large_image.open('large_image://test', sizeX=1000, sizeY=800, bands=bands)
+    image, _ = ts.getRegion(format=large_image.constants.TILE_FORMAT_NUMPY)
+    orig = large_image.config.getConfig('histogram_workers')
+    try:
+        large_image.config.setConfig('histogram_workers', workers)
+        hist = ts.histogram(bins=64)
+        minmax = ts.histogram(onlyMinMax=True)
+    finally:
+        large_image.config.setConfig('histogram_workers', orig)
+    assert len(hist['histogram']) == image.shape[2]
+    for idx, entry in enumerate(hist['histogram']):
+        band = image[:, :, idx]
+        assert entry['min'] == minmax['min'][idx] == band.min()
+        assert entry['max'] == minmax['max'][idx] == band.max()
+        assert entry['mean'] == pytest.approx(band.mean())
+        assert entry['stdev'] == pytest.approx(band.std())
+        expected, edges = np.histogram(band, 64, (band.min(), int(band.max()) + 1))
+        assert np.array_equal(entry['hist'], expected)
+        assert np.array_equal(entry['bin_edges'], edges)
+        assert entry['samples'] == band.size
+
+
+@pytest.mark.parametrize('dtype', [np.uint8, np.int16, np.float32])
+def testHistogramPartials(dtype):
+    from large_image.tilesource.utilities import (_histogramPartial,
+                                                  _histogramPartialStats,
+                                                  _mergeHistogramPartials)
+
+    rng = np.random.default_rng(0)
+    data = (rng.random((300, 200, 2)) * 200 - (50 if dtype != np.uint8 else 0)).astype(dtype)
+    params = [(10, (-20, 150)), (7, (0, 100))]
+    partial = None
+    for top in range(0, 300, 64):
+        partial = _mergeHistogramPartials(
+            partial, _histogramPartial(data[top:top + 64], params), params)
+    stats = _histogramPartialStats(partial, params)
+    assert stats['count'] == 60000
+    assert np.array_equal(stats['min'], data.min(axis=(0, 1)))
+    assert np.array_equal(stats['max'], data.max(axis=(0, 1)))
+    assert np.allclose(stats['sum'], data.astype(float).sum(axis=(0, 1)))
+    for idx in range(2):
+        assert np.array_equal(stats['hist'][idx], np.histogram(data[:, :, idx], *params[idx])[0])
+    # Tallied integer partials can be merged with float partials
+    merged = _histogramPartialStats(_mergeHistogramPartials(
+        _histogramPartial(data[:100].astype(np.float64), params),
+        _histogramPartial(data[100:], params), params))
+    assert np.array_equal(merged['min'], data.min(axis=(0, 1)))
+    assert np.allclose(merged['sum2'], (data.astype(float) ** 2).sum(axis=(0, 1)))
+
+
+def testStatisticsStore(tmp_path, monkeypatch):
+    imagePath = str(tmp_path / 'sample.png')
+    data = np.random.default_rng(0).integers(10, 200, (300, 400, 3), dtype=np.uint8)
+    PIL.Image.fromarray(data).save(imagePath)
+    style = {'min': 'auto', 'max': 'auto'}
+    orig = large_image.config.getConfig('statistics_store')
+    try:
+        large_image.config.setConfig('statistics_store', str(tmp_path / 'stats.db'))
+        ts = large_image.open(imagePath)
+        bandInfo = ts.getBandInformation(statistics=True)
+        assert bandInfo[1]['min'] == data[:, :, 0].min()
+        tile = large_image.open(imagePath, style=style).getTile(0, 0, 0)
+        large_image.cache_util.cachesClear()
+        histogramCalls = []
+        origHistogram = ts.__class__.histogram
+        monkeypatch.setattr(ts.__class__, 'histogram', lambda *args, **kwargs: (
+            histogramCalls.append(True), origHistogram(*args, **kwargs))[1])
+        ts = large_image.open(imagePath)
+        assert ts.getBandInformation(statistics=True) == bandInfo
+        assert large_image.open(imagePath, style=style).getTile(0, 0, 0) == tile
+        assert not histogramCalls
+        # Changing the file invalidates the stored statistics
+        PIL.Image.fromarray(data[:200]).save(imagePath)
+        large_image.cache_util.cachesClear()
+        ts = large_image.open(imagePath)
+        assert ts.getBandInformation(statistics=True)[1]['min'] == data[:200, :, 0].min()
+        assert len(histogramCalls) == 1
+        assert len(large_image.cache_util.getStatisticsStore()) == 3
+    finally:
+        large_image.config.setConfig('statistics_store', orig)
+
+
+@pytest.mark.parametrize('bands', [None, 'red=0-65535,green=0-65535,blue,alpha'])
+@pytest.mark.parametrize('style', [
+    {'min': 'auto', 'max': 'auto'},
+    {'bands': [
+        {'band': 1, 'palette': 'viridis', 'min': 10, 'max': 40000},
+        {'band': 2, 'palette': '#f00', 'nodata': 5},
+        {'band': 3, 'palette': ['#000', '#0f08'], 'clamp': False, 'min': 100, 'max': 30000}]},
+    {'bands': [
+        {'band': 1, 'palette': 'viridis', 'scheme': 'discrete', 'min': 'min', 'max': 'max'},
+        {'band': 2, 'palette': ['#fff', '#f00'], 'composite': 'multiply', 'min': 0, 'max': 255}]},
+    {'band': 2, 'palette': ['#000', '#ff0'], 'min': 'min:0.02', 'max': 'max:0.02',
+     'dtype': 'uint16'},
+])
+def testStyleLookupTables(bands, style):
+    ts = large_image.open('large_image://test', sizeX=1000, sizeY=800, bands=bands, style=style)
+    # A style function that is never used forces styling without lookup
+    # tables.
+    unusedFunction = {'name': 'numpy.abs', 'stage': []}
+    tsNoLookup = large_image.open(
+        'large_image://test', sizeX=1000, sizeY=800, bands=bands,
+        style=dict(style, function=unusedFunction))
+    for x, y, z in [(0, 0, 0), (1, 1, 2), (3, 2, 2)]:
+        tile = ts.getTile(x, y, z, numpyAllowed='always')
+        expected = tsNoLookup.getTile(x, y, z, numpyAllowed='always')
+        assert tile.dtype == expected.dtype
+        assert np.array_equal(tile, expected)
+    assert ts._styleLookupTables
+    assert not getattr(tsNoLookup, '_styleLookupTables', None)
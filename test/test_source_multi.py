@@ -126,6 +126,25 @@ def testTilesFromMultiString():
         large_image_source_multi.open('invalid' + sourceString)
 
 
+def testTilesOutsideSources():
+    sourceString = json.dumps({'backgroundColor': [255, 0, 0], 'sources': [{
+        'sourceName': 'test', 'path': '__none__', 'params': {'sizeX': 1000, 'sizeY': 1000},
+    }, {
+        'sourceName': 'test', 'path': '__none__', 'params': {'sizeX': 1000, 'sizeY': 1000},
+        'position': {'x': 4000, 'y': 0},
+    }]})
+    source = large_image_source_multi.open(sourceString, encoding='PNG')
+    tileMetadata = source.getMetadata()
+    assert tileMetadata['sizeX'] == 5000
+    z = tileMetadata['levels'] - 1
+    tile = source.getTile(8, 0, z, numpyAllowed='always')
+    assert tile.shape == (256, 256, 3)
+    assert np.all(tile == (255, 0, 0))
+    # Background tiles are identical
+    assert source.getTile(9, 1, z) == source.getTile(10, 2, z)
+    assert source.getTile(9, 1, z) != source.getTile(0, 0, z)
+
+
 def testTilesFromNonschemaMultiString():
     sourceString = json.dumps({'sources': [{
         'sourceName': 'test', 'path': '__none__',
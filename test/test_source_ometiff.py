@@ -2,8 +2,11 @@ import json
 from xml.etree import ElementTree
 
 import large_image_source_ometiff
+import large_image_source_tiff
 import numpy as np
+import pytest
 
+import large_image
 from large_image.constants import TILE_FORMAT_NUMPY
 from large_image.tilesource import dictToEtree, etreeToDict
 
@@ -205,3 +208,35 @@ def testFrameStyleOMETiff():
     imagePath = datastore.fetch('DDX58_AXL_EGFR_well2_XY01.ome.tif')
     source = large_image_source_ometiff.open(imagePath, style={'bands': [{'frame': 4}]})
     assert source.getTile(0, 0, 2)
+
+
+def testSourceIndexStore(tmp_path, monkeypatch):
+    tifffile = pytest.importorskip('tifffile')
+    imagePath = str(tmp_path / 'channels.ome.tif')
+    image = np.random.randint(0, 255, (3, 300, 500), dtype=np.uint8)
+    tifffile.imwrite(imagePath, image, tile=(128, 128), ome=True, metadata={'axes': 'CYX'})
+    orig = large_image.config.getConfig('source_index_store')
+    try:
+        large_image.config.setConfig('source_index_store', str(tmp_path / 'index.db'))
+        source = large_image_source_ometiff.open(imagePath, noCache=True)
+        metadata = source.getMetadata()
+        assert len(metadata['frames']) == 3
+        # Opening the file again doesn't parse its OME XML
+        reader = large_image_source_tiff.tiff_reader.TiledTiffDirectory
+        parsed = []
+        parse = reader.parse_image_description
+
+        def recordParse(self, meta=None):
+            if meta:
+                parsed.append(meta)
+            return parse(self, meta)
+
+        monkeypatch.setattr(reader, 'parse_image_description', recordParse)
+        source = large_image_source_ometiff.open(imagePath, noCache=True)
+        assert not parsed
+        assert source.getMetadata() == metadata
+        assert source.getInternalMetadata()['omeinfo']['Image'][0]['Pixels']['SizeC'] == '3'
+        assert np.array_equal(source.getRegion(
+            format=TILE_FORMAT_NUMPY, frame=2)[0][:, :, 0], image[2])
+    finally:
+        large_image.config.setConfig('source_index_store', orig)
@@ -1,3 +1,4 @@
+import concurrent.futures
 import io
 import json
 import os
@@ -8,6 +9,7 @@ import numpy as np
 import pytest
 import tifftools
 
+import large_image
 from large_image import constants
 from large_image.tilesource.utilities import ImageBytes
 
@@ -791,6 +793,164 @@ def testFromTiffRGBJPEG():
         tile['tile'][0, 0]) == [242, 243, 242]
 
 
+def testRawTileReads(tmp_path):
+    tifffile = pytest.importorskip('tifffile')
+    pytest.importorskip('imagecodecs')
+    imagePath = str(tmp_path / 'jpeg.tiff')
+    image = np.random.randint(0, 255, (1000, 1500, 3), dtype=np.uint8)
+    tifffile.imwrite(imagePath, image, tile=(256, 256), compression='jpeg', photometric='rgb')
+    source = large_image_source_tiff.open(imagePath)
+    tiffDir = source._tiffDirectories[-1]
+    # Raw tiles are read from the file without libtiff
+    offsets, counts = tiffDir._getTileLocations()
+    assert len(offsets) == len(counts) == 24
+    frames = [tiffDir._getJpegFrame(tileNum) for tileNum in range(24)]
+    tile = source.getTile(0, 0, source.levels - 1, numpyAllowed='always')
+    assert tile.shape == (256, 256, 3)
+    with concurrent.futures.ThreadPoolExecutor(4) as pool:
+        assert list(pool.map(tiffDir._getJpegFrame, range(24))) == frames
+    tiffDir._tileLocations = None
+    assert [tiffDir._getJpegFrame(tileNum) for tileNum in range(24)] == frames
+
+
+def testDecodeTileArrays(tmp_path):
+    tifffile = pytest.importorskip('tifffile')
+    pytest.importorskip('imagecodecs')
+    imagePath = str(tmp_path / 'jpeg.tiff')
+    image = np.random.randint(0, 255, (1000, 1500, 3), dtype=np.uint8)
+    tifffile.imwrite(imagePath, image, tile=(256, 256), compression='jpeg', photometric='rgb')
+    source = large_image_source_tiff.open(imagePath)
+    tiffDir = source._tiffDirectories[-1]
+    # Each tile is a complete JPEG, which getTile decodes with PIL
+    expected = [np.asarray(tiffDir.getTile(x, y)) for y in range(4) for x in range(6)]
+    assert np.array_equal(tiffDir.getTileArray(1, 2), expected[13])
+    # Decode into a contiguous array and into a slice of a larger array
+    out = np.zeros((256, 256, 3), dtype=np.uint8)
+    assert tiffDir.getTileArray(1, 2, out=out) is out
+    assert np.array_equal(out, expected[13])
+    region = np.zeros((512, 512, 4), dtype=np.uint8)
+    tiffDir.getTileArray(1, 2, out=region[256:, :256, :3])
+    assert np.array_equal(region[256:, :256, :3], expected[13])
+    assert not np.any(region[:256])
+    with pytest.raises(ValueError):
+        tiffDir.getTileArray(1, 2, out=region)
+    tiles = source.getTiles(
+        [(x, y, source.levels - 1) for y in range(4) for x in range(6)],
+        numpyAllowed='always')
+    assert all(np.array_equal(tile, expected[idx]) for idx, tile in enumerate(tiles))
+    assert np.array_equal(source.getTile(
+        5, 3, source.levels - 1, numpyAllowed='always'), tiles[-1])
+    # Regions request rows of numpy tiles, so they are decoded in parallel
+    source = large_image_source_tiff.open(imagePath, noCache=True)
+    calls = []
+    getTiles = source.getTiles
+    source.getTiles = lambda requests, **kwargs: calls.append(kwargs) or getTiles(
+        requests, **kwargs)
+    region, _ = source.getRegion(format=large_image.constants.TILE_FORMAT_NUMPY)
+    assert np.array_equal(region[:256, :256], expected[0])
+    assert np.array_equal(region[768:, 1280:], expected[-1][:232, :220])
+    assert len(calls)
+    assert all(call['numpyAllowed'] == 'always' for call in calls)
+
+
+def testSourceIndexStore(tmp_path, monkeypatch):
+    tifffile = pytest.importorskip('tifffile')
+    imagePath = str(tmp_path / 'frames.tiff')
+    image = np.random.randint(0, 255, (3, 300, 500, 3), dtype=np.uint8)
+    tifffile.imwrite(imagePath, image, tile=(128, 128), photometric='rgb')
+    orig = large_image.config.getConfig('source_index_store')
+    try:
+        large_image.config.setConfig('source_index_store', str(tmp_path / 'index.db'))
+        source = large_image_source_tiff.open(imagePath, noCache=True)
+        metadata = source.getMetadata()
+        assert len(metadata['frames']) == 3
+        store = large_image.cache_util.getIndexStore()
+        assert len(store) == 1
+        # The index doesn't include tile offsets
+        index = store[large_image.cache_util.strhash(
+            'sourceIndex', 'tiff', large_image_source_tiff._tiffIndexVersion,
+            *source._fileSignature())]
+        assert len(index['ifds']) == 3
+        assert tifftools.Tag.TileOffsets.value not in index['ifds'][0]['tags']
+        # Opening the file again doesn't read its directories
+        monkeypatch.setattr(large_image_source_tiff, '_cached_read_tiff', None)
+        source = large_image_source_tiff.open(imagePath, noCache=True)
+        assert source.getMetadata() == metadata
+        assert np.array_equal(source.getRegion(
+            format=constants.TILE_FORMAT_NUMPY, frame=2)[0][:, :, :3], image[2])
+        # Changing the file invalidates the index
+        monkeypatch.undo()
+        tifffile.imwrite(imagePath, image[:2], tile=(128, 128), photometric='rgb')
+        source = large_image_source_tiff.open(imagePath, noCache=True)
+        assert len(source.getMetadata()['frames']) == 2
+        assert len(store) == 2
+    finally:
+        large_image.config.setConfig('source_index_store', orig)
+
+
+def testDirectoryHandlePool(tmp_path, monkeypatch):
+    tifffile = pytest.importorskip('tifffile')
+    imagePath = str(tmp_path / 'frames.tiff')
+    image = np.random.randint(0, 255, (6, 300, 500, 3), dtype=np.uint8)
+    tifffile.imwrite(imagePath, image, tile=(128, 128), photometric='rgb')
+    source = large_image_source_tiff.open(imagePath, noCache=True)
+    pool = large_image.cache_util.getHandlePool()
+    monkeypatch.setattr(pool, 'maxsize', 2)
+    evictions = pool.evictions
+    for frame in range(6):
+        tile = source.getTile(1, 1, source.levels - 1, frame=frame, numpyAllowed='always')
+        assert np.array_equal(tile[:, :, :3], image[frame, 128:256, 128:256])
+        assert len(pool) <= 2
+    assert pool.evictions >= evictions + 4
+    directories = dict(source._directoryCache.items())
+    assert len([dir for dir in directories.values() if dir._tiffFile is not None]) <= 2
+    # Directories whose handles were closed are reopened without validating
+    # them again
+    monkeypatch.setattr(large_image_source_tiff.tiff_reader.TiledTiffDirectory,
+                        '_validate', None)
+    for frame in range(6):
+        tile = source.getTile(2, 1, source.levels - 1, frame=frame, numpyAllowed='always')
+        assert np.array_equal(tile[:, :, :3], image[frame, 128:256, 256:384])
+    assert dict(source._directoryCache.items()) == directories
+    assert large_image.cache_util.cachesInfo()['handlePool']['used'] <= 2
+
+
+def testDecodedStripCache(tmp_path, monkeypatch):
+    tifffile = pytest.importorskip('tifffile')
+    imagePath = str(tmp_path / 'stripped.tiff')
+    image = np.random.randint(0, 255, (600, 2000, 3), dtype=np.uint8)
+    tifffile.imwrite(imagePath, image, rowsperstrip=16, compression='zlib',
+                     photometric='rgb')
+    reader = large_image_source_tiff.tiff_reader.TiledTiffDirectory
+    reads = []
+    readStrip = reader._readStrip
+
+    def countReads(self, stripNum, stripSize):
+        reads.append(stripNum)
+        return readStrip(self, stripNum, stripSize)
+
+    monkeypatch.setattr(reader, '_readStrip', countReads)
+    large_image.cache_util.cachesClear()
+    tiffDir = reader(imagePath, 0, mustBeTiled=None)
+    assert tiffDir.tileWidth == 2000
+    assert tiffDir.tileHeight == 256
+    for y in range(3):
+        tile = tiffDir.getTile(0, y)
+        assert np.array_equal(tile[:600 - y * 256], image[y * 256:y * 256 + 256])
+    assert not np.any(tile[600 - 512:])
+    assert sorted(reads) == list(range(38))
+    # Strips are decoded once, even by another reader of the same directory
+    tile = reader(imagePath, 0, mustBeTiled=None).getTile(0, 1)
+    assert np.array_equal(tile, image[256:512])
+    assert len(reads) == 38
+    info = large_image.cache_util.cachesInfo()['decodedStripCache']
+    assert info['items'] == 38
+    assert info['used'] == image.nbytes + 8 * 2000 * 3
+    # Tiles are copies of the cached strips
+    tile[:] = 0
+    assert np.array_equal(tiffDir.getTile(0, 1), image[256:512])
+
+
 def testTilesFromMultiFrameTiff():
     imagePath = datastore.fetch('sample.ome.tif')
     source = large_image_source_tiff.open(imagePath)